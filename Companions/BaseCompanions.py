@@ -489,6 +489,29 @@ class DesignTimeCompanion(Companion):
 
         output.append(line)
 
+    def sourceState(self):
+        """ The parsed source lines written out for this companion.
+
+        Compared to the state at the previous post to find companions whose
+        source must be generated again.
+        """
+        state = [self.__class__]
+        if self.textConstr:
+            state.append(self.textConstr.asText())
+        for parsedLines in (self.textPropList, self.textCollInitList,
+                            self.textEventList):
+            state.append(tuple([line.asText() for line in parsedLines]))
+        return tuple(state)
+
+    def hasDependentSource(self):
+        """ Returns true when the source written depends on the order in which
+            other controls are defined """
+        dependentProps = self.dependentProps()
+        for prop in self.textPropList:
+            if prop.prop_name in dependentProps:
+                return True
+        return False
+
     def writeConstructor(self, output, collectionMethod, stripFrmId=''):
         """ Writes out constructor and parameters for control
         """
@@ -523,15 +546,22 @@ class DesignTimeCompanion(Companion):
                 self.addContinuedLine(
                       sourceconst.bodyIndent + evt.asText(stripFrmId),
                       output, sourceconst.bodyIndent)
-                model = self.designer.model
+        if module:
+            self.writeEventMethods(module)
+
+    def writeEventMethods(self, module):
+        """ Rename the methods of renamed events and add empty methods for
+            events not yet defined in the module """
+        model = self.designer.model
+        methods = module.classes[model.main].methods
+        for evt in self.textEventList:
+            if evt.trigger_meth != _('(delete)'):
                 # Either rename the event or add if a new one
                 # The first streamed occurrence will do the rename or add
-                if (evt.prev_trigger_meth and module
-                        and (evt.prev_trigger_meth in
-                            module.classes[model.main].methods)):
+                if evt.prev_trigger_meth and evt.prev_trigger_meth in methods:
                     module.renameMethod(model.main, evt.prev_trigger_meth,
                           evt.trigger_meth)
-                elif module and not evt.trigger_meth in module.classes[model.main].methods:
+                elif not evt.trigger_meth in methods:
                     module.addMethod(model.main, evt.trigger_meth,
                        'self, event', [sourceconst.bodyIndent + 'event.Skip()'])
 
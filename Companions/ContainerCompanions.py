@@ -219,6 +219,11 @@ class BookCtrlDTC(Constructors.WindowConstr, ContainerDTC):
 
     def OnPageChanged(self, event):
         try:
+            page = self.control.GetPage(event.GetSelection())
+            if getattr(page, 'ctrl', None) is not None and \
+                  hasattr(self.designer, 'createDeferredCtrls'):
+                self.designer.createDeferredCtrls(page.ctrl)
+
             if 'Pages' in self.collections:
                 self.collections['Pages'].updateSelection(event.GetSelection())
                 wx.PostEvent(self.control, wx.SizeEvent( self.control.GetSize() ))
@@ -91,6 +91,11 @@ class BaseFrameDTC(ContainerDTC):
                     output.append('%sself.%s()'%(sourceconst.bodyIndent,
                                                  sourceconst.init_utils))
 
+    def sourceState(self):
+        # the call to init utils depends on the data view
+        return ContainerDTC.sourceState(self) + \
+               (len(self.designer.dataView.objects) > 0,)
+
 class FramesConstr(Constructors.PropertyKeywordConstructor):
     def constructor(self):
         return {'Title': 'title', 'Position': 'pos', 'Size': 'size',
@@ -1,4 +1,4 @@
-## rc-version: 9 ##
+## rc-version: 10 ##
 # RCS-ID:      $Id$
 
 
@@ -61,9 +61,9 @@ explorerFileSysRootDefault = ('/', '/')
 drawDesignerGrid = False
 # Also draw grid for child container controls in the frame
 drawDesignerGridForSubWindows = False
-# Grid draw method: 'lines', 'dots', 'grid', NYI: 'bitmap'
-## options: 'lines', 'dots', 'grid'
-drawGridMethod = 'grid'
+# Grid draw method: 'lines', 'dots', 'grid', 'bitmap'
+## options: 'lines', 'dots', 'grid', 'bitmap'
+drawGridMethod = 'bitmap'
 
 # Grayout (blueout actually) source while designer is open
 grayoutSource = False
@@ -1,4 +1,4 @@
-## rc-version: 9 ##
+## rc-version: 10 ##
 # RCS-ID:      $Id$
 
 #-Miscellaneous-----------------------------------------------------------------
@@ -62,8 +62,8 @@ drawDesignerGrid = True
 # Also draw grid for child container controls in the frame
 drawDesignerGridForSubWindows = True
 # Grid drawing method
-## options: 'lines', 'dots', 'grid'
-drawGridMethod = 'grid'
+## options: 'lines', 'dots', 'grid', 'bitmap'
+drawGridMethod = 'bitmap'
 
 # Grayout (blueout actually) source while designer is open
 grayoutSource = True
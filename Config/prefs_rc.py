@@ -1,4 +1,4 @@
-## rc-version: 18 ##
+## rc-version: 19 ##
 # RCS-ID:      $Id$
 
 # The main preference file.
@@ -51,9 +51,10 @@ staticInfoPrefs = { 'Purpose':   '',
 autoAddToApplication = True
 
 # Load images from normal image files, 
-# a singe file Image.archive (zip of Image directory)
+# a singe file Image.archive (zip of Image directory),
+# a memory mapped Images.atlas (built by Scripts/BuildImage.py -atlas)
 # or modules created by resourcepackage
-## options: 'files', 'zip', 'resource',
+## options: 'files', 'zip', 'atlas', 'resource',
 imageStoreType = 'files'
 # Only load image 1st time it is requested then cache it
 # Turn this off to conserve resources on win9x
@@ -136,6 +137,9 @@ autoRefreshOnCodeComplete = True
 
 # Import module when code completion is invoked.
 importOnCodeComplete = False
+# Do these imports in a helper process instead of the Boa shell. Keeps the
+# IDE process small and free of the side effects of importing user code.
+importInHelperProcess = True
 
 # Should call tips be invoked after typing an open paren
 callTipsOnOpenParen = False
@@ -201,6 +205,14 @@ exOpenFromHere = True
 # Maximum Recent files list size
 exRecentFilesListSize = 25
 
+# Watch listed folders and open files for changes made outside Boa.
+# Uses inotify on Linux, otherwise folders are polled every few seconds
+exWatchFileSystem = True
+
+# Should open files that changed on disk be reloaded when they have no
+# unsaved changes, otherwise the change is only reported
+exReloadChangedFiles = True
+
 #-Shell-------------------------------------------------------------------------
 
 # Which shell (if any) should be used
@@ -264,6 +276,10 @@ dsUseSizers = True
 dsInSizerCol = wx.Colour(128, 255, 0)
 dsHasSizerCol = wx.Colour(255, 255, 0)
 
+# Only create the controls on the visible page of notebooks when opening the
+# Designer. Controls on other pages are created when their page is shown.
+dsLazyNotebookPages = False
+
 #-Code generation---------------------------------------------------------------
 
 # Should the paths to image file be created as 
@@ -448,7 +464,8 @@ exportedProperties = ['flatTools', 'childFrameStyle', 'dataViewListStyle',
   'i18nLanguage',
 
   'checkSyntax', 'onlyCheckIfLineModified', 'checkSourceOnSave',
-  'autoRefreshOnCodeComplete', 'importOnCodeComplete', 'callTipsOnOpenParen', 
+  'autoRefreshOnCodeComplete', 'importOnCodeComplete', 'importInHelperProcess',
+  'callTipsOnOpenParen', 
   'handleSpecialEuropeanKeys', 'euroKeysCountry', 'autoReindent', 
   'neverEmptyUndoBuffer',
 
@@ -457,6 +474,7 @@ exportedProperties = ['flatTools', 'childFrameStyle', 'dataViewListStyle',
 
   'exUseExplorer', 'exDefaultFilter', 'exWorkingDirectory', 'exDefaultTreeWidth',
   'exInspectInspectableFiles', 'exOpenFromHere', 'exRecentFilesListSize',
+  'exWatchFileSystem', 'exReloadChangedFiles',
 
   'psPythonShell', 'ps1', 'ps2', 'ps3', 'ps4',
 
@@ -470,6 +488,7 @@ exportedProperties = ['flatTools', 'childFrameStyle', 'dataViewListStyle',
   'dsGridSize', 'dsSelectionTagSize', 'dsSelectionFrameWidth',
   'dsDefaultControlSize', 'dsSelectionTagCol', 'dsAnchorEnabledCol', 
   'dsAnchorDisabledCol', 'dsUseSizers', 'dsInSizerCol', 'dsHasSizerCol',
+  'dsLazyNotebookPages',
 
   'vpOGLCanvasBackgroundColour', 'vpOGLLinePen', 'vpOGLLineBrush',
   'vpOGLClassShapePen', 'vpOGLClassShapeBrush', 'vpOGLExternalClassShapePen',
@@ -27,13 +27,13 @@ from Models import EditorHelper, Controllers
 from EditorUtils import EditorToolBar, EditorStatusBar, ModulePage, socketFileOpenServerListen
 
 import Preferences, Utils, Plugins
-from Preferences import keyDefs, IS, flatTools
+from Preferences import keyDefs, IS, ILM, flatTools
 from Utils import BottomAligningSplitterWindow
 from Utils import _
 
 import About, Help, Browse
 
-from Explorers import Explorer
+from Explorers import Explorer, FileWatcher
 from Explorers.ExplorerNodes import TransportError, TransportSaveError, TransportLoadError
 import ShellEditor
 #from ModRunner import EVT_EXEC_FINISH
@@ -83,8 +83,6 @@ class EditorFrame(wx.Frame, Utils.FrameRestorerMixin):
 
     def _init_utils(self):
         # generated method, don't edit
-        self.modelImageList = wx.ImageList(height=16, width=16)
-
         self.mainMenu = wx.MenuBar()
 
         self.blankEditMenu = wx.Menu(title='')
@@ -142,6 +140,8 @@ class EditorFrame(wx.Frame, Utils.FrameRestorerMixin):
 
         self.app = app
         self.modules = {}
+        # modulePage -> transport whose file is watched for changes on disk
+        self.watchedTransports = {}
         self.inspector = inspector
         self.compPalette = componentPalette
         self.debugger = None
@@ -397,16 +397,13 @@ class EditorFrame(wx.Frame, Utils.FrameRestorerMixin):
         for imgIdx, name in EditorHelper.pluginImgs:
             allImages[imgIdx] = name
 
-        # Populate imagelist
+        # Populate imagelist, shared with the Explorer and file dialogs
         imgIdxs = allImages.keys()
         imgIdxs.sort()
-        for idx in imgIdxs:
-            try:
-                midx = self.modelImageList.Add(IS.load(allImages[idx]))
-            except IS.Error: 
-                midx = -1
-            if idx != midx:
-                print 'Image index mismatch', idx, midx, allImages[idx]
+        if imgIdxs != range(len(imgIdxs)):
+            print 'Image index mismatch', imgIdxs
+        self.modelImageList = ILM.getImageList('models',
+              [allImages[idx] for idx in imgIdxs])
 
         self.tabs.SetImageList(self.modelImageList)
 
@@ -631,6 +628,7 @@ class EditorFrame(wx.Frame, Utils.FrameRestorerMixin):
             self.modules[moduleName] = modulePage
             notebook.AddPage(modulePage.notebook, modulePage.pageName, True, imgIdx)
 
+        self.watchModuleFile(modulePage)
 
         # XXX wxGTK does not trigger an AfterPageChangeEvent
         if wx.Platform == '__WXGTK__':
@@ -1033,6 +1031,7 @@ class EditorFrame(wx.Frame, Utils.FrameRestorerMixin):
             self.browser.checkRemoval(modulePage)
             self.tabs.RemovePage(idx)
             del self.modules[name]
+            self.watchModuleFile(modulePage, False)
             modulePage.destroy()
 
             # notify pages for idx adjustments
@@ -1126,6 +1125,47 @@ class EditorFrame(wx.Frame, Utils.FrameRestorerMixin):
             if mp.model.filename == uri:
                 self.updateModuleState(model)
 
+    def watchModuleFile(self, modulePage, watch=True):
+        """ (Re)start or stop watching the file of a module page for changes
+            made outside the IDE """
+        if self.watchedTransports.has_key(modulePage):
+            self.watchedTransports.pop(modulePage).unwatchChanges()
+
+        # new modules only have a relative name until they are saved
+        transport = modulePage.model.transport
+        if watch and transport and modulePage.model.savedAs and \
+              transport.watchChanges(self.OnModuleFilesChanged):
+            self.watchedTransports[modulePage] = transport
+
+    def OnModuleFilesChanged(self, dirpath, names):
+        changed = {}
+        for name in names.keys():
+            changed[FileWatcher.pathKey(os.path.join(dirpath, name))] = None
+
+        for modulePage, transport in self.watchedTransports.items():
+            filepath = FileWatcher.pathKey(transport.resourcepath)
+            if not changed.has_key(filepath):
+                continue
+
+            model = modulePage.model
+            name = os.path.basename(model.filename)
+            if not os.path.exists(transport.resourcepath):
+                self.setStatus(_('%s was deleted on disk')%name, 'Warning')
+            elif not transport.fileIsNewer():
+                # e.g. saved by the IDE itself
+                continue
+            elif model.hasUnsavedChanges() or \
+                  not Preferences.exReloadChangedFiles:
+                self.setStatus(_('%s was changed on disk')%name, 'Warning')
+            else:
+                try:
+                    model.load()
+                except TransportLoadError, error:
+                    self.setStatus(str(error), 'Error')
+                    continue
+                self.updateModuleState(model)
+                self.setStatus(_('%s was changed on disk and reloaded')%name)
+
     def OnOpen(self, event, curdir='.'):
         fn = self.openFileDlg(curdir=curdir)
         if fn:
@@ -1495,6 +1535,9 @@ class EditorFrame(wx.Frame, Utils.FrameRestorerMixin):
             if self.shell:
                 self.shell.destroy()
 
+            import IntrospectionClient
+            IntrospectionClient.shutdown()
+
             if getattr(sys, 'boa_ide', None) == self:
                 del sys.boa_ide
 
@@ -470,6 +470,7 @@ class ModulePage:
     def rename(self, oldName, newName):
         del self.editor.modules[oldName]
         self.editor.modules[newName] = self
+        self.editor.watchModuleFile(self)
 
         item = self.editor.winMenu.FindItemById(self.windowId)
         item.SetText(self.getMenuLabel())
@@ -13,16 +13,16 @@ print 'importing Explorers.CVSExplorer'
 
 """ Explorer classes for CVS browsing and operations """
 
-import time, stat, os
+import os
 
 import wx
 from wx.lib.dialogs import ScrolledMessageDialog
 
 import Utils
-from Preferences import IS
+from Preferences import IS, ILM
 from Utils import _
 
-import ExplorerNodes
+import ExplorerNodes, VCSStatus
 from Models import EditorModels, EditorHelper
 
 import ProcessProgressDlg
@@ -46,25 +46,14 @@ def isCVS(filename):
                       os.path.exists(os.path.join(filename, 'Repository')) and \
                       os.path.exists(os.path.join(filename, 'Root'))
 
-def cvsFileLocallyModified(filename, timestamp):
-    """  cvsFileLocallyModified -> modified, conflict """
-    ismerge = timestamp.split('+')
-    conflict = ismerge[0] == 'Result of merge'
-    filets = time.asctime(time.gmtime(os.stat(filename)[stat.ST_MTIME]))
-    if conflict and len(ismerge) == 1 or ismerge[0][:15] == 'dummy timestamp':
-        filesegs, cvssegs = 1, 0
-    # convert day to int to avoid zero padded differences
-    else:
-        if conflict:
-            filesegs, cvssegs = filets.split(), ismerge[1].split()
-        else:
-            filesegs, cvssegs = filets.split(), timestamp.split()
-        if cvssegs and cvssegs[0] == 'Initial' or len(cvssegs) < 3:
-            cvssegs.append('0')
-        # use day field of dates for comparison
-        filesegs[2], cvssegs[2] = int(filesegs[2]), int(cvssegs[2])
-
-    return (filesegs != cvssegs, conflict)
+def cvsFileStatus(filename):
+    """ cvsFileStatus -> missing, modified, conflict """
+    dirpath, name = os.path.split(filename)
+    try:
+        stamp, conflict = VCSStatus.getEntries('cvs', dirpath).files[name]
+    except (KeyError, EnvironmentError):
+        return False, False, False
+    return VCSStatus.fileStatus(filename, stamp, conflict)
 
 
 class CVSController(ExplorerNodes.Controller):
@@ -125,18 +114,17 @@ class CVSController(ExplorerNodes.Controller):
 ##
 ##        self.fileCVSMenu.AppendMenu(wxID_FSCVSENV, 'CVS shell environment vars', self.cvsEnvMenu)
 
-        self.images = wx.ImageList(16, 16)
-        for cvsImg in ( 'Images/CvsPics/File.png',
-                        'Images/CvsPics/BinaryFile.png',
-                        'Images/CvsPics/ModifiedFile.png',
-                        'Images/CvsPics/ModifiedBinaryFile.png',
-                        'Images/CvsPics/MissingFile.png',
-                        'Images/CvsPics/ConflictingFile.png',
-                        'Images/CvsPics/Dir.png',
-                        'Images/Modules/FolderUp.png',
-                        'Images/CvsPics/UnknownDir.png',
-                        'Images/CvsPics/UnknownFile.png'):
-            self.images.Add(IS.load(cvsImg))
+        self.images = ILM.getImageList('vcs', (
+              'Images/CvsPics/File.png',
+              'Images/CvsPics/BinaryFile.png',
+              'Images/CvsPics/ModifiedFile.png',
+              'Images/CvsPics/ModifiedBinaryFile.png',
+              'Images/CvsPics/MissingFile.png',
+              'Images/CvsPics/ConflictingFile.png',
+              'Images/CvsPics/Dir.png',
+              'Images/Modules/FolderUp.png',
+              'Images/CvsPics/UnknownDir.png',
+              'Images/CvsPics/UnknownFile.png'))
 
         self.toolbarMenus = [self.cvsMenuDef]
 
@@ -504,7 +492,7 @@ class CVSFolderNode(ExplorerNodes.ExplorerNode):
 
 class CVSFileNode(ExplorerNodes.ExplorerNode):
     protocol = 'cvs'
-    def __init__(self, entriesLine, resourcepath, parent):
+    def __init__(self, entriesLine, resourcepath, parent, statuses=None):
         if entriesLine:
             name , self.revision, self.timestamp, self.options, self.tagdate = \
               entriesLine.strip()[1:].split('/')
@@ -513,17 +501,17 @@ class CVSFileNode(ExplorerNodes.ExplorerNode):
 
         ExplorerNodes.ExplorerNode.__init__(self, name, resourcepath, None, -1, parent)
 
-        self.missing = False
-        self.modified = False
-        self.conflict = False
-        self.imgIdx = 0
-        if self.timestamp:
-            filename = os.path.abspath(os.path.join(self.resourcepath, '..', name))
-            if os.path.exists(filename):
-                self.modified, self.conflict = cvsFileLocallyModified(filename, self.timestamp)
-            else:
-                self.missing = True
+        # statuses computed by the VCSStatus service, when not given the
+        # status is read now
+        if statuses is None:
+            status = cvsFileStatus(os.path.abspath(
+                  os.path.join(self.resourcepath, '..', name)))
+        else:
+            status = statuses.get(name, (False, False, False))
+        self.setStatus(status)
 
+    def setStatus(self, (missing, modified, conflict)):
+        self.missing, self.modified, self.conflict = missing, modified, conflict
         self.imgIdx = self.missing and self.missing << 2 \
                       or (self.options == '-kb' and not self.modified) \
                       or (self.options == '-kb' and self.modified and 3) \
@@ -589,9 +577,12 @@ class FSCVSFolderNode(ExplorerNodes.ExplorerNode):
         self.vetoSort = True
         self.dirpos = 0
         self.upImgIdx = 7
+        self.statuses = None
+        self.listing = None
 
     def destroy(self):
         self.entries = []
+        self.listing = None
 
     def getDescription(self):
         try:
@@ -628,10 +619,14 @@ class FSCVSFolderNode(ExplorerNodes.ExplorerNode):
             self.dirpos = self.dirpos + 1
         else:
             try:
-                return CVSFileNode(txtEntry, self.resourcepath, self)
+                return CVSFileNode(txtEntry, self.resourcepath, self,
+                                   self.statuses)
             except IOError:
                 return None
 
+    def getWorkingDir(self):
+        return os.path.dirname(self.resourcepath)
+
     def openList(self):
         def readFile(self, name):
             return open(os.path.join(self.resourcepath, name)).read().strip()
@@ -643,12 +638,15 @@ class FSCVSFolderNode(ExplorerNodes.ExplorerNode):
         res = {}
         self.dirpos = 0
         fileEntries = self.parent.openList()
-        txtEntries = open(os.path.join(self.resourcepath, 'Entries')).readlines()
+        txtEntries = VCSStatus.getEntries('cvs', self.getWorkingDir()).lines
         filenames = [f.name for f in fileEntries]
         missingEntries = []
 
+        # shown until the service passes the current statuses to openListing
+        self.statuses = VCSStatus.getService().cachedStatuses('cvs',
+              self.getWorkingDir())
         for txtEntry in txtEntries:
-            cvsNode = self.createChildNode(txtEntry.strip())
+            cvsNode = self.createChildNode(txtEntry)
             if cvsNode:
                 res[cvsNode.name] = cvsNode
                 if cvsNode.name not in filenames:
@@ -672,6 +670,27 @@ class FSCVSFolderNode(ExplorerNodes.ExplorerNode):
         self.entries = lst
         return lst
 
+    def openListing(self):
+        self.listing = listing = ExplorerNodes.nodeListing(self.openList())
+        VCSStatus.getService().request('cvs', self.getWorkingDir(),
+              lambda statuses, listing=listing:
+                  self.updateStatuses(listing, statuses))
+        return listing
+
+    def updateStatuses(self, listing, statuses):
+        """ Called with the statuses computed by the VCSStatus service """
+        changed = []
+        for idx in range(len(listing)):
+            node = listing.getNode(idx)
+            if isinstance(node, CVSFileNode) and statuses.has_key(node.name):
+                node.setStatus(statuses[node.name])
+                if listing.imgIdxs[idx] != node.imgIdx:
+                    listing.imgIdxs[idx] = node.imgIdx
+                    changed.append(idx)
+
+        if changed and listing is self.listing and self.itemsUpdateNotify:
+            self.itemsUpdateNotify(listing, changed)
+
     def open(self, editor):
         return editor.openOrGotoModule(self.resourcepath)
 
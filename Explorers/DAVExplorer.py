@@ -11,7 +11,7 @@
 #-----------------------------------------------------------------------------
 print 'importing Explorers.DAVExplorer'
 
-import os, sys
+import os, sys, time, socket, httplib, threading
 from xml.parsers import expat
 
 import wx
@@ -26,7 +26,7 @@ from Utils import _
 # XXX Zope properties may contain invalid XML content strings (should be encoded)
 
 class XMLListBuilder:
-    def __init__(self, data):
+    def __init__(self, data, report=True):
         self.lists = []
         self.nodeStack = [self.lists]
 
@@ -46,7 +46,8 @@ class XMLListBuilder:
                 raise Exception, _('Invalid XML response: %s') %str(data)
             self.status = parser.Parse(data[xmlStart:xmlEnd+1], 1)
         except:
-            wx.MessageBox(Utils.html2txt(data), _('Error'), wx.ICON_ERROR)
+            if report:
+                wx.MessageBox(Utils.html2txt(data), _('Error'), wx.ICON_ERROR)
             raise
 
     def startElement(self, name, attrs):
@@ -63,6 +64,199 @@ class XMLListBuilder:
             #data = data.encode()
             self.nodeStack[-1].append(data)
 
+def localName(name):
+    return name.split(':')[-1].lower()
+
+def elementText(content):
+    return ''.join([c for c in content if not isinstance(c, tuple)]).strip()
+
+def parseListing(data, report=True):
+    """ Returns [(href, etag, lastmodified), ...] of a multistatus response """
+    entries = []
+    for name, response in XMLListBuilder(data, report).lists[0][1]:
+        if localName(name) != 'response':
+            continue
+        href, props = '', {}
+        for name, content in response:
+            if localName(name) == 'href':
+                href = str(elementText(content))
+            elif localName(name) == 'propstat':
+                for name, propContent in content:
+                    if localName(name) != 'prop':
+                        continue
+                    for propName, value in propContent:
+                        props[localName(propName)] = elementText(value)
+        entries.append( (href, props.get('getetag', ''),
+                         props.get('getlastmodified', '')) )
+    return entries
+
+def collectionKey(uri):
+    return '/' + uri.lstrip('/')
+
+# Only the properties needed to validate listings are requested
+listingRequest = '<?xml version="1.0" encoding="utf-8"?>\n' \
+                 '<d:propfind xmlns:d="DAV:">\n' \
+                 '  <d:prop><d:getetag/><d:getlastmodified/></d:prop>\n' \
+                 '</d:propfind>'
+
+class DAVListingCache:
+    """ Depth 1 listings of collections.
+
+    Entries are used as is while younger than freshness seconds, after that
+    they are revalidated with the ETag of the listing response or else with
+    the collection's own getetag/getlastmodified properties.
+    """
+    freshness = 10
+    size = 200
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # collection key -> [checked, response etag, validator, hrefs]
+        self.listings = {}
+
+    def get(self, uri):
+        self.lock.acquire()
+        try:
+            return self.listings.get(collectionKey(uri))
+        finally:
+            self.lock.release()
+
+    def put(self, uri, etag, validator, hrefs):
+        self.lock.acquire()
+        try:
+            if len(self.listings) >= self.size:
+                self.listings.clear()
+            self.listings[collectionKey(uri)] = \
+                  [time.time(), etag, validator, hrefs]
+        finally:
+            self.lock.release()
+
+    def invalidate(self, uri):
+        """ Forget the listings of uri and of the collection containing it """
+        key = collectionKey(uri)
+        parent = key.rstrip('/')
+        parent = parent[:parent.rfind('/')+1] or '/'
+        self.lock.acquire()
+        try:
+            for key in (key, parent):
+                if self.listings.has_key(key):
+                    del self.listings[key]
+        finally:
+            self.lock.release()
+
+# Errors of reused connections closed by the server while they were idle
+connectionErrors = (socket.error, httplib.HTTPException)
+
+class DAVConnectionPool:
+    """ Keep-alive HTTP connections to the server of a DAV category entry.
+
+    Used by client.Resource to send requests over idle connections instead
+    of connecting for every request, from any thread.
+    """
+    # servers close idle connections after a few seconds (Apache: 5)
+    idleTimeout = 4
+    maxIdle = 4
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.lock = threading.Lock()
+        # [(lastUsed, HTTPConnection), ...]
+        self.idle = []
+        self.listings = DAVListingCache()
+
+    def acquire(self):
+        """ Returns (connection, reused) """
+        now = time.time()
+        self.lock.acquire()
+        try:
+            while self.idle:
+                lastUsed, conn = self.idle.pop()
+                if now - lastUsed < self.idleTimeout:
+                    return conn, True
+                conn.close()
+        finally:
+            self.lock.release()
+        return httplib.HTTPConnection(self.host, self.port), False
+
+    def release(self, conn):
+        self.lock.acquire()
+        try:
+            if len(self.idle) < self.maxIdle:
+                self.idle.append( (time.time(), conn) )
+                return
+        finally:
+            self.lock.release()
+        conn.close()
+
+    def request(self, host, port, method, uri, headers, body):
+        while 1:
+            conn, reused = self.acquire()
+            try:
+                conn.request(method, uri, body, headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except connectionErrors:
+                conn.close()
+                # only retried when the server dropped an idle connection
+                if not reused:
+                    raise
+                continue
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self.release(conn)
+            return client.http_response('HTTP/%s'%(resp.version == 10 and
+                  '1.0' or '1.1'), resp.status, resp.reason, resp.msg, data)
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            idle, self.idle = self.idle, []
+        finally:
+            self.lock.release()
+        for lastUsed, conn in idle:
+            conn.close()
+
+# (host, port, username) -> DAVConnectionPool
+connectionPools = {}
+
+def getConnectionPool(props):
+    key = (props['host'], props['port'], props['username'])
+    if not connectionPools.has_key(key):
+        connectionPools[key] = DAVConnectionPool(props['host'],
+                                                 int(props['port']))
+    return connectionPools[key]
+
+def benchmarkFolderOpen(props, path='', count=10):
+    """ Average seconds to list a folder with a connection per request (as
+        Boa used to), over a keep-alive connection and from the validated
+        listing cache """
+    url = ('http://%(host)s:%(port)s/'%props) + path
+    resource = client.Resource(url, props['username'], props['passwd'])
+    start = time.time()
+    for i in range(count):
+        parseListing(resource.propfind('', 1).body, False)
+    perConnection = (time.time() - start) / count
+
+    pool = getConnectionPool(props)
+    resource = client.Resource(url, props['username'], props['passwd'], pool)
+    start = time.time()
+    for i in range(count):
+        parseListing(resource.propfind(listingRequest, 1).body, False)
+    keepAlive = (time.time() - start) / count
+
+    node = DAVItemNode('', props, path, None, -1, None)
+    node.listHrefs(False)
+    start = time.time()
+    for i in range(count):
+        pool.listings.get(node.resource.uri)[0] = 0
+        node.listHrefs(False)
+    validated = (time.time() - start) / count
+
+    return perConnection, keepAlive, validated
+
 #---Explorer classes------------------------------------------------------------
 
 wxID_DAVOPEN, wxID_DAVINSPECT = Utils.wxNewIds(2)
@@ -136,6 +330,8 @@ class DAVCatDictCompanion(ExplorerNodes.CategoryDictCompanion):
 class DAVItemNode(ExplorerNodes.ExplorerNode):
     protocol = 'dav'
     connection = False
+    # child folders listed into the cache in the background after a listing
+    prefetchCount = 10
     def __init__(self, name, props, resourcepath, clipboard, imgIdx, parent):
         if not resourcepath:
             resourcepath = '/'
@@ -145,8 +341,9 @@ class DAVItemNode(ExplorerNodes.ExplorerNode):
 
     def initResource(self):
         props = self.properties
+        self.pool = getConnectionPool(props)
         self.resource = client.Resource(('http://%(host)s:%(port)s/'%props)+\
-              self.resourcepath, props['username'], props['passwd'])
+              self.resourcepath, props['username'], props['passwd'], self.pool)
 
     def getURI(self):
         return '%s://%s/%s' % (self.protocol, self.category, self.getTitle())
@@ -174,21 +371,73 @@ class DAVItemNode(ExplorerNodes.ExplorerNode):
 
     def openList(self):
         res = []
-        resp = self.checkResp(self.resource.propfind('', 1))
-        l = XMLListBuilder(resp.body).lists
-        responses = l[0][1]
-        if len(responses) > 0:
-            for resp in l[0][1]:
-                assert resp[1][0][0].strip().lower() == 'd:href',\
-                      'Unexpected xml format'
-                name = str(resp[1][0][1][0].strip())
-                if len(name) > 1:
-                    name = name[1:]
-                    if name == self.resourcepath:
-                        continue
-                    res.append(self.createChildNode(name, self.properties))
+        for name in self.listHrefs():
+            if len(name) > 1:
+                name = name[1:]
+                if name == self.resourcepath:
+                    continue
+                res.append(self.createChildNode(name, self.properties))
+
+        folders = [node for node in res if node.isFolderish()]
+        if folders and self.prefetchCount:
+            thread = threading.Thread(target=self.prefetch,
+                  args=(folders[:self.prefetchCount],))
+            thread.setDaemon(True)
+            thread.start()
         return res
 
+    def listHrefs(self, report=True):
+        """ Hrefs of the collection and it's members, cached while valid """
+        listings = self.pool.listings
+        cached = listings.get(self.resource.uri)
+        headers = {}
+        if cached is not None:
+            checked, etag, validator, hrefs = cached
+            if time.time() - checked < listings.freshness:
+                return hrefs
+            if etag:
+                headers['If-None-Match'] = etag
+            elif validator != ('', ''):
+                resp = self.checkResp(self.resource.propfind(listingRequest, 0))
+                entries = parseListing(resp.body, report)
+                if entries and entries[0][1:] == validator:
+                    listings.put(self.resource.uri, etag, validator, hrefs)
+                    return hrefs
+
+        resp = self.resource.propfind(listingRequest, 1, headers=headers)
+        if resp.code == 304 and cached is not None:
+            listings.put(self.resource.uri, etag, validator, hrefs)
+            return hrefs
+        self.checkResp(resp)
+
+        entries = parseListing(resp.body, report)
+        validator = ('', '')
+        key = collectionKey(self.resource.uri)
+        for href, etag, lastModified in entries:
+            if collectionKey(href) == key:
+                validator = (etag, lastModified)
+                break
+        hrefs = [entry[0] for entry in entries]
+        listings.put(self.resource.uri, resp.get_header('etag', ''),
+                     validator, hrefs)
+        return hrefs
+
+    def prefetch(self, nodes):
+        """ List folders into the cache, called in a background thread """
+        for node in nodes:
+            if node.pool.listings.get(node.resource.uri) is not None:
+                continue
+            try:
+                node.listHrefs(report=False)
+            except Exception:
+                # it will be listed (and reported) when it is opened
+                pass
+
+    def invalidate(self, resourcepath=None):
+        if resourcepath is None:
+            resourcepath = self.resourcepath
+        self.pool.listings.invalidate(resourcepath)
+
     def copyFromFS(self, fsNode, fn=''):
         if fsNode.isFolderish():
             if not fn:
@@ -198,6 +447,7 @@ class DAVItemNode(ExplorerNodes.ExplorerNode):
             if not fn:
                 fn = os.path.basename(fsNode.resourcepath)
             newNode = self.createChildNode(self.resourcepath+fn, self.properties)
+            self.invalidate()
             self.checkResp(newNode.resource.put(fsNode.load()))
 
     def copyToFS(self, fsFolderNode, fn=''):
@@ -212,19 +462,26 @@ class DAVItemNode(ExplorerNodes.ExplorerNode):
 
     def moveFileFrom(self, other):
         fn = os.path.basename(other.resourcepath)
+        self.invalidate()
+        other.invalidate()
         self.checkResp(other.resource.move(self.resourcepath + fn))
 
     def copyFileFrom(self, other):
         fn = os.path.basename(other.resourcepath)
+        self.invalidate()
         self.checkResp(other.resource.copy(self.resourcepath + fn))
 
     def deleteItems(self, names):
         absNames = []
+        self.invalidate()
         for name in names:
+            self.invalidate(self.resourcepath+name)
             self.checkResp(self.createChildNode(self.resourcepath+name,
                   self.properties).resource.delete())
 
     def renameItem(self, name, newName):
+        self.invalidate()
+        self.invalidate(self.resourcepath+name)
         self.checkResp(self.createChildNode(self.resourcepath+name,
             self.properties).resource.move(self.resourcepath+newName))
 
@@ -239,16 +496,19 @@ class DAVItemNode(ExplorerNodes.ExplorerNode):
             self.name = os.path.basename(filename)
             self.resourcepath = filename
             self.initResource()
+            self.invalidate()
         try:
             self.checkResp(self.resource.put(data))
         except Exception, error:
             raise ExplorerNodes.TransportSaveError(error, self.resourcepath)
 
     def newFolder(self, name):
+        self.invalidate()
         self.checkResp(self.createChildNode(self.resourcepath+name+'/',
               self.properties).resource.mkcol())
 
     def newBlankDocument(self, name):
+        self.invalidate()
         self.checkResp(self.createChildNode(self.resourcepath+name,
               self.properties).resource.put(' '))
 
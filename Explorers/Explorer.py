@@ -353,13 +353,64 @@ class ExplorerTree(BaseExplorerTree):
         self.defaultBookmarkItem = self.getChildNamed(bktn,
               self.store.bookmarks.getDefault())
 
+class ListedNodes:
+    """ Sequence of the nodes of a NodeListing in display order.
+
+    Nodes are only created when they are accessed.
+    """
+    def __init__(self, listing, order):
+        self.listing = listing
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, idx):
+        return self.listing.getNode(self.order[idx])
+
+    def __iter__(self):
+        for idx in self.order:
+            yield self.listing.getNode(idx)
+
+    def index(self, node):
+        nodes = self.listing.nodes
+        for pos in range(len(self.order)):
+            if nodes.get(self.order[pos]) is node:
+                return pos
+        # not created through this listing yet
+        for pos in range(len(self.order)):
+            if self[pos] is node:
+                return pos
+        raise ValueError, 'node not listed'
+
+    def getName(self, idx):
+        return self.listing.names[self.order[idx]]
+
+    def getImgIdx(self, idx):
+        return self.listing.imgIdxs[self.order[idx]]
+
+    def getFolderish(self):
+        """ Returns the folderish nodes, in display order """
+        folderish = self.listing.folderish
+        return [self.listing.getNode(idx) for idx in self.order
+                if folderish[idx]]
+
 class BaseExplorerList(wx.ListCtrl, Utils.ListCtrlSelectionManagerMix):
+    """ Virtual list of the items of an ExplorerNode.
+
+    Items are drawn on demand from the node's NodeListing, the '..' item is
+    always shown at index 0.
+    """
     def __init__(self, parent, filepath, pos=wx.DefaultPosition,
           size=wx.DefaultSize, updateNotify=None, style=0, menuFunc=None):
         wx.ListCtrl.__init__(self, parent, wxID_PFL, pos=pos, size=size,
-              style=wx.LC_LIST | wx.LC_EDIT_LABELS | wx.CLIP_CHILDREN | style)
+              style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_NO_HEADER | \
+                    wx.LC_EDIT_LABELS | wx.CLIP_CHILDREN | style)
         Utils.ListCtrlSelectionManagerMix.__init__(self)
 
+        self.InsertColumn(0, 'Name')
+        self.Bind(wx.EVT_SIZE, self.OnListSize)
+
         self.filepath = filepath
         self.idxOffset = 0
         self.updateNotify = updateNotify
@@ -369,6 +420,7 @@ class BaseExplorerList(wx.ListCtrl, Utils.ListCtrlSelectionManagerMix):
         self.selected = -1
 
         self.items = None
+        self.listing = None
         self.currImages = None
 
         self._destr = False
@@ -378,12 +430,14 @@ class BaseExplorerList(wx.ListCtrl, Utils.ListCtrlSelectionManagerMix):
     def destroy(self):
         if self._destr: return
 
-        self.DeleteAllItems()
+        self.SetItemCount(0)
 
         if self.node:
+            self.node.unwatchChanges()
             self.node.destroy()
         self.currImages = None
         self.items = None
+        self.listing = None
         self.node = None
         self._destr = True
 
@@ -397,36 +451,35 @@ class BaseExplorerList(wx.ListCtrl, Utils.ListCtrlSelectionManagerMix):
         return self.menuFunc()
 
 #---Selection-------------------------------------------------------------------
+    def findItemNamed(self, name):
+        if name == '..':
+            return 0
+        if self.items:
+            for idx in range(len(self.items)):
+                if self.items.getName(idx) == name:
+                    return idx + self.idxOffset
+        return -1
+
     def selectItemNamed(self, name):
-        for idx in range(self.GetItemCount()):
-            item = self.GetItem(idx)
-            if item.GetText() == name:
-                item.SetState(wx.LIST_STATE_FOCUSED | wx.LIST_STATE_SELECTED)
-                self.SetItem(item)
-                self.EnsureVisible(idx)
-                self.selected = idx
-                return item
+        idx = self.findItemNamed(name)
+        if idx != -1:
+            item = self.selectItemByIdx(idx)
+            self.EnsureVisible(idx)
+            return item
 
     def selectItemByIdx(self, idx):
-        item = self.GetItem(idx)
-        item.SetState(wx.LIST_STATE_FOCUSED | wx.LIST_STATE_SELECTED)
-        self.SetItem(item)
+        state = wx.LIST_STATE_FOCUSED | wx.LIST_STATE_SELECTED
+        self.SetItemState(idx, state, state)
         self.selected = idx
-        return item
+        return self.GetItem(idx)
 
     def hasItemNamed(self, name):
-        for idx in range(self.GetItemCount()):
-            if self.GetItemText(idx) == name:
-                return True
-        return False
+        return self.findItemNamed(name) != -1
 
     def getAllNames(self):
-        names = []
-        for idx in range(self.GetItemCount()):
-            name = self.GetItemText(idx)
-            if name != '..':
-                names.append(name)
-        return names
+        if not self.items:
+            return []
+        return [self.items.getName(idx) for idx in range(len(self.items))]
 
     def getSelection(self):
         # XXX Fix, this can return IndexErrors !!!
@@ -462,6 +515,7 @@ class BaseExplorerList(wx.ListCtrl, Utils.ListCtrlSelectionManagerMix):
         self.selected = -1
 
         if self.node:
+            self.node.unwatchChanges()
             self.node.destroy()
 
         self.node = explNode
@@ -469,38 +523,104 @@ class BaseExplorerList(wx.ListCtrl, Utils.ListCtrlSelectionManagerMix):
         self.currImages = images
 
         # Setup a blank list
-        self.DeleteAllItems()
-        self.items = []
-        self.InsertImageStringItem(self.GetItemCount(), '..', explNode.upImgIdx)
+        self.items = self.listing = None
+        self.idxOffset = 1
+        self.SetItemCount(self.idxOffset)
 
+        explNode.itemsUpdateNotify = self.updateItemImages
         wx.BeginBusyCursor()
-        try: items = explNode.openList()
+        try: listing = explNode.openListing()
         finally: wx.EndBusyCursor()
 
-        # Build a filtered, sorted list
-        orderedList = []
-        for itm in items:
-            name = itm.treename or itm.name
-            if itm.isFolderish() or fnmatch.fnmatch(name, self.localFilter):
-                if Preferences.exCaseInsensitiveSorting:
-                    sortName = name.lower()
-                else:
-                    sortName = name
-                orderedList.append( (not itm.isFolderish(), sortName, name, itm) )
-        if not explNode.vetoSort :
-            orderedList.sort()
+        # Build a filtered, sorted index order, nodes are not created
+        names, folderish = listing.names, listing.folderish
+        if self.localFilter == '*':
+            order = range(len(listing))
+        else:
+            order = [idx for idx in range(len(listing))
+                     if folderish[idx] or
+                        fnmatch.fnmatch(names[idx], self.localFilter)]
+        if not explNode.vetoSort:
+            if Preferences.exCaseInsensitiveSorting:
+                order.sort(key=lambda idx: (not folderish[idx],
+                                            names[idx].lower(), names[idx]))
+            else:
+                order.sort(key=lambda idx: (not folderish[idx], names[idx]))
 
         # Populate the ctrl
-        self.idxOffset = 1
-        for dummy, dummy, name, itm in orderedList:
-            self.items.append(itm)
-            self.InsertImageStringItem(self.GetItemCount(), name, itm.imgIdx)
+        self.listing = listing
+        self.items = ListedNodes(listing, order)
+        self.SetItemCount(len(order) + self.idxOffset)
+        self.Refresh()
 
         self.filepath = explNode.resourcepath
 
+        explNode.watchChanges(self.OnNodeChanged)
+
         if self.updateNotify:
             self.updateNotify()
 
+    def updateItemImages(self, listing, indexes):
+        """ Redraw listed items whose image changed """
+        if listing is not self.listing or not self.items:
+            return
+        changed = {}
+        for idx in indexes:
+            changed[idx] = None
+        order = self.items.order
+        rows = [pos for pos in range(len(order)) if changed.has_key(order[pos])]
+        if rows:
+            self.RefreshItems(rows[0] + self.idxOffset,
+                              rows[-1] + self.idxOffset)
+
+    def refreshChanged(self):
+        """ Relist the current node, keeping the selection and scroll position """
+        selected = [self.items.getName(idx) for idx in self.getMultiSelection()]
+        focused = self.selected
+        top = self.GetTopItem()
+
+        self.refreshCurrent()
+
+        for name in selected:
+            idx = self.findItemNamed(name)
+            if idx != -1:
+                self.SetItemState(idx, wx.LIST_STATE_SELECTED,
+                                       wx.LIST_STATE_SELECTED)
+                if self.selected == -1 or idx == focused:
+                    self.selected = idx
+        if top > 0 and top < self.GetItemCount():
+            self.EnsureVisible(self.GetItemCount()-1)
+            self.EnsureVisible(top)
+
+    def OnNodeChanged(self, dirpath, names):
+        """ Called with the names of entries of dirpath that changed on disk """
+        if not self.node or self.listing is None:
+            return
+        # only relist when entries were added or removed, this also ignores
+        # changes the list already shows (e.g. after renaming an item)
+        listed = {}
+        for name in self.listing.names:
+            listed[name] = None
+        for name in names.keys() or [None]:
+            if name is None or \
+                  listed.has_key(name) != path.exists(path.join(dirpath, name)):
+                self.refreshChanged()
+                return
+
+    def OnGetItemText(self, idx, col):
+        if idx < self.idxOffset:
+            return '..'
+        return self.items.getName(idx - self.idxOffset)
+
+    def OnGetItemImage(self, idx):
+        if idx < self.idxOffset:
+            return self.node.upImgIdx
+        return self.items.getImgIdx(idx - self.idxOffset)
+
+    def OnListSize(self, event):
+        self.SetColumnWidth(0, self.GetClientSize().width)
+        event.Skip()
+
     def openNodeInEditor(self, item, editor, recentFiles):
         if self.node.parentOpensChildren:
             res = self.node.open(item, editor)
@@ -675,7 +795,7 @@ class BaseExplorerSplitter(wx.SplitterWindow):
                 if item.isFolderish():
                     tItm = tree.GetSelection()
                     if not tree.IsExpanded(tItm):
-                        tree.itemCache = self.list.items
+                        tree.itemCache = self.list.items.getFolderish()
                         try: tree.Expand(tItm)
                         finally: tree.itemCache = None
                     chid = tree.getChildNamed(tree.GetSelection(), name)
@@ -324,6 +324,36 @@ class TransportCategoryError(TransportError):
             return self.msg
 
 
+class NodeListing:
+    """ Compact column store of the items of an opened node.
+
+    Only the names, image indexes and folderish flags of the items are kept,
+    the ExplorerNode of an item is created when it is asked for.
+    """
+    def __init__(self, names, imgIdxs, folderish, createNode):
+        self.names = names
+        self.imgIdxs = imgIdxs
+        self.folderish = folderish
+        self.createNode = createNode
+        # index -> created ExplorerNode
+        self.nodes = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def getNode(self, idx):
+        try:
+            return self.nodes[idx]
+        except KeyError:
+            node = self.nodes[idx] = self.createNode(idx)
+            return node
+
+def nodeListing(nodes):
+    """ Return a NodeListing of already created nodes """
+    return NodeListing([node.treename or node.name for node in nodes],
+          [node.imgIdx for node in nodes],
+          [node.isFolderish() for node in nodes], nodes.__getitem__)
+
 class ExplorerNode:
     """ Base class for items in the explorer. """
     # Protocol identifier, used to associate with controller
@@ -350,6 +380,9 @@ class ExplorerNode:
         self.colour = None
         self.vetoRequery = False
         self.vetoSort = False
+        # called with a NodeListing and the indexes of items whose image
+        # changed after the listing was returned
+        self.itemsUpdateNotify = None
         self.upImgIdx = EditorHelper.imgFolderUp
         self.parentOpensChildren = False
         self.ignoreParentDir = False
@@ -365,6 +398,15 @@ class ExplorerNode:
     def createParentNode(self): return self.parent
     def createChildNode(self, value): pass
     def openList(self): pass
+    def openListing(self):
+        """ Return the items as a NodeListing, override to avoid creating
+            a node for every item """
+        return nodeListing(self.openList() or [])
+    def watchChanges(self, notify):
+        """ Call notify(path, names) when items of this node are changed
+            outside the IDE. Returns False when not supported """
+        return False
+    def unwatchChanges(self): pass
     def closeList(self): pass
     def isFolderish(self): return False
     def getTitle(self):
@@ -11,7 +11,7 @@
 #-----------------------------------------------------------------------------
 print 'importing Explorers.FTPExplorer'
 
-import os
+import os, time, copy, socket, threading
 
 import wx
 
@@ -24,6 +24,315 @@ import ftplib
 
 wxID_FTPOPEN = wx.NewId()
 
+# Errors after which a connection can not be used again
+connectionErrors = (socket.error, EOFError)
+# Errors that may or may not have ended the connection, see connectionLost
+replyErrors = connectionErrors + (ftplib.error_temp,)
+
+def connectionLost(error):
+    """ True when error ended the connection. Transient 4xx replies (e.g.
+        450 file busy) leave it usable, except 421 which closes it """
+    if isinstance(error, ftplib.error_temp):
+        return str(error)[:3] == '421'
+    return isinstance(error, connectionErrors)
+
+class FTPListingCache:
+    """ Least recently used directory listings that expire after ttl seconds """
+    def __init__(self, size=100, ttl=300):
+        self.size = size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # path -> (time, [ZopeFTPItem, ...])
+        self.listings = {}
+        # paths, least recently used first
+        self.order = []
+
+    def get(self, path):
+        self.lock.acquire()
+        try:
+            if not self.listings.has_key(path):
+                return None
+            listed, items = self.listings[path]
+            self.order.remove(path)
+            if time.time() - listed > self.ttl:
+                del self.listings[path]
+                return None
+            self.order.append(path)
+        finally:
+            self.lock.release()
+        # nodes change their items when saved under another name
+        return [copy.copy(item) for item in items]
+
+    def put(self, path, items):
+        self.lock.acquire()
+        try:
+            if self.listings.has_key(path):
+                self.order.remove(path)
+            elif len(self.order) >= self.size:
+                del self.listings[self.order.pop(0)]
+            self.listings[path] = (time.time(),
+                  [copy.copy(item) for item in items])
+            self.order.append(path)
+        finally:
+            self.lock.release()
+
+    def invalidate(self, path):
+        """ Forget the listings of path and of the folder containing it """
+        self.lock.acquire()
+        try:
+            for dirpath in (path, os.path.dirname(path) or '/'):
+                if self.listings.has_key(dirpath):
+                    del self.listings[dirpath]
+                    self.order.remove(dirpath)
+        finally:
+            self.lock.release()
+
+class FTPConnectionPool:
+    """ Connections to the server of an FTP category entry.
+
+    Connections are made when needed, reused while they stay alive and kept
+    open by sending NOOPs while idle. Methods of ZopeFTP are run on a free
+    connection through call(), from any thread.
+    """
+    maxConnections = 3
+    keepaliveInterval = 60
+
+    def __init__(self, props):
+        self.props = props
+        self.lock = threading.Lock()
+        self.freed = threading.Condition(self.lock)
+        # [(lastUsed, ZopeFTP), ...]
+        self.idle = []
+        self.busy = 0
+        self.listings = FTPListingCache()
+
+    def connect(self):
+        from ZopeLib import ZopeFTP
+        props = self.props
+        conn = ZopeFTP.ZopeFTP()
+        try:
+            conn.connect(props['username'], props['passwd'], props['host'],
+                         props['port'], props['passive'])
+        except:
+            # don't QUIT a connection that never got going when collected
+            self.close(conn)
+            raise
+        return conn
+
+    def acquire(self, block=True):
+        """ Returns a connected ZopeFTP, or None when none are free and
+            block is False """
+        self.lock.acquire()
+        try:
+            while not self.idle and self.busy >= self.maxConnections:
+                if not block:
+                    return None
+                self.freed.wait()
+            self.busy = self.busy + 1
+            if self.idle:
+                lastUsed, conn = self.idle.pop()
+            else:
+                lastUsed, conn = 0, None
+        finally:
+            self.lock.release()
+
+        try:
+            if conn is not None and \
+                  time.time() - lastUsed > self.keepaliveInterval:
+                try:
+                    conn.noop()
+                except replyErrors, error:
+                    if connectionLost(error):
+                        self.close(conn)
+                        conn = None
+            if conn is None:
+                conn = self.connect()
+        except:
+            self.release(None)
+            raise
+        return conn
+
+    def release(self, conn):
+        """ Return a connection, None for a connection that failed """
+        self.lock.acquire()
+        try:
+            self.busy = self.busy - 1
+            if conn is not None:
+                self.idle.append( (time.time(), conn) )
+            self.freed.notify()
+        finally:
+            self.lock.release()
+
+    def close(self, conn):
+        """ Close a connection without waiting for the server """
+        try:
+            conn.ftp.close()
+        except (socket.error, AttributeError):
+            pass
+        conn.ftp = None
+        conn.connected = False
+
+    def discard(self, conn):
+        """ Close and release a connection that failed """
+        self.close(conn)
+        self.release(None)
+
+    def call(self, method, *args):
+        """ Call a ZopeFTP method, retried once on a fresh connection when an
+            idle connection turned out to be dropped by the server """
+        for attempt in (0, 1):
+            conn = self.acquire()
+            try:
+                result = getattr(conn, method)(*args)
+            except replyErrors, error:
+                if not connectionLost(error):
+                    self.release(conn)
+                    raise
+                self.discard(conn)
+                if attempt:
+                    raise
+            except:
+                self.release(conn)
+                raise
+            else:
+                self.release(conn)
+                return result
+
+    def keepAlive(self):
+        """ Send NOOPs on connections idle for longer than keepaliveInterval """
+        self.lock.acquire()
+        try:
+            idle, self.idle = self.idle, []
+        finally:
+            self.lock.release()
+
+        now = time.time()
+        alive = []
+        for lastUsed, conn in idle:
+            if now - lastUsed > self.keepaliveInterval:
+                try:
+                    conn.noop()
+                except replyErrors, error:
+                    if connectionLost(error):
+                        self.close(conn)
+                        continue
+                lastUsed = now
+            alive.append( (lastUsed, conn) )
+
+        self.lock.acquire()
+        try:
+            self.idle.extend(alive)
+            self.freed.notify()
+        finally:
+            self.lock.release()
+
+    def docItem(self, name, path):
+        from ZopeLib.ZopeFTP import ZopeFTPItem
+        return ZopeFTPItem(path, name, '-rw-rw----', 0, '')
+
+    def folderItem(self, name, path):
+        from ZopeLib.ZopeFTP import ZopeFTPItem
+        return ZopeFTPItem(path, name, 'drw-rw----', 0, '')
+
+    def listDir(self, path):
+        items = self.listings.get(path)
+        if items is None:
+            items = self.call('dir', path)
+            self.listings.put(path, items)
+        return items
+
+    def prefetch(self, paths):
+        """ List folders into the cache on otherwise unused connections """
+        for path in paths:
+            if self.listings.get(path) is not None:
+                continue
+            conn = self.acquire(block=False)
+            if conn is None:
+                return
+            try:
+                items = conn.dir(path)
+            except replyErrors, error:
+                if connectionLost(error):
+                    self.discard(conn)
+                    return
+                self.release(conn)
+                continue
+            except ftplib.Error:
+                self.release(conn)
+                continue
+            self.release(conn)
+            self.listings.put(path, items)
+
+# (category name, host, port, username) -> FTPConnectionPool
+connectionPools = {}
+_keepaliveThread = None
+
+def _keepAlivePools():
+    while 1:
+        time.sleep(FTPConnectionPool.keepaliveInterval / 2)
+        for pool in connectionPools.values():
+            pool.keepAlive()
+
+def getConnectionPool(name, props):
+    global _keepaliveThread
+    key = (name, props['host'], props['port'], props['username'])
+    if not connectionPools.has_key(key):
+        connectionPools[key] = FTPConnectionPool(props)
+    if _keepaliveThread is None:
+        _keepaliveThread = threading.Thread(target=_keepAlivePools)
+        _keepaliveThread.setDaemon(True)
+        _keepaliveThread.start()
+    return connectionPools[key]
+
+def _runTransfer(transfer, func, args):
+    try:
+        transfer.result = func(*args)
+    except Exception, error:
+        transfer.error = error
+
+class FTPTransfer:
+    """ Runs a transfer in a thread while the GUI shows its progress """
+    progressDelay = 0.5
+
+    def __init__(self, title, size=0):
+        self.title = title
+        self.size = size
+        self.done = 0
+        self.result = None
+        self.error = None
+
+    def progress(self, count):
+        """ Called from the transfer thread with the bytes transferred """
+        self.done = self.done + count
+
+    def run(self, func, *args):
+        thread = threading.Thread(target=_runTransfer, args=(self, func, args))
+        thread.setDaemon(True)
+        thread.start()
+
+        start = time.time()
+        dlg = None
+        try:
+            while thread.isAlive():
+                thread.join(0.05)
+                if dlg is None and time.time() - start > self.progressDelay:
+                    dlg = wx.ProgressDialog(self.title, _('Transferring...'),
+                          max(self.size, self.done, 1), None,
+                          wx.PD_APP_MODAL | wx.PD_AUTO_HIDE | wx.PD_ELAPSED_TIME)
+                if dlg is not None:
+                    if self.size:
+                        dlg.Update(min(self.done, self.size),
+                              _('%d of %d bytes')%(self.done, self.size))
+                    else:
+                        dlg.Pulse(_('%d bytes')%self.done)
+        finally:
+            if dlg is not None:
+                dlg.Destroy()
+
+        if self.error is not None:
+            raise self.error
+        return self.result
+
 class FTPController(ExplorerNodes.Controller, ExplorerNodes.ClipboardControllerMix):
     def __init__(self, editor, list, inspector, controllers):
         ExplorerNodes.ClipboardControllerMix.__init__(self)
@@ -72,11 +381,13 @@ class FTPCatNode(ExplorerNodes.CategoryNode):
 class FTPItemNode(ExplorerNodes.ExplorerNode):
     protocol = 'ftp'
     connection = True
-    def __init__(self, name, props, resourcepath, clipboard, isFolder, imgIdx, parent, ftpConn, ftpObj, root):
+    # number of subfolders listed in the background after opening a folder
+    prefetchCount = 10
+    def __init__(self, name, props, resourcepath, clipboard, isFolder, imgIdx, parent, pool, ftpObj, root):
         ExplorerNodes.ExplorerNode.__init__(self, name, resourcepath, clipboard, imgIdx,
               parent, props)
         self.isFolder = isFolder
-        self.ftpConn = ftpConn
+        self.pool = pool
         self.ftpObj = ftpObj
         self.root = root
         self.cache = {}
@@ -91,18 +402,14 @@ class FTPItemNode(ExplorerNodes.ExplorerNode):
         return '%s://%s%s%s' %(self.protocol, self.category,
               self.ftpObj.whole_name(), self.isFolderish() and '/' or '')
 
-    def createChildNode(self, obj, root, respath=None, createConnection=False):
+    def createChildNode(self, obj, root, respath=None):
         if respath is None:
             respath=self.resourcepath+'/'+obj.name
         elif respath[0] != '/':
             respath = '/'+respath
 
-        if createConnection:
-            item = FTPConnectionNode(obj.name, self.properties, respath,
-                self.clipboard, self)
-        else:
-            item = FTPItemNode(obj.name, self.properties, respath,
-                  self.clipboard, False, -1 , self, self.ftpConn, obj, root)
+        item = FTPItemNode(obj.name, self.properties, respath,
+              self.clipboard, False, -1 , self, self.pool, obj, root)
 
         if item.isFolderish():
             item.imgIdx = EditorHelper.imgFolder
@@ -113,11 +420,13 @@ class FTPItemNode(ExplorerNodes.ExplorerNode):
         return item
 
     def openList(self, root=None):
-        items = self.ftpConn.dir(self.ftpObj.whole_name())
+        path = self.ftpObj.whole_name()
+        items = FTPTransfer(_('Listing %s')%path).run(self.pool.listDir, path)
 
         if not root: root = self.root
         self.cache = {}
         result = []
+        folders = []
         for obj in items:
             if obj.name in ('', '.', '..'):
                 continue
@@ -125,25 +434,47 @@ class FTPItemNode(ExplorerNodes.ExplorerNode):
             if z:
                 result.append(z)
                 self.cache[obj.name] = z
+                if obj.isFolder():
+                    folders.append(obj.whole_name())
+
+        if folders and self.prefetchCount:
+            thread = threading.Thread(target=self.pool.prefetch,
+                  args=(folders[:self.prefetchCount],))
+            thread.setDaemon(True)
+            thread.start()
 
         return result
 
+    def invalidate(self, path=None):
+        if path is None:
+            path = self.ftpObj.whole_name()
+        self.pool.listings.invalidate(path)
+
     def deleteItems(self, names):
         for item in names:
-            self.ftpConn.delete(self.cache[item].ftpObj)
+            ftpObj = self.cache[item].ftpObj
+            self.invalidate(ftpObj.whole_name())
+            self.pool.call('delete', ftpObj)
 
     def renameItem(self, name, newName):
-        self.ftpConn.rename(self.cache[name].ftpObj, newName)
+        ftpObj = self.cache[name].ftpObj
+        self.invalidate(ftpObj.whole_name())
+        self.pool.call('rename', ftpObj, newName)
 
     def newFolder(self, name):
-        self.ftpConn.add_folder(name, self.resourcepath)
+        self.invalidate()
+        self.pool.call('add_folder', name, self.resourcepath)
 
     def newBlankDocument(self, name):
-        self.ftpConn.upload(name, self.resourcepath, ' ')
+        self.invalidate()
+        self.pool.call('upload', name, self.resourcepath, ' ')
 
     def load(self, mode='rb'):
         try:
-            return self.ftpConn.load(self.ftpObj)
+            transfer = FTPTransfer(_('Loading %s')%self.name,
+                  int(self.ftpObj.size or 0))
+            return transfer.run(self.pool.call, 'load', self.ftpObj,
+                  transfer.progress)
         except Exception, error:
             raise ExplorerNodes.TransportLoadError(error, self.ftpObj.whole_name())
 
@@ -151,8 +482,11 @@ class FTPItemNode(ExplorerNodes.ExplorerNode):
         if filename != self.currentFilename():
             self.ftpObj.path = os.path.dirname(filename)
             self.ftpObj.name = os.path.basename(filename)
+        self.invalidate(self.ftpObj.whole_name())
         try:
-            self.ftpConn.save(self.ftpObj, data)
+            transfer = FTPTransfer(_('Saving %s')%self.ftpObj.name, len(data))
+            transfer.run(self.pool.call, 'save', self.ftpObj, data,
+                  transfer.progress)
         except Exception, error:
             raise ExplorerNodes.TransportSaveError(error, self.ftpObj.whole_name())
 
@@ -163,82 +497,62 @@ class FTPItemNode(ExplorerNodes.ExplorerNode):
         if isFolder:
             if respath != '/':
                 respath = respath[:-1]
-            return self.createChildNode(self.ftpConn.folder_item(os.path.dirname(respath),
-                os.path.basename(respath)), self.root, respath)
+            return self.createChildNode(self.pool.folderItem(os.path.basename(respath),
+                os.path.dirname(respath)), self.root, respath)
         else:
-            return self.createChildNode(self.ftpConn.add_doc(os.path.dirname(respath),
-                os.path.basename(respath)), self.root, respath)
+            return self.createChildNode(self.pool.docItem(os.path.basename(respath),
+                os.path.dirname(respath)), self.root, respath)
 
 
 class FTPConnectionNode(FTPItemNode):
     def __init__(self, name, properties, respath, clipboard, parent):
-        from ZopeLib import ZopeFTP
-
-        ftpConn = ZopeFTP.ZopeFTP()
+        pool = getConnectionPool(name, properties)
         if respath and respath[-1] == '/':
-            ftpObj = ftpConn.folder_item(os.path.basename(respath),
-                                         os.path.dirname(respath))
+            ftpObj = pool.folderItem(os.path.basename(respath),
+                                     os.path.dirname(respath))
             isFolder = True
         else:
-            ftpObj = ftpConn.add_doc(os.path.basename(respath),
-                                         os.path.dirname(respath))
+            ftpObj = pool.docItem(os.path.basename(respath),
+                                  os.path.dirname(respath))
             isFolder = False
 
         FTPItemNode.__init__(self, '', properties, ftpObj.path, clipboard,
-            isFolder, EditorHelper.imgNetDrive, parent, ftpConn, ftpObj, self)
-        self.connected = False
+            isFolder, EditorHelper.imgNetDrive, parent, pool, ftpObj, self)
         self.treename = name
         self.category = name
 
     def openList(self):
-        self.testConnect()
-        return FTPItemNode.openList(self, self)
-
-    def load(self, mode='rb'):
-        self.testConnect()
-        return FTPItemNode.load(self, mode)
-
-    def save(self, filename, data, mode='wb', overwriteNewer=False):
-        self.testConnect()
-        FTPItemNode.save(self, filename, data, mode, overwriteNewer)
-
-    def createChildNode(self, obj, root, respath=None):
-        return FTPItemNode.createChildNode(self, obj, root, respath, not self.connected)
-
-    def testConnect(self):
-        if not self.connected:
-            try:
-                props = self.properties
-                self.ftpConn.connect(props['username'], props['passwd'],
-                                     props['host'], props['port'],
-                                     props['passive'])
-            except Exception, message:
-                wx.MessageBox(`message.args`, 'Error on connect')
-                raise
-            else:
-                self.connected = True
+        try:
+            return FTPItemNode.openList(self, self)
+        except replyErrors + (ftplib.error_perm,), message:
+            wx.MessageBox(`message.args`, 'Error on connect')
+            raise
 
 
 class FTPExpClipboard(ExplorerNodes.ExplorerClipboard):
-    def pasteFileSysFolder(self, folderpath, nodepath, ftpConn):
-        ftpConn.add_folder(os.path.basename(folderpath), nodepath)
+    def pasteFileSysFolder(self, folderpath, nodepath, pool):
+        pool.call('add_folder', os.path.basename(folderpath), nodepath)
         files = os.listdir(folderpath)
         folder = os.path.basename(folderpath)
         newNodepath = nodepath+'/'+folder
         for file in files:
             file = os.path.join(folderpath, file)
             if os.path.isdir(file):
-                self.pasteFileSysFolder(file, newNodepath, ftpConn)
+                self.pasteFileSysFolder(file, newNodepath, pool)
             else:
-                ftpConn.upload(file, newNodepath)
+                pool.call('upload', file, newNodepath)
 
     def clipPaste_FileSysExpClipboard(self, node, nodes, mode):
         nodepath = node.resourcepath
+        node.invalidate()
         for file in nodes:
             if file.isDir():
-                self.pasteFileSysFolder(file.resourcepath, nodepath, node.ftpConn)
+                FTPTransfer(_('Uploading %s')%file.name).run(
+                      self.pasteFileSysFolder, file.resourcepath, nodepath,
+                      node.pool)
             else:
-                node.ftpConn.upload(file.resourcepath, nodepath)
+                FTPTransfer(_('Uploading %s')%file.name).run(
+                      node.pool.call, 'upload', file.resourcepath, nodepath)
 
 #-------------------------------------------------------------------------------
 ExplorerNodes.register(FTPItemNode, clipboard=FTPExpClipboard,
@@ -11,17 +11,53 @@
 #-----------------------------------------------------------------------------
 print 'importing Explorers.FileExplorer'
 
-import os, time, stat, sys
+import os, time, stat, sys, threading, array
 
 import wx
 
 import Preferences, Utils
 from Utils import _
 
-import ExplorerNodes
+import ExplorerNodes, FileWatcher
 from Models import Controllers, EditorHelper
 from PropEdit import PropertyEditors, InspectorEditorControls
 
+# Classified directory listings, reused while the directory's mtime is unchanged
+# {(path, filter, protocols): (mtime, [[type, NodeClass, name, path, imgIdx,
+#                                        isDir, needsSniff], ...])}
+listingCache = {}
+listingCacheSize = 50
+
+def listingCacheKey(path):
+    return os.path.normcase(os.path.abspath(path))
+
+def invalidateListing(path):
+    """ Forget cached listings of path and of the directory containing it """
+    path = listingCacheKey(path)
+    dirs = (path, os.path.dirname(path))
+    for key in listingCache.keys():
+        if key[0] in dirs:
+            del listingCache[key]
+
+def _watchedChanges(changes):
+    for path, names in changes.items():
+        invalidateListing(path)
+        for name in names.keys():
+            invalidateListing(os.path.join(path, name))
+
+FileWatcher.addListener(_watchedChanges)
+
+def _sniffModels(node, listing, pending):
+    """ Identify models of inspectable files from their headers.
+        Runs in a background thread, results are passed to the GUI thread """
+    models = []
+    for idx, item in pending:
+        try:
+            models.append(Controllers.identifyFile(item[3])[0])
+        except EnvironmentError:
+            models.append(None)
+    wx.CallAfter(node.sniffedModels, listing, pending, models)
+
 class FileSysCatNode(ExplorerNodes.CategoryNode):
 #    protocol = 'config.file'
     itemProtocol = 'file'
@@ -308,8 +344,9 @@ class FileSysExpClipboard(ExplorerNodes.ExplorerClipboard):
     def clipPaste_FTPExpClipboard(self, node, nodes, mode):
         # XXX Pasting a cut from FTP does not delete the cut items from FTP
         for file in nodes:
-            file.ftpConn.download(file.resourcepath,
+            file.pool.call('download', file.resourcepath,
                   os.path.join(node.resourcepath, file.name))
+        invalidateListing(node.resourcepath)
 
     clipPaste_SSHExpClipboard = _genericFSPaste
     clipPaste_ZipExpClipboard = _genericFSPaste
@@ -329,6 +366,11 @@ class FileSysNode(ExplorerNodes.ExplorerNode):
         self.bookmarks = bookmarks
         self.exts = EditorHelper.extMap.keys() + EditorHelper.inspectableFilesReg.keys()
         self.entries = []
+        self.listing = None
+        # set for nodes created from a listing, saves a stat
+        self.knownIsDir = None
+        # (dirpath, notify) while changes are watched
+        self.watched = None
 
         # XXX not used ?
         self.doCVS = True
@@ -338,8 +380,12 @@ class FileSysNode(ExplorerNodes.ExplorerNode):
 
     def destroy(self):
         self.entries = []
+        self.listing = None
+        self.unwatchChanges()
 
     def isDir(self):
+        if self.knownIsDir is not None:
+            return self.knownIsDir
         return os.path.isdir(self.resourcepath)
 
     def isFolderish(self):
@@ -357,43 +403,64 @@ class FileSysNode(ExplorerNodes.ExplorerNode):
     def createChildNode(self, file, filename = ''):
         if not filename:
             filename = os.path.join(self.resourcepath, file)
+        try:
+            mode = os.stat(filename)[stat.ST_MODE]
+        except OSError:
+            return '', None
 
+        res = self.classifyChild(file, filename, mode, sniff=True)
+        if not res:
+            return '', None
+        tp, NodeClass, imgIdx, needsSniff = res
+        return tp, NodeClass(file, filename, self.clipboard, imgIdx, self,
+              self.bookmarks)
+
+    def classifyChild(self, file, filename, mode, sniff=False):
+        """ Classify a directory entry from its name and stat mode.
+
+        Returns (type, node class, image index, needs sniff) or None if the
+        entry is not shown. Unless sniff is set, the header of inspectable
+        files is not read; such entries are marked as needing a sniff and
+        get the default model of their extension.
+        """
         ext = os.path.splitext(filename)[1].lower()
         exts, extSubTypes = self.getFilterExts()
         # Files
-        if ('.*' in exts or ext in exts) and os.path.isfile(filename):
+        if ('.*' in exts or ext in exts) and stat.S_ISREG(mode):
             for Other, otherIdFunc, imgIdx in self.subExplorerReg['file']:
                 if '*' in self.allowedProtocols or \
                       Other.protocol in self.allowedProtocols:
                     if otherIdFunc(filename):
-                        return 'fol', Other(file, filename, self.clipboard,
-                              imgIdx, self, self.bookmarks)
-            Model = Controllers.identifyFile(filename)[0]
+                        return 'fol', Other, imgIdx, False
+
+            needsSniff = Preferences.exInspectInspectableFiles and \
+                  EditorHelper.inspectableFilesReg.has_key(ext) and \
+                  Controllers.identifyFilename(filename)[0] is None
+            if extSubTypes.has_key(ext):
+                sniff = True
+            Model = Controllers.identifyFile(filename,
+                  localfs=sniff or not needsSniff)[0]
             if extSubTypes.has_key(ext):
                 for SubTypeModel in extSubTypes[ext]:
                     if issubclass(Model, SubTypeModel):
                         break
                 else:
-                    return '', None
-            return 'mod', FileSysNode(file, filename, self.clipboard,
-              Model.imgIdx, self, self.bookmarks, {})
-              #{'datetime': time.strftime('%a %b %d %H:%M:%S %Y',
-              #             time.gmtime(os.stat(filename)[stat.ST_MTIME]))})
+                    return None
+            return 'mod', FileSysNode, Model.imgIdx, needsSniff and not sniff
         # Directories
-        elif os.path.isdir(filename):
+        elif stat.S_ISDIR(mode):
             for other, otherIdFunc, imgIdx in self.subExplorerReg['folder']:
                 if self.filter == 'BoaFiles' and \
                   '*' in self.allowedProtocols or '*' in self.allowedProtocols or \
                       other.protocol in self.allowedProtocols:
                     if otherIdFunc(filename):
-                        return 'fol', other(file, filename, self.clipboard,
-                              imgIdx, self, self.bookmarks)
-            return 'fol', FileSysNode(file, filename, self.clipboard,
-                  EditorHelper.imgFolder, self, self.bookmarks)
+                        return 'fol', other, imgIdx, False
+            return 'fol', FileSysNode, EditorHelper.imgFolder, False
         else:
-            return '', None
+            return None
 
-    def openList(self):
+    def readListing(self):
+        """ List, stat and classify the directory's entries """
         try:
             #----------------------------------------
             # A hack for locally-encoded filesystems:
@@ -408,17 +475,117 @@ class FileSysNode(ExplorerNodes.ExplorerNode):
         except Exception, err:
             raise ExplorerNodes.TransportError(err)
         files.sort()
-        entries = {'mod': [], 'fol': []}
 
+        listing = []
         for file in files:
-            tp, node = self.createChildNode(file)
-            if node:
-                entries[tp].append(node)
+            filename = os.path.join(self.resourcepath, file)
+            try:
+                mode = os.stat(filename)[stat.ST_MODE]
+            except OSError:
+                # e.g. broken links
+                continue
+            res = self.classifyChild(file, filename, mode)
+            if res:
+                tp, NodeClass, imgIdx, needsSniff = res
+                listing.append([tp, NodeClass, file, filename, imgIdx,
+                                stat.S_ISDIR(mode), needsSniff])
+        return listing
+
+    def watchChanges(self, notify):
+        """ Folders watch their entries, files the directory containing them """
+        self.unwatchChanges()
+        if not Preferences.exWatchFileSystem:
+            return False
+        if self.isDir():
+            path = self.resourcepath
+        else:
+            path = os.path.dirname(self.resourcepath)
+        FileWatcher.getWatcher().watch(path, notify)
+        self.watched = path, notify
+        return True
+
+    def unwatchChanges(self):
+        if self.watched:
+            path, notify = self.watched
+            self.watched = None
+            FileWatcher.getWatcher().unwatch(path, notify)
+
+    def getListingItems(self):
+        """ Return the classified entries, cached while the directory's mtime
+            does not change """
+        try:
+            mtime = os.stat(self.resourcepath)[stat.ST_MTIME]
+        except OSError, err:
+            raise ExplorerNodes.TransportError(err)
+
+        key = (listingCacheKey(self.resourcepath), self.filter,
+               tuple(self.allowedProtocols))
+        cached = listingCache.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        listing = self.readListing()
+        # folders before files
+        listing = [item for item in listing if item[0] == 'fol'] + \
+                  [item for item in listing if item[0] == 'mod']
+        # mtimes have a coarse resolution, only trust them once they
+        # are a little older
+        if time.time() - mtime > 2:
+            if len(listingCache) >= listingCacheSize:
+                listingCache.clear()
+            listingCache[key] = (mtime, listing)
+        return listing
+
+    def createListedNode(self, item):
+        tp, NodeClass, file, filename, imgIdx, isDir, needsSniff = item
+        node = NodeClass(file, filename, self.clipboard, imgIdx, self,
+              self.bookmarks)
+        if isinstance(node, FileSysNode):
+            node.knownIsDir = isDir
+        return node
 
-        self.entries = entries['fol'] + entries['mod']
+    def openListing(self):
+        items = self.getListingItems()
+        self.listing = listing = ExplorerNodes.NodeListing(
+              [item[2] for item in items],
+              array.array('h', [item[4] for item in items]),
+              array.array('b', [item[0] == 'fol' for item in items]),
+              lambda idx, items=items: self.createListedNode(items[idx]))
+
+        pending = [(idx, items[idx]) for idx in range(len(items))
+                   if items[idx][6]]
+        if pending:
+            thread = threading.Thread(target=_sniffModels,
+                  args=(self, listing, pending))
+            thread.setDaemon(True)
+            thread.start()
+
+        return listing
+
+    def openList(self):
+        listing = self.openListing()
+        self.entries = [listing.getNode(idx) for idx in range(len(listing))]
         return self.entries
 
+    def sniffedModels(self, listing, pending, models):
+        """ Called when the headers of inspectable files have been read """
+        changed = []
+        for (idx, item), Model in zip(pending, models):
+            if Model is None:
+                continue
+            # also updates the cached listing
+            item[4], item[6] = Model.imgIdx, False
+            if listing.imgIdxs[idx] != Model.imgIdx:
+                listing.imgIdxs[idx] = Model.imgIdx
+                if listing.nodes.has_key(idx):
+                    listing.nodes[idx].imgIdx = Model.imgIdx
+                changed.append(idx)
+
+        if changed and listing is self.listing and self.itemsUpdateNotify:
+            self.itemsUpdateNotify(listing, changed)
+
     def deleteItems(self, names):
+        invalidateListing(self.resourcepath)
         for name in names:
             path = os.path.join(self.resourcepath, name)
             if os.path.isdir(path):
@@ -427,16 +594,19 @@ class FileSysNode(ExplorerNodes.ExplorerNode):
                 os.remove(path)
 
     def renameItem(self, name, newName):
+        invalidateListing(self.resourcepath)
         oldfile = os.path.join(self.resourcepath, name)
         newfile = os.path.join(self.resourcepath, newName)
         os.rename(oldfile, newfile)
 
     def newFolder(self, name):
+        invalidateListing(self.resourcepath)
         os.mkdir(os.path.join(self.resourcepath, name))
         return name
 
     def newBlankDocument(self, name=''):
         newpath = os.path.join(self.resourcepath, name)
+        invalidateListing(self.resourcepath)
         if not os.path.exists(newpath):
             open(newpath, 'w').write(' ')
         return name
@@ -444,6 +614,7 @@ class FileSysNode(ExplorerNodes.ExplorerNode):
     def copyFileFrom(self, node):
         """ Copy node into self (only called for folders)"""
         import shutil
+        invalidateListing(self.resourcepath)
         if not node.isDir():
             if node.resourcepath == os.path.join(self.resourcepath, node.name):
                 newNameBase = os.path.join(self.resourcepath, 'copy%s_of_'+node.name)
@@ -476,6 +647,7 @@ class FileSysNode(ExplorerNodes.ExplorerNode):
             raise Exception('Cannot move into itself')
 
         self.copyFileFrom(node)
+        invalidateListing(node.resourcepath)
         if not node.isFolderish():
             os.remove(node.resourcepath)
         else:
@@ -505,6 +677,9 @@ class FileSysNode(ExplorerNodes.ExplorerNode):
         if self.resourcepath != filename:
             self.resourcepath = filename
             self.name = os.path.basename(self.resourcepath)
+            self.knownIsDir = None
+        # the header and so the model of the file may change
+        invalidateListing(self.resourcepath)
         try:
             if not overwriteNewer and self.fileIsNewer():
                 raise ExplorerNodes.TransportModifiedSaveError(_('This file has '
@@ -545,6 +720,9 @@ class FileSysNode(ExplorerNodes.ExplorerNode):
 
 class ResultsFolderNode(FileSysNode):
     results = []
+    def openListing(self):
+        return ExplorerNodes.ExplorerNode.openListing(self)
+
     def openList(self):
         self.parentOpensChildren = True
         self.results.sort()
@@ -589,9 +767,9 @@ class CurWorkDirNode(FileSysNode):
         self.bold = True
         #self.setFilter('AllFiles')
 
-    def openList(self):
+    def openListing(self):
         self.cwd = self.resourcepath = os.path.abspath(os.getcwd())
-        return FileSysNode.openList(self)
+        return FileSysNode.openListing(self)
 
     def getTitle(self):
         return 'os.cwd://%s'%self.cwd
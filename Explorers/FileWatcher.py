@@ -0,0 +1,343 @@
+#-----------------------------------------------------------------------------
+# Name:        FileWatcher.py
+# Purpose:     Notifies the IDE of changes made to the filesystem by others
+#
+# Author:      Riaan Booysen
+#
+# Created:     2007
+# RCS-ID:      $Id$
+# Copyright:   (c) 2007 Riaan Booysen
+# Licence:     GPL
+#-----------------------------------------------------------------------------
+
+""" Watches directories for files being created, changed, renamed or deleted.
+
+Uses inotify on Linux and falls back to periodically comparing directory
+snapshots elsewhere. Events are collected in a background thread and bursts
+of them (builds, VCS updates) are coalesced before being passed to the GUI
+thread as {dirpath: {name: None}} dictionaries.
+"""
+
+print 'importing Explorers.FileWatcher'
+
+import os, sys, time, stat, select, struct, threading, traceback
+
+import wx
+
+# Called in the GUI thread with all changes before the watchers of directories
+listeners = []
+
+def addListener(func):
+    if func not in listeners:
+        listeners.append(func)
+
+def pathKey(path):
+    return os.path.normcase(os.path.abspath(path))
+
+class BaseFileWatcher:
+    # wait this long for more events before dispatching
+    settleDelay = 0.3
+    # but never delay dispatching longer than this
+    maxDelay = 2.0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # path -> [notify, ...]
+        self.watches = {}
+        # path -> {name: None}
+        self.pending = {}
+        self.firstEvent = self.lastEvent = 0
+        self.thread = None
+
+    def watch(self, path, notify):
+        """ Call notify(path, names) when entries of the directory change """
+        path = pathKey(path)
+        self.lock.acquire()
+        try:
+            if self.watches.has_key(path):
+                self.watches[path].append(notify)
+                return
+            self.watches[path] = [notify]
+        finally:
+            self.lock.release()
+
+        self.addWatch(path)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run)
+            self.thread.setDaemon(True)
+            self.thread.start()
+
+    def unwatch(self, path, notify):
+        path = pathKey(path)
+        self.lock.acquire()
+        try:
+            notifies = self.watches.get(path, [])
+            if notify in notifies:
+                notifies.remove(notify)
+            if notifies or not self.watches.has_key(path):
+                return
+            del self.watches[path]
+        finally:
+            self.lock.release()
+
+        self.removeWatch(path)
+
+    def changed(self, path, name=''):
+        """ Record a change, called from the watching thread """
+        now = time.time()
+        self.lock.acquire()
+        try:
+            if not self.pending:
+                self.firstEvent = now
+            self.lastEvent = now
+            names = self.pending.setdefault(path, {})
+            if name:
+                names[name] = None
+        finally:
+            self.lock.release()
+
+    def run(self):
+        while 1:
+            try:
+                self.step()
+            except Exception:
+                # an unexpected error must not stop watching for good
+                traceback.print_exc()
+                time.sleep(self.settleDelay)
+
+    def step(self):
+        if self.pending:
+            timeout = self.settleDelay
+        else:
+            timeout = None
+        self.waitForChanges(timeout)
+
+        now = time.time()
+        self.lock.acquire()
+        try:
+            settled = self.pending and \
+                  (now - self.lastEvent >= self.settleDelay or
+                   now - self.firstEvent >= self.maxDelay)
+            if settled:
+                changes, self.pending = self.pending, {}
+        finally:
+            self.lock.release()
+
+        if settled:
+            wx.CallAfter(self.dispatch, changes)
+
+    def dispatch(self, changes):
+        for listener in listeners:
+            listener(changes)
+
+        for path, names in changes.items():
+            notified = []
+            for notify in self.watches.get(path, [])[:]:
+                if notify not in notified:
+                    notified.append(notify)
+                    notify(path, names)
+
+#---Backend interface-----------------------------------------------------------
+    def addWatch(self, path):
+        pass
+
+    def removeWatch(self, path):
+        pass
+
+    def waitForChanges(self, timeout):
+        """ Block for at most timeout seconds (or until something changed
+            when None) calling changed() for every change noticed """
+        pass
+
+
+class PollingFileWatcher(BaseFileWatcher):
+    """ Compares snapshots of the watched directories every pollInterval """
+    pollInterval = 2.0
+
+    def __init__(self):
+        BaseFileWatcher.__init__(self)
+        # path -> {name: (mtime, size)}
+        self.snapshots = {}
+
+    def snapshot(self, path):
+        entries = {}
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return entries
+        for name in names:
+            try:
+                st = os.stat(os.path.join(path, name))
+            except OSError:
+                continue
+            entries[name] = (st[stat.ST_MTIME], st[stat.ST_SIZE])
+        return entries
+
+    def addWatch(self, path):
+        snapshot = self.snapshot(path)
+        self.lock.acquire()
+        try:
+            self.snapshots[path] = snapshot
+        finally:
+            self.lock.release()
+
+    def removeWatch(self, path):
+        self.lock.acquire()
+        try:
+            if self.snapshots.has_key(path):
+                del self.snapshots[path]
+        finally:
+            self.lock.release()
+
+    def waitForChanges(self, timeout):
+        if timeout is None:
+            timeout = self.pollInterval
+        time.sleep(timeout)
+
+        self.lock.acquire()
+        try:
+            paths = self.snapshots.keys()
+        finally:
+            self.lock.release()
+
+        for path in paths:
+            old = self.snapshots.get(path)
+            new = self.snapshot(path)
+            if old is None or old == new:
+                continue
+            for name, info in new.items():
+                if old.get(name) != info:
+                    self.changed(path, name)
+            for name in old.keys():
+                if not new.has_key(name):
+                    self.changed(path, name)
+
+            self.lock.acquire()
+            try:
+                if self.snapshots.has_key(path):
+                    self.snapshots[path] = new
+            finally:
+                self.lock.release()
+
+
+IN_MODIFY      = 0x00000002
+IN_ATTRIB      = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+
+inotifyMask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+      IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | \
+      IN_ONLYDIR
+
+inotifyEventHeader = 'iIII'
+inotifyEventHeaderSize = struct.calcsize(inotifyEventHeader)
+
+class InotifyFileWatcher(BaseFileWatcher):
+    """ Uses the Linux inotify API through ctypes """
+    def __init__(self, libc):
+        BaseFileWatcher.__init__(self)
+        self.libc = libc
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            raise OSError, 'inotify_init failed'
+        # wd -> path, path -> wd
+        self.wdPaths = {}
+        self.pathWds = {}
+
+    def addWatch(self, path):
+        fsPath = path
+        if isinstance(fsPath, unicode):
+            fsPath = fsPath.encode(sys.getfilesystemencoding() or 'ascii')
+        wd = self.libc.inotify_add_watch(self.fd, fsPath, inotifyMask)
+        if wd < 0:
+            return
+        self.lock.acquire()
+        try:
+            self.wdPaths[wd] = path
+            self.pathWds[path] = wd
+        finally:
+            self.lock.release()
+
+    def removeWatch(self, path):
+        self.lock.acquire()
+        try:
+            wd = self.pathWds.pop(path, None)
+            if wd is not None:
+                del self.wdPaths[wd]
+        finally:
+            self.lock.release()
+        if wd is not None:
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    def waitForChanges(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError:
+            return
+
+        pos = 0
+        while pos + inotifyEventHeaderSize <= len(data):
+            wd, mask, cookie, nameLen = struct.unpack(inotifyEventHeader,
+                  data[pos:pos+inotifyEventHeaderSize])
+            pos = pos + inotifyEventHeaderSize
+            name = data[pos:pos+nameLen].rstrip('\0')
+            pos = pos + nameLen
+
+            self.lock.acquire()
+            try:
+                if mask & IN_Q_OVERFLOW:
+                    paths = self.pathWds.keys()
+                elif mask & IN_IGNORED:
+                    # the watch is gone, removeWatch may have beaten us to it
+                    path = self.wdPaths.pop(wd, None)
+                    if path is not None and self.pathWds.get(path) == wd:
+                        del self.pathWds[path]
+                else:
+                    path = self.wdPaths.get(wd)
+            finally:
+                self.lock.release()
+
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, everything may have changed
+                for path in paths:
+                    self.changed(path)
+                continue
+
+            if path is None:
+                continue
+            if isinstance(path, unicode):
+                name = name.decode(sys.getfilesystemencoding() or 'ascii',
+                                   'replace')
+            self.changed(path, name)
+
+def createFileWatcher():
+    if sys.platform.startswith('linux'):
+        try:
+            import ctypes, ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c'))
+            libc.inotify_init, libc.inotify_add_watch, libc.inotify_rm_watch
+        except (ImportError, OSError, AttributeError):
+            pass
+        else:
+            try:
+                return InotifyFileWatcher(libc)
+            except OSError:
+                pass
+    return PollingFileWatcher()
+
+_watcher = None
+def getWatcher():
+    global _watcher
+    if _watcher is None:
+        _watcher = createFileWatcher()
+    return _watcher
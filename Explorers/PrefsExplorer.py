@@ -1259,7 +1259,7 @@ class HelpConfigBooksController(ExplorerNodes.Controller):
 
         cd = Help.getCacheDir()
         for name in os.listdir(cd):
-            if os.path.splitext(name)[1] == '.cached':
+            if os.path.splitext(name)[1] in ('.cached', '.index'):
                 os.remove(os.path.join(cd, name))
                 wx.LogMessage(_('Deleted %s')%name)
 
@@ -11,7 +11,7 @@
 #-----------------------------------------------------------------------------
 print 'importing Explorers.SSHExplorer'
 
-import os, sys
+import os, sys, time, random, tempfile, subprocess, threading
 
 import wx
 
@@ -20,10 +20,192 @@ from Utils import _
 
 import ExplorerNodes
 from Models import Controllers, EditorHelper
-from ProcessProgressDlg import ProcessProgressDlg
 
 wxID_SSHOPEN = wx.NewId()
 
+def shellQuote(path):
+    """ Quote a path for the remote shell, leaving a leading ~ expandable """
+    prefix = ''
+    if path == '~' or path.startswith('~/'):
+        prefix, path = '~/', path[2:]
+    return "%s'%s'" % (prefix, path.replace("'", "'\\''"))
+
+def sshArgs(props, controlPath=None):
+    args = ['ssh', '-T', '-l', props['username']]
+    if props.get('cipher'):
+        args.extend(['-c', props['cipher']])
+    if controlPath:
+        args.extend(['-o', 'ControlPath=%s'%controlPath])
+    return args
+
+class SSHSession:
+    """ Long-lived remote shell on a host, shared by all nodes of the host.
+
+    Commands are written to the shell and their output is read up to a
+    marker line carrying the exit status, so only the first command pays for
+    connection setup. On posix the shell's connection is also made an
+    OpenSSH ControlMaster, uploads are run as ssh processes multiplexed over
+    it.
+    """
+    def __init__(self, props):
+        self.props = props
+        self.lock = threading.Lock()
+        self.process = None
+        self.errors = None
+        self.marker = '__boa_ssh_%x__' % random.getrandbits(64)
+        if os.name == 'posix':
+            self.controlPath = os.path.join(tempfile.gettempdir(),
+                  'boa-ssh-%d-%s' % (os.getpid(), self.marker[10:-2]))
+        else:
+            self.controlPath = None
+
+    def isAlive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        args = sshArgs(self.props, self.controlPath)
+        if self.controlPath:
+            args.extend(['-o', 'ControlMaster=auto'])
+        self.errors = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(args + [self.props['host'], 'sh'],
+              stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self.errors)
+
+    def close(self):
+        process, self.process = self.process, None
+        if process is not None:
+            try:
+                process.stdin.close()
+                process.stdout.close()
+            except IOError:
+                pass
+
+    def sshError(self):
+        """ Returns what ssh reported before the shell failed """
+        if self.errors is None:
+            return ''
+        self.errors.seek(0)
+        return self.errors.read().strip()
+
+    def send(self, commands):
+        stdin = self.process.stdin
+        for command in commands:
+            stdin.write("{ %s\n} 2>&1; printf '\\n%s %%d\\n' $?\n" % (
+                  command, self.marker))
+        stdin.flush()
+
+    def readResult(self):
+        """ Returns (status, output) of the next command """
+        lines = []
+        while 1:
+            line = self.process.stdout.readline()
+            if not line:
+                raise EOFError, 'SSH session closed'
+            if line.startswith(self.marker):
+                status = int(line.split()[1])
+                # drop the newline written in front of the marker
+                return status, ''.join(lines)[:-1]
+            lines.append(line)
+
+    def runBatch(self, commands):
+        """ Run commands in one round trip, returns [(status, output), ...] """
+        self.lock.acquire()
+        try:
+            for attempt in (0, 1):
+                if not self.isAlive():
+                    self.start()
+                try:
+                    self.send(commands)
+                    return [self.readResult() for command in commands]
+                except (IOError, EOFError, ValueError, IndexError):
+                    self.close()
+                    if attempt or len(commands) > 1:
+                        raise ExplorerNodes.TransportError(
+                              _('SSH session failed: %s')%self.sshError())
+        finally:
+            self.lock.release()
+
+    def run(self, command):
+        return self.runBatch([command])[0]
+
+    def readFile(self, path):
+        """ Returns the contents of a remote file streamed over the session.
+
+        The file is first copied to a remote temporary file so that the size
+        sent ahead of the data matches it, even when the file is changed
+        while it is read.
+        """
+        self.lock.acquire()
+        try:
+            if not self.isAlive():
+                self.start()
+            stdout = self.process.stdout
+            try:
+                self.process.stdin.write(
+                      't=${TMPDIR:-/tmp}/boa-ssh-read.$$; '
+                      'if (umask 077; cat %s > "$t") 2>/dev/null; '
+                      'then wc -c < "$t" && cat "$t"; s=$?; else s=1; fi; '
+                      'rm -f "$t"; printf \'\\n%s %%d\\n\' $s\n' % (
+                      shellQuote(path), self.marker))
+                self.process.stdin.flush()
+                size = stdout.readline().strip()
+                if not size:
+                    self.readResult()
+                    raise ExplorerNodes.TransportError(
+                          _('File could not be read'))
+                data = stdout.read(int(size))
+                status, rest = self.readResult()
+            except (IOError, EOFError, ValueError, IndexError):
+                self.close()
+                raise ExplorerNodes.TransportError(
+                      _('SSH session failed: %s')%self.sshError())
+        finally:
+            self.lock.release()
+
+        if status or rest:
+            raise ExplorerNodes.TransportError(_('File could not be read'))
+        return data
+
+    def writeFile(self, path, data):
+        """ Stream data to a remote file on a connection multiplexed over the
+            session's """
+        if self.controlPath and not self.isAlive():
+            self.run('true')
+        process = subprocess.Popen(sshArgs(self.props, self.controlPath) + \
+              [self.props['host'], 'cat > %s' % shellQuote(path)],
+              stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+              stderr=subprocess.STDOUT)
+        output = process.communicate(data)[0]
+        if process.returncode:
+            raise ExplorerNodes.TransportError(output.strip())
+
+# (username, host, cipher) -> SSHSession
+sessions = {}
+
+def getSession(props):
+    key = (props['username'], props['host'], props.get('cipher', ''))
+    if not sessions.has_key(key):
+        sessions[key] = SSHSession(props)
+    return sessions[key]
+
+def benchmarkFolderOpen(props, path='~', count=10):
+    """ Average seconds to list a folder with a process per command (as
+        Boa used to) and with the shared session """
+    args = sshArgs(props) + [props['host'], 'ls -la %s' % shellQuote(path)]
+    start = time.time()
+    for i in range(count):
+        subprocess.Popen(args, stdout=subprocess.PIPE,
+              stderr=subprocess.STDOUT).communicate()
+    perProcess = (time.time() - start) / count
+
+    session = getSession(props)
+    session.run('true')
+    start = time.time()
+    for i in range(count):
+        session.run('ls -la %s' % shellQuote(path))
+    perSession = (time.time() - start) / count
+
+    return perProcess, perSession
+
 class SSHController(ExplorerNodes.Controller, ExplorerNodes.ClipboardControllerMix):
     def __init__(self, editor, list, inspector, controllers):
         ExplorerNodes.ClipboardControllerMix.__init__(self)
@@ -102,7 +284,7 @@ class SSHItemNode(ExplorerNodes.ExplorerNode):
 
     def openList(self):
         res = []
-        ls = self.execCmd("ls -la '%s'" % self.resourcepath)[1:]
+        ls = self.execCmd("ls -la %s" % shellQuote(self.resourcepath))[1:]
         for line in ls:
             name = line.split(' ')[-1].strip()
             if name and name[-1] == '/':
@@ -111,117 +293,71 @@ class SSHItemNode(ExplorerNodes.ExplorerNode):
                 res.append(self.createChildNode(name, line[0] == 'd', self.properties))
         return res
 
+    def getSession(self):
+        return getSession(self.properties)
+
     def execCmd(self, cmd):
-        dlg = ProcessProgressDlg(None,
-            self.sshCmd(cmd), _('SSH listing'), linesep = '\012')
+        wx.BeginBusyCursor()
         try:
-            if dlg.ShowModal() == wx.OK:
-                return dlg.output
+            status, output = self.getSession().run(cmd)
         finally:
-            dlg.Destroy()
-
-        return []
-
-    def sshCmd(self, command):
-        return 'ssh -v -l %(username)s -c %(cipher)s %(host)s '% self.properties+\
-                command
+            wx.EndBusyCursor()
+        if status:
+            raise ExplorerNodes.TransportError(output)
+        return output.splitlines()
 
     def remotePath(self, filename):
-        return '%(username)s@%(host)s:'%self.properties + self.resourcepath+\
-               (filename and '/'+filename or '')
-
-    def execSCP(self, cmd):
-        dlg = ProcessProgressDlg(None, cmd, 'SCP copy', linesep = '\012')
-        try:
-            dlg.ShowModal()
-        finally:
-            dlg.Destroy()
+        return self.resourcepath + (filename and '/'+filename or '')
 
     def copyFromFS(self, fsNode, fn=''):
         if not fn:
             fn = os.path.basename(fsNode.resourcepath)
-        cwd = os.getcwd()
-        os.chdir(os.path.dirname(fsNode.resourcepath))
-        try:
-            cmd = 'scp "%s" "%s"' % (os.path.basename(fsNode.resourcepath),
-                                 self.remotePath(fn))
-            self.execSCP(cmd)
-        finally:
-            os.chdir(cwd)
+        data = open(fsNode.resourcepath, 'rb').read()
+        self.getSession().writeFile(self.remotePath(fn), data)
 
     def copyToFS(self, fsFolderNode, fn=''):
         if not fn:
             fn = os.path.basename(self.resourcepath)
-        cwd = os.getcwd()
-        os.chdir(fsFolderNode.resourcepath)
-        try:
-            cmd = 'scp "%s" "%s"' % (self.remotePath(''), fn)
-            self.execSCP(cmd)
-        finally:
-            os.chdir(cwd)
+        data = self.getSession().readFile(self.resourcepath)
+        open(os.path.join(fsFolderNode.resourcepath, fn), 'wb').write(data)
 
     def moveFileFrom(self, other):
         fn = os.path.basename(other.resourcepath)
-        self.execCmd("mv '%s' '%s'" % (other.resourcepath,
-                                   self.resourcepath + '/' + fn))
+        self.execCmd("mv %s %s" % (shellQuote(other.resourcepath),
+                                   shellQuote(self.remotePath(fn))))
 
     def copyFileFrom(self, other):
         fn = os.path.basename(other.resourcepath)
-        self.execCmd("cp '%s' '%s'" % (other.resourcepath,
-                                   self.resourcepath + '/' + fn))
+        self.execCmd("cp %s %s" % (shellQuote(other.resourcepath),
+                                   shellQuote(self.remotePath(fn))))
 
     def deleteItems(self, names):
-        absNames = []
-        for name in names:
-            absNames.append(self.resourcepath + '/' +name)
-        self.execCmd("rm -rf '%s'" % ' '.join(absNames))
+        results = self.getSession().runBatch(["rm -rf %s" % \
+              shellQuote(self.remotePath(name)) for name in names])
+        errors = [output for status, output in results if status]
+        if errors:
+            raise ExplorerNodes.TransportError('\n'.join(errors))
 
     def renameItem(self, name, newName):
-        self.execCmd("mv '%s' '%s'" % (self.resourcepath + '/' + name,
-                                   self.resourcepath + '/' + newName))
+        self.execCmd("mv %s %s" % (shellQuote(self.remotePath(name)),
+                                   shellQuote(self.remotePath(newName))))
 
     def newFolder(self, name):
-        self.execCmd("mkdir '%s'" % (self.resourcepath + '/' + name))
+        self.execCmd("mkdir %s" % shellQuote(self.remotePath(name)))
 
     def newBlankDocument(self, name):
-        self.execCmd("echo \" \" > '%s'" % (self.resourcepath + '/' + name))
+        self.execCmd("echo \" \" > %s" % shellQuote(self.remotePath(name)))
 
     def load(self, mode='rb'):
-        from FileExplorer import FileSysNode
-        import tempfile
-        fn = tempfile.mktemp()
-        p, n = os.path.split(fn)
-        fn = os.path.join(p, 'X'+n)
         try:
-            self.copyToFS(FileSysNode('', os.path.dirname(fn), None, -1, None, None), os.path.basename(fn))
-            if os.path.exists(fn):
-                try:
-                    return open(fn, mode).read()
-                finally:
-                    os.remove(fn)
-            else:
-                raise ExplorerNodes.TransportLoadError(
-                      _('File was not downloaded locally.'), self.resourcepath)
+            data = self.getSession().readFile(self.resourcepath)
         except Exception, error:
             raise ExplorerNodes.TransportLoadError(error, self.resourcepath)
+        return data
 
     def save(self, filename, data, mode='wb', overwriteNewer=False):
-        from FileExplorer import FileSysNode
-        import tempfile
-        name = os.path.basename(self.resourcepath)
-        fn = tempfile.mktemp()
-        p, n = os.path.split(fn)
-        fn = os.path.join(p, 'X'+n)
         try:
-            open(fn, mode).write(data)
-            try:
-                parentDir = os.path.dirname(self.resourcepath)
-                parentName = os.path.basename(parentDir)
-                parentSSHNode = self.createChildNode(parentName, 1,
-                      self.properties, parentDir)
-                parentSSHNode.copyFromFS(FileSysNode('', fn, None, -1), name)
-            finally:
-                os.remove(fn)
+            self.getSession().writeFile(self.resourcepath, data)
         except Exception, error:
             raise ExplorerNodes.TransportSaveError(error, self.resourcepath)
 
@@ -255,12 +391,19 @@ class SSHExpClipboard(ExplorerNodes.ExplorerClipboard):
                 node.copyFromFS(clipnode)
 
     def clipPaste_SSHExpClipboard(self, node, nodes, mode):
-        for sshNode in nodes:
-            if mode == 'cut':
-                node.moveFileFrom(sshNode)
-                self.clipNodes = []
-            elif mode == 'copy':
-                node.copyFileFrom(sshNode)
+        if mode == 'cut':
+            cmd = 'mv'
+            self.clipNodes = []
+        else:
+            cmd = 'cp'
+        # one round trip for all items
+        results = node.getSession().runBatch(["%s %s %s" % (cmd,
+              shellQuote(sshNode.resourcepath),
+              shellQuote(node.remotePath(os.path.basename(sshNode.resourcepath))))
+              for sshNode in nodes])
+        errors = [output for status, output in results if status]
+        if errors:
+            raise ExplorerNodes.TransportError('\n'.join(errors))
 
 #-------------------------------------------------------------------------------
 ExplorerNodes.register(SSHItemNode, clipboard=SSHExpClipboard,
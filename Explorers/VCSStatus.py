@@ -0,0 +1,272 @@
+#-----------------------------------------------------------------------------
+# Name:        VCSStatus.py
+# Purpose:     Local status of files in CVS and SVN working copies
+#
+# Author:      Riaan Booysen
+#
+# Created:     2007
+# RCS-ID:      $Id$
+# Copyright:   (c) 2007 Riaan Booysen
+# Licence:     GPL
+#-----------------------------------------------------------------------------
+
+""" Reads the entries of CVS and SVN working copies and works out which files
+are missing, locally modified or in conflict.
+
+Entries files are parsed once and kept until they change on disk, their
+timestamps are converted to seconds while parsing so that the status of a
+file only costs a stat. Statuses of whole working copy trees are computed
+by a worker thread which passes them to the GUI thread.
+"""
+
+print 'importing Explorers.VCSStatus'
+
+import os, calendar, threading
+
+import wx
+from xml.parsers.expat import ExpatError
+
+months = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+          'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
+
+# Stamp of entries that always count as modified
+alwaysModified = -1
+
+def cvsStamp(timestamp):
+    """ Seconds of an asctime style (UTC) CVS timestamp, alwaysModified for
+        dummy, initial and unreadable timestamps """
+    try:
+        wday, month, day, clock, year = timestamp.split()
+        hour, minute, second = clock.split(':')
+        return calendar.timegm((int(year), months[month], int(day),
+              int(hour), int(minute), int(second), 0, 0, 0))
+    except (ValueError, KeyError):
+        return alwaysModified
+
+def svnStamp(texttime):
+    """ Seconds of an SVN text-time like 2007-03-01T12:00:00.000000Z """
+    try:
+        date, clock = texttime[:19].split('T')
+        year, month, day = date.split('-')
+        hour, minute, second = clock.split(':')
+        return calendar.timegm((int(year), int(month), int(day),
+              int(hour), int(minute), int(second), 0, 0, 0))
+    except ValueError:
+        return alwaysModified
+
+class CVSEntries:
+    adminDir = 'CVS'
+    entriesFile = 'Entries'
+
+    def __init__(self, filename):
+        # stripped lines of the Entries file
+        self.lines = []
+        # name -> (stamp, conflict), stamp None when never modified
+        self.files = {}
+
+        f = open(filename)
+        try:
+            for line in f.readlines():
+                line = line.strip()
+                if not line or line == 'D':
+                    continue
+                self.lines.append(line)
+                if line[0] == 'D':
+                    continue
+                segs = line[1:].split('/')
+                if len(segs) < 3:
+                    continue
+                name, timestamp = segs[0], segs[2]
+                if not timestamp:
+                    continue
+                merge = timestamp.split('+')
+                conflict = merge[0] == 'Result of merge'
+                if conflict:
+                    if len(merge) > 1:
+                        stamp = cvsStamp(merge[1])
+                    else:
+                        stamp = alwaysModified
+                else:
+                    stamp = cvsStamp(timestamp)
+                self.files[name] = (stamp, conflict)
+        finally:
+            f.close()
+
+class SVNEntries:
+    adminDir = '.svn'
+    entriesFile = 'entries'
+
+    def __init__(self, filename):
+        # attribute dicts of the named entries
+        self.entries = []
+        # name -> (stamp, conflict), stamp None when never modified
+        self.files = {}
+
+        from xml.parsers import expat
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = self.startElement
+        f = open(filename)
+        try:
+            parser.Parse(f.read(), 1)
+        finally:
+            f.close()
+
+        for entry in self.entries:
+            if entry.get('kind') != 'file':
+                continue
+            if entry.has_key('text-time'):
+                stamp = svnStamp(entry['text-time'])
+            else:
+                stamp = None
+            self.files[entry['name']] = (stamp, False)
+
+    def startElement(self, name, attrs):
+        if name == 'entry' and attrs.get('name'):
+            self.entries.append(attrs)
+
+entriesClasses = {'cvs': CVSEntries, 'svn': SVNEntries}
+
+# entries filename -> ((mtime, size), entries)
+_entriesCache = {}
+maxCachedEntries = 500
+
+def getEntries(kind, dirpath):
+    """ Returns the parsed entries of a working copy directory, read again
+        only when the entries file changed """
+    Entries = entriesClasses[kind]
+    filename = os.path.join(dirpath, Entries.adminDir, Entries.entriesFile)
+    st = os.stat(filename)
+    key = (st.st_mtime, st.st_size)
+    cached = _entriesCache.get(filename)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    entries = Entries(filename)
+    if len(_entriesCache) >= maxCachedEntries:
+        _entriesCache.clear()
+    _entriesCache[filename] = (key, entries)
+    return entries
+
+def fileStatus(filename, stamp, conflict=False):
+    """ Returns (missing, modified, conflict) of a versioned file """
+    try:
+        mtime = int(os.stat(filename).st_mtime)
+    except OSError:
+        return True, False, False
+    return False, stamp is not None and stamp != mtime, conflict
+
+def dirStatuses(kind, dirpath):
+    """ Returns {name: (missing, modified, conflict)} for the versioned
+        files of a working copy directory """
+    statuses = {}
+    for name, (stamp, conflict) in getEntries(kind, dirpath).files.items():
+        statuses[name] = fileStatus(os.path.join(dirpath, name), stamp,
+                                    conflict)
+    return statuses
+
+def isWorkingCopy(kind, dirpath):
+    Entries = entriesClasses[kind]
+    return os.path.isfile(os.path.join(dirpath, Entries.adminDir,
+                                       Entries.entriesFile))
+
+class VCSStatusService:
+    """ Computes statuses of working copy trees in a worker thread.
+
+    The directory asked for is done first and passed to the GUI thread, the
+    rest of the tree is then computed into the cache so that subdirectories
+    can show their statuses immediately when opened. A new request cancels
+    the tree walk of the previous one.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requested = threading.Condition(self.lock)
+        # [(kind, dirpath, notify), ...], newest last
+        self.requests = []
+        # (kind, dirpath) -> {name: (missing, modified, conflict)}
+        self.statuses = {}
+        self.thread = None
+
+    def cachedStatuses(self, kind, dirpath):
+        """ Last known statuses of a directory, {} when not computed yet """
+        self.lock.acquire()
+        try:
+            return self.statuses.get((kind, os.path.abspath(dirpath)), {})
+        finally:
+            self.lock.release()
+
+    def request(self, kind, dirpath, notify=None):
+        """ Compute the statuses of the tree at dirpath, notify(statuses) is
+            called in the GUI thread with the statuses of dirpath itself """
+        dirpath = os.path.abspath(dirpath)
+        self.lock.acquire()
+        try:
+            self.requests.append( (kind, dirpath, notify) )
+            self.requested.notify()
+        finally:
+            self.lock.release()
+
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run)
+            self.thread.setDaemon(True)
+            self.thread.start()
+
+    def hasRequests(self):
+        self.lock.acquire()
+        try:
+            return len(self.requests) > 0
+        finally:
+            self.lock.release()
+
+    def run(self):
+        while 1:
+            self.lock.acquire()
+            try:
+                while not self.requests:
+                    self.requested.wait()
+                kind, dirpath, notify = self.requests.pop()
+            finally:
+                self.lock.release()
+
+            statuses = self.update(kind, dirpath)
+            if notify is not None and statuses is not None:
+                wx.CallAfter(notify, statuses)
+
+            pending = self.subdirs(kind, dirpath)
+            while pending and not self.hasRequests():
+                subdir = pending.pop(0)
+                self.update(kind, subdir)
+                pending.extend(self.subdirs(kind, subdir))
+
+    def update(self, kind, dirpath):
+        try:
+            statuses = dirStatuses(kind, dirpath)
+        except (EnvironmentError, ExpatError):
+            # not (or no longer) a working copy, or unreadable entries
+            return None
+        self.lock.acquire()
+        try:
+            self.statuses[(kind, dirpath)] = statuses
+        finally:
+            self.lock.release()
+        return statuses
+
+    def subdirs(self, kind, dirpath):
+        adminDir = entriesClasses[kind].adminDir
+        try:
+            names = os.listdir(dirpath)
+        except OSError:
+            return []
+        subdirs = []
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if name != adminDir and os.path.isdir(path) and \
+                  isWorkingCopy(kind, path):
+                subdirs.append(path)
+        return subdirs
+
+_service = None
+def getService():
+    global _service
+    if _service is None:
+        _service = VCSStatusService()
+    return _service
@@ -11,11 +11,13 @@
 #-----------------------------------------------------------------------------
 
 print 'importing Explorers.ZipExplorer'
-import os, zipfile, gzip, time
+import os, stat, zipfile, gzip, time, copy, struct, tempfile, zlib, marshal
+import bisect
 from cStringIO import StringIO
 
 import wx
 
+import Preferences
 from Utils import _
 
 import ExplorerNodes, FileExplorer
@@ -26,6 +28,51 @@ from ExternalLib import tarfile
 def isZip(file):
     return os.path.splitext(file)[1] == '.zip'
 
+def copyRawZipEntry(srcFile, zfDst, zi, newName=''):
+    """ Append the entry zi of the zip file open as srcFile to the ZipFile
+        zfDst without decompressing and recompressing it's data """
+    srcFile.seek(zi.header_offset)
+    header = srcFile.read(zipfile.sizeFileHeader)
+    nameLen, extraLen = struct.unpack('<HH', header[26:30])
+    srcFile.seek(zi.header_offset + zipfile.sizeFileHeader + nameLen + extraLen)
+
+    info = copy.copy(zi)
+    if newName:
+        info.filename = newName
+    # sizes and crc are known, written in the local header
+    info.flag_bits = info.flag_bits & ~0x08
+    info.header_offset = zfDst.fp.tell()
+    zfDst.fp.write(info.FileHeader())
+
+    remaining = zi.compress_size
+    while remaining:
+        chunk = srcFile.read(min(remaining, 65536))
+        if not chunk:
+            raise zipfile.BadZipfile, _('Truncated entry %s')%zi.filename
+        zfDst.fp.write(chunk)
+        remaining = remaining - len(chunk)
+
+    zfDst.filelist.append(info)
+    zfDst.NameToInfo[info.filename] = info
+    # make sure close() writes the central directory
+    zfDst._didModify = True
+
+def replaceFile(filename, newFilename):
+    """ Move newFilename over filename, keeping the permissions of filename """
+    if os.path.exists(filename):
+        # temporary files are created owner only
+        st = os.stat(filename)
+        os.chmod(newFilename, stat.S_IMODE(st.st_mode))
+        if hasattr(os, 'chown'):
+            try:
+                os.chown(newFilename, -1, st.st_gid)
+            except OSError:
+                # not a member of the group
+                pass
+    if os.name != 'posix' and os.path.exists(filename):
+        os.remove(filename)
+    os.rename(newFilename, filename)
+
 wxID_ZIPOPEN = wx.NewId()
 
 class ZipController(ExplorerNodes.Controller, ExplorerNodes.ClipboardControllerMix):
@@ -147,7 +194,7 @@ class ZipItemNode(ExplorerNodes.ExplorerNode):
                 else:
                     pref = self.resourcepath + '/'
                 destName = pref+fn[len(fsDirDir)+1:]
-                if destName in self.zipFileNode.allFileNames:
+                if self.zipFileNode.hasFile(destName):
                     replace.append( (destName, fn) )
                 else:
                     new.append( (destName, fn) )
@@ -171,7 +218,7 @@ class ZipItemNode(ExplorerNodes.ExplorerNode):
             # if already in archive, must be replaced, else can be appended
             #arcDir = os.path.dirname(self.resourcepath)
             destName = '/'.join([self.getArcDir(), fn])
-            if destName in self.zipFileNode.allFileNames:
+            if self.zipFileNode.hasFile(destName):
                 # XXX prompt?
                 self.replaceFilesInArchive([(destName, '', data)])
             else:
@@ -189,8 +236,7 @@ class ZipItemNode(ExplorerNodes.ExplorerNode):
     def copyToFS(self, fsFolderNode):
         fn = os.path.join(fsFolderNode.resourcepath, self.name)
 
-        zf = self.ArchiveClass(self.zipFileNode.resourcepath,
-                               compression=self.compression)
+        zf = self.openArchiveReader()
         try:
             if self.isFolderish():
                 try: os.mkdir(fn)
@@ -238,8 +284,13 @@ class ZipItemNode(ExplorerNodes.ExplorerNode):
             zf.close()
         return name
 
+    def openArchiveReader(self):
+        """ Returns an object with read(arcname) and close() methods """
+        return self.ArchiveClass(self.zipFileNode.resourcepath,
+                                 compression=self.compression)
+
     def load(self, mode='rb'):
-        zf = self.ArchiveClass(self.zipFileNode.resourcepath)
+        zf = self.openArchiveReader()
         try:
             return zf.read(self.resourcepath)
         finally:
@@ -255,33 +306,53 @@ class ZipItemNode(ExplorerNodes.ExplorerNode):
         self.replaceFilesInArchive([(oldfile, newfile, None)])
 
     def replaceFilesInArchive(self, filesData):
-        # There seems to be no way to replace a zip entry.
-        # Here the whole archive is recreated
-        zipStream = StringIO(open(self.zipFileNode.resourcepath, 'rb').read())
-        zfSrc = self.ArchiveClass(zipStream, 'r')
+        """ Replace and/or rename entries, filesData is a list of
+        (arcname, newArcname, data) where data None keeps the contents.
+
+        Zip entries can not be replaced in place, so the archive is written
+        to a temporary file which then replaces it. The compressed data of
+        unchanged entries is copied as is.
+        """
+        changes = {}
+        for fn, nfn, data in filesData:
+            changes[fn] = (nfn, data)
+
+        arcPath = self.zipFileNode.resourcepath
+        fd, tmpPath = tempfile.mkstemp('.zip', '',
+              os.path.dirname(os.path.abspath(arcPath)))
+        os.close(fd)
+        changed = False
         try:
-            changed = False
-            zfDst = self.ArchiveClass(self.zipFileNode.resourcepath, 'w', self.compression)
+            srcFile = open(arcPath, 'rb')
             try:
-                for zi in zfSrc.infolist():
-                    for fn, nfn, data in filesData:
-                        if zi.filename == fn:
-                            changed = True
+                zfSrc = self.ArchiveClass(srcFile, 'r')
+                zfDst = self.ArchiveClass(tmpPath, 'w', self.compression)
+                try:
+                    for zi in zfSrc.infolist():
+                        if not changes.has_key(zi.filename):
+                            copyRawZipEntry(srcFile, zfDst, zi)
+                            continue
+
+                        changed = True
+                        nfn, data = changes[zi.filename]
+                        if data is None:
+                            copyRawZipEntry(srcFile, zfDst, zi, nfn)
+                        else:
+                            zi = copy.copy(zi)
                             if nfn:
                                 zi.filename = nfn
-                            if data is None:
-                                zipData = data = zfSrc.read(fn)
-                            else:
-                                zipData = data
-                            break
-                    else:
-                        zipData = zfSrc.read(zi.filename)
-                    zi.size = zi.file_size = len(zipData)
-                    zfDst.writestr(zi, zipData)
+                            zi.file_size = len(data)
+                            zfDst.writestr(zi, data)
+                finally:
+                    zfDst.close()
             finally:
-                zfDst.close()
+                srcFile.close()
+
+            if changed:
+                replaceFile(arcPath, tmpPath)
         finally:
-            zfSrc.close()
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
 
         if changed:
             self.zipFileNode.allFiles = None
@@ -305,6 +376,12 @@ class ZipFileNode(ZipItemNode):
             imgIdx, parent, self, self.ChildClass)
         self.allFiles = None
         self.allFileNames = []
+        # arcname -> info
+        self.infos = {}
+        # folder arcname (without /) -> [child arcname, ...]
+        self.index = {}
+        # (mtime, size) of the archive when it was indexed
+        self.indexedStat = None
         self.category = self.getTitle()+'://'
 
     def getURI(self):
@@ -324,54 +401,64 @@ class ZipFileNode(ZipItemNode):
 
     def openList(self):
         self.updateFilelists()
-        # Add implicit folder entries
-        for filename in self.allFileNames[:]:
-            if filename[-1] == '/':
-                # don't build if zip has folder entries
-                break
-            while 1:
-                filename = os.path.dirname(filename)
-                path = filename +'/'
-                if path == '/':
-                    break
-                if path not in self.allFileNames:
-                    self.allFileNames.insert(0, path)
-                    self.allFiles.insert(0, self.newInfoClass(path))
-
         return ZipItemNode.openList(self, '')
 
+    def hasFile(self, arcname):
+        if self.allFiles is None:
+            self.updateFilelists()
+        return self.infos.has_key(arcname)
+
     def getFiles(self, base, nested=False):
-        files = []
         if self.allFiles is None:
             self.updateFilelists()
 
+        if not nested:
+            return self.index.get(base, [])[:]
+
+        files = []
         for file in self.allFiles:
             if file.filename[-1] == '/':
                 fn = file.filename[:-1]
             else:
                 fn = file.filename
-
-            if nested:
-                if fn.startswith(base):
-                    files.append(file.filename)
-            else:
-                dir = os.path.dirname(fn)
-                dirdir = os.path.dirname(dir)
-                if dir and dirdir == base:
-                    try: idx = files.index(dir+'/')
-                    except ValueError: files.append(dir+'/')
-
-                if dir == base:
-                    try: files.index(file.filename)
-                    except ValueError: files.append(file.filename)
+            if fn.startswith(base):
+                files.append(file.filename)
         return files
 
+    def buildIndex(self):
+        """ Map every folder to it's entries, including folders that are
+            only implied by the paths of files """
+        index = {}
+        listed = {}
+        for filename in self.allFileNames:
+            path = filename
+            while path and not listed.has_key(path):
+                listed[path] = None
+                parent = os.path.dirname(path.rstrip('/'))
+                index.setdefault(parent, []).append(path)
+                path = parent and parent + '/'
+        return index
+
     def updateFilelists(self):
+        st = os.stat(self.resourcepath)
+        arcStat = (st[stat.ST_MTIME], st[stat.ST_SIZE])
+        if self.allFiles is not None and arcStat == self.indexedStat:
+            return
+
+        self.compression, self.allFiles = self.readInfolist()
+        self.allFileNames = [fl.filename for fl in self.allFiles]
+
+        self.infos = {}
+        for info in self.allFiles:
+            self.infos[info.filename] = info
+        self.index = self.buildIndex()
+        self.indexedStat = arcStat
+
+    def readInfolist(self):
+        """ Returns the compression and the infos of the archive's entries """
         zf = self.ArchiveClass(self.resourcepath, 'r')
         try:
-            self.compression = zf.compression
-            self.allFiles = zf.infolist()
-            self.allFileNames = [fl.filename for fl in self.allFiles]
+            return zf.compression, zf.infolist()
         finally:
             zf.close()
 
@@ -413,8 +500,347 @@ def isTarGzip(file):
 
 class TarGzipController(ZipController): pass
 
+def tarNumber(field):
+    if field[:1] == '\x80':
+        # GNU base-256 encoding of large values
+        n = 0L
+        for c in field[1:]:
+            n = (n << 8) + ord(c)
+        return n
+    return long(tarfile.nts(field).strip() or '0', 8)
+
+def tarHeaderInfo(buf):
+    """ TarInfo of a 512 byte header block, None for the end of archive """
+    if buf.count(tarfile.NUL) == tarfile.BLOCKSIZE:
+        return None
+    info = tarfile.TarInfo()
+    try:
+        info.mode = int(tarNumber(buf[100:108]))
+        info.size = tarNumber(buf[124:136])
+        info.mtime = tarNumber(buf[136:148])
+    except ValueError:
+        return None
+    info.type = buf[156:157]
+    info.name = tarfile.nts(buf[0:100])
+    prefix = buf[345:500].rstrip(tarfile.NUL)
+    if tarfile.NUL not in prefix:
+        info.name = tarfile.normpath(os.path.join(prefix, info.name))
+    return info
+
+def tarPaxPath(data):
+    """ The path record of a pax extended header, if any """
+    pos = 0
+    while pos < len(data):
+        space = data.find(' ', pos)
+        if space == -1:
+            break
+        try:
+            length = int(data[pos:space])
+        except ValueError:
+            break
+        if length <= 0:
+            break
+        key, value = data[space+1:pos+length-1].split('=', 1)
+        if key == 'path':
+            return value
+        pos = pos + length
+    return None
+
+class TarGzipStreamReader:
+    """ Sequential reads from the (uncompressed offset, data) chunks of
+        TarGzipIndex.stream() """
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buf = ''
+        self.bufPos = 0
+        # uncompressed offset of the next byte
+        self.pos = 0
+
+    def read(self, size, keep=True):
+        parts = []
+        while size > 0:
+            if self.bufPos >= len(self.buf):
+                try:
+                    self.buf = self.chunks.next()[1]
+                except StopIteration:
+                    break
+                self.bufPos = 0
+            part = self.buf[self.bufPos:self.bufPos+size]
+            self.bufPos = self.bufPos + len(part)
+            self.pos = self.pos + len(part)
+            size = size - len(part)
+            if keep:
+                parts.append(part)
+        return ''.join(parts)
+
+    def skip(self, size):
+        self.read(size, False)
+
+class TarGzipIndex:
+    """ Index of the members of a .tar.gz with checkpoints into it's gzip
+    stream, so that a member can be read by decompressing from the closest
+    checkpoint instead of from the start of the archive.
+
+    The members are found by one scan of the archive and are stored in Boa's
+    rc dir until the archive changes. Checkpoints hold copies of the
+    decompressor, which can not be saved, so they are kept in memory and
+    recreated as reads progress through the archive.
+    """
+    formatVersion = 1
+    chunkSize = 64 * 1024
+    # checkpoints are at least this far apart in the uncompressed stream
+    minSpacing = 1024 * 1024
+    # and spaced to keep about this many per archive
+    maxCheckpoints = 256
+
+    def __init__(self, filename):
+        self.filename = os.path.abspath(filename)
+        st = os.stat(self.filename)
+        self.arcStat = (st.st_mtime, st.st_size)
+        # [(name, type, size, mtime, mode, data offset), ...] or None when
+        # the archive could not be indexed
+        self.members = None
+        # name -> (data offset, size)
+        self.offsets = {}
+
+        self.cpOffsets = [0]
+        # [(uncompressed offset, compressed offset, decompressor), ...]
+        self.checkpoints = [(0, 0, zlib.decompressobj(16 + zlib.MAX_WBITS))]
+        self.spacing = max(self.minSpacing,
+                           self.uncompressedSize() / self.maxCheckpoints)
+
+    def uncompressedSize(self):
+        # gzip trailer holds the size modulo 2**32, good enough for spacing
+        f = open(self.filename, 'rb')
+        try:
+            if self.arcStat[1] < 4:
+                return 0
+            f.seek(-4, 2)
+            return struct.unpack('<I', f.read(4))[0]
+        finally:
+            f.close()
+
+    def isIndexed(self):
+        return self.members is not None
+
+    def stream(self, offset=0):
+        """ Yields (uncompressed offset, data) chunks starting at the
+        checkpoint closest before offset """
+        idx = bisect.bisect_right(self.cpOffsets, offset) - 1
+        uPos, cPos, decomp = self.checkpoints[idx]
+        decomp = decomp.copy()
+        f = open(self.filename, 'rb')
+        try:
+            f.seek(cPos)
+            while 1:
+                chunk = f.read(self.chunkSize)
+                if not chunk:
+                    break
+                cPos = cPos + len(chunk)
+                data = decomp.decompress(chunk)
+                # concatenated gzip members
+                while decomp.unused_data:
+                    rest = decomp.unused_data
+                    decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    try:
+                        data = data + decomp.decompress(rest)
+                    except zlib.error:
+                        # trailing garbage after the last member
+                        if data:
+                            yield uPos, data
+                        return
+                if not data:
+                    continue
+
+                yield uPos, data
+                uPos = uPos + len(data)
+                if uPos - self.cpOffsets[-1] >= self.spacing:
+                    self.cpOffsets.append(uPos)
+                    self.checkpoints.append((uPos, cPos, decomp.copy()))
+        finally:
+            f.close()
+
+    def scan(self):
+        """ Reads the tar headers of the whole archive """
+        members = []
+        reader = TarGzipStreamReader(self.stream(0))
+        longName = None
+        while 1:
+            buf = reader.read(tarfile.BLOCKSIZE)
+            if len(buf) < tarfile.BLOCKSIZE:
+                break
+            info = tarHeaderInfo(buf)
+            if info is None:
+                break
+
+            blocks, remainder = divmod(info.size, tarfile.BLOCKSIZE)
+            if remainder:
+                blocks = blocks + 1
+            dataSize = blocks * tarfile.BLOCKSIZE
+
+            if info.type in (tarfile.GNUTYPE_LONGNAME, 'x'):
+                data = reader.read(dataSize)[:info.size]
+                if info.type == tarfile.GNUTYPE_LONGNAME:
+                    longName = tarfile.nts(data)
+                else:
+                    longName = tarPaxPath(data)
+                continue
+            if longName is not None:
+                info.name, longName = longName, None
+
+            offset = reader.pos
+            if info.type not in tarfile.REGULAR_TYPES:
+                # directories, links and other headers only have data in
+                # their header's extension blocks
+                if info.type in (tarfile.GNUTYPE_LONGLINK, 'g'):
+                    reader.skip(dataSize)
+                continue
+            if info.issparse():
+                # data is not stored contiguously, left to tarfile
+                offset = None
+                info.size = tarNumber(buf[483:495])
+                extended = buf[482:483]
+                while extended not in ('', tarfile.NUL):
+                    extended = reader.read(tarfile.BLOCKSIZE)[504:505]
+            reader.skip(dataSize)
+            members.append((info.name, info.type, info.size, info.mtime,
+                            info.mode, offset))
+
+        self.setMembers(members)
+
+    def setMembers(self, members):
+        self.members = members
+        self.offsets = {}
+        for name, type, size, mtime, mode, offset in members:
+            self.offsets[name] = (offset, size)
+
+    def infolist(self):
+        infos = []
+        for name, type, size, mtime, mode, offset in self.members:
+            info = tarfile.TarInfo(name)
+            info.type, info.size, info.mtime, info.mode = type, size, mtime, mode
+            info.filename = name
+            info.file_size = size
+            info.date_time = time.gmtime(mtime)[:6]
+            infos.append(info)
+        return infos
+
+    def read(self, name):
+        offset, size = self.offsets[name]
+        if offset is None:
+            zf = tarfile.TarFileCompat(self.filename)
+            try:
+                return zf.read(name)
+            finally:
+                zf.close()
+
+        end = offset + size
+        parts = []
+        for pos, data in self.stream(offset):
+            if pos + len(data) <= offset:
+                continue
+            parts.append(data[max(offset - pos, 0):end - pos])
+            if pos + len(data) >= end:
+                break
+        return ''.join(parts)
+
+    def close(self):
+        pass
+
+#---Persistence-----------------------------------------------------------------
+    def getCacheFilename(self):
+        return os.path.join(Preferences.rcPath, 'tarindex', '%s-%08x.idx'%(
+              os.path.basename(self.filename),
+              zlib.crc32(self.filename) & 0xffffffffL))
+
+    def loadCache(self):
+        try:
+            data = marshal.load(open(self.getCacheFilename(), 'rb'))
+        except (IOError, EOFError, ValueError, TypeError):
+            return False
+        if data[:3] != (self.formatVersion, self.filename, self.arcStat):
+            return False
+        self.setMembers(data[3])
+        return True
+
+    def saveCache(self):
+        cacheFilename = self.getCacheFilename()
+        try:
+            if not os.path.isdir(os.path.dirname(cacheFilename)):
+                os.makedirs(os.path.dirname(cacheFilename))
+            marshal.dump((self.formatVersion, self.filename, self.arcStat,
+                          self.members), open(cacheFilename, 'wb'))
+        except (IOError, OSError, ValueError):
+            pass
+
+# path -> TarGzipIndex
+tarGzipIndexes = {}
+maxTarGzipIndexes = 10
+
+def getTarGzipIndex(filename):
+    """ Returns the index of the archive, scanning it if it is not known or
+    changed since it was indexed """
+    filename = os.path.abspath(filename)
+    index = tarGzipIndexes.get(filename)
+    if index is not None:
+        st = os.stat(filename)
+        if index.arcStat == (st.st_mtime, st.st_size):
+            return index
+
+    index = TarGzipIndex(filename)
+    if not index.loadCache():
+        try:
+            index.scan()
+        except (zlib.error, IOError):
+            # not a gzipped tar after all, tarfile will have to deal with it
+            index.members = None
+        else:
+            index.saveCache()
+
+    if len(tarGzipIndexes) >= maxTarGzipIndexes:
+        tarGzipIndexes.clear()
+    tarGzipIndexes[filename] = index
+    return index
+
 class TarGzipInfoMixin:
     InfoClass = tarfile.TarInfo
+    def replaceFilesInArchive(self, filesData):
+        # The whole archive is recreated
+        zipStream = StringIO(open(self.zipFileNode.resourcepath, 'rb').read())
+        zfSrc = self.ArchiveClass(zipStream, 'r')
+        try:
+            changed = False
+            zfDst = self.ArchiveClass(self.zipFileNode.resourcepath, 'w', self.compression)
+            try:
+                for zi in zfSrc.infolist():
+                    for fn, nfn, data in filesData:
+                        if zi.filename == fn:
+                            changed = True
+                            if nfn:
+                                zi.filename = nfn
+                            if data is None:
+                                zipData = data = zfSrc.read(fn)
+                            else:
+                                zipData = data
+                            break
+                    else:
+                        zipData = zfSrc.read(zi.filename)
+                    zi.size = zi.file_size = len(zipData)
+                    zfDst.writestr(zi, zipData)
+            finally:
+                zfDst.close()
+        finally:
+            zfSrc.close()
+
+        if changed:
+            self.zipFileNode.allFiles = None
+
+    def openArchiveReader(self):
+        index = getTarGzipIndex(self.zipFileNode.resourcepath)
+        if index.isIndexed():
+            return index
+        return self.ArchiveClass(self.zipFileNode.resourcepath)
+
     def newInfoClass(self, name):
         info = ZipItemNode.newInfoClass(self, name)
         info.filename = name
@@ -434,12 +860,18 @@ class TarGzipFileNode(TarGzipInfoMixin, ZipFileNode):
 
     def isDir(self, path=''):
         if path:
-            try: idx = self.allFileNames.index(path)
-            except ValueError: return path[-1] == '/'
-            return self.allFiles[idx].isdir()
+            if self.infos.has_key(path):
+                return self.infos[path].isdir()
+            return path[-1] == '/'
         else:
             return False
 
+    def readInfolist(self):
+        index = getTarGzipIndex(self.resourcepath)
+        if index.isIndexed():
+            return tarfile.TAR_GZIPPED, index.infolist()
+        return ZipFileNode.readInfolist(self)
+
 EditorHelper.imgTarGzipFileModel = \
       EditorHelper.addPluginImgs('Images/Modules/TarGzipFile.png')
 class TarGzipFileModel(EditorModels.EditorModel):
@@ -2,13 +2,21 @@ from base64 import *
 import string
 import httplib
 import xmlrpclib
+from StringIO import StringIO
 
 class BasicAuthTransport(xmlrpclib.Transport):
-    def __init__(self,username=None,password=None):
+    def __init__(self,username=None,password=None,connections=None):
         self.username=username
         self.password=password
         self.verbose=0
+        # optional pool of keep-alive connections, see pooled_request
+        self.connections=connections
+    def auth_header(self):
+        return "Basic %s" % string.replace(encodestring("%s:%s" % (self.username, self.password)),"\012", "")
     def request(self,host,handler,request_body,verbose=0):
+        if self.connections is not None:
+            return self.pooled_request(host,handler,request_body)
+
         h=httplib.HTTP(host)
         h.putrequest("POST",handler)
         h.putheader("Host",host)
@@ -16,7 +24,7 @@ class BasicAuthTransport(xmlrpclib.Transport):
         h.putheader("Content-Type","text/xml")
         h.putheader("Content-Length",str(len(request_body)))
         if self.username is not None and self.password is not None:
-            h.putheader("AUTHORIZATION", "Basic %s" % string.replace(encodestring("%s:%s" % (self.username, self.password)),"\012", ""))
+            h.putheader("AUTHORIZATION", self.auth_header())
         h.endheaders()
         if request_body:
             h.send(request_body)
@@ -27,3 +35,17 @@ class BasicAuthTransport(xmlrpclib.Transport):
         if errcode != 200:
             raise xmlrpclib.ProtocolError(host + handler,errcode,errmsg,headers)
         return self.parse_response(h.getfile())
+    def pooled_request(self,host,handler,request_body):
+        # connections.request(method, uri, headers, body) must return
+        # (errcode, errmsg, headers, data)
+        headers={"Host": host, "User-Agent": self.user_agent,
+                 "Content-Type": "text/xml"}
+        if self.username is not None and self.password is not None:
+            headers["Authorization"]=self.auth_header()
+
+        errcode, errmsg, headers, data = self.connections.request("POST",
+              handler, headers, request_body)
+
+        if errcode != 200:
+            raise xmlrpclib.ProtocolError(host + handler,errcode,errmsg,headers)
+        return self.parse_response(StringIO(data))
@@ -53,7 +53,10 @@ class HTTP(httplib.HTTP):
 class Resource:
     """An object representing a web resource."""
 
-    def __init__(self, url, username=None, password=None):
+    def __init__(self, url, username=None, password=None, connections=None):
+        # object with a request(host, port, method, uri, headers, body)
+        # method reusing connections, None for a connection per request
+        self.connections = connections
         self.username = username
         self.password = password
         self.url = url
@@ -69,14 +72,16 @@ class Resource:
     def __getattr__(self, name):
         url = os.path.join(self.url, name)
         return self.__class__(url, username=self.username,
-                              password=self.password)
+                              password=self.password,
+                              connections=self.connections)
 
     def __get_headers(self, kw={}):
         headers = {}
         headers = self.__set_authtoken(headers)
         headers['User-Agent'] = 'WebDAV.client %s' % __version__
         headers['Host'] = self.host
-        headers['Connection'] = 'close'
+        if self.connections is None:
+            headers['Connection'] = 'close'
         headers['Accept'] = '*/*'
         if kw.has_key('headers'):
             for name, val in kw['headers'].items():
@@ -112,6 +117,9 @@ class Resource:
         return MultiPart(args).render()
 
     def __snd_request(self, method, uri, headers={}, body='', eh=1):
+        if self.connections is not None and eh:
+            return self.connections.request(self.host, self.port, method, uri,
+                                            headers, body)
         try:
             h = HTTP()
             h.connect(self.host, self.port)
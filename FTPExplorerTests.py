@@ -0,0 +1,451 @@
+""" Tests of the FTP connection pool, listing cache, transfers and ZopeFTP.
+
+ZopeFTP connections are made to a small FTP server stand-in running in a
+thread of the test process, run with:
+    python FTPExplorerTests.py
+"""
+
+import sys, unittest, ftplib, time, socket, struct, threading, SocketServer
+
+from Explorers import FTPExplorer
+from ZopeLib import ZopeFTP
+
+class StandInFTPHandler(SocketServer.StreamRequestHandler):
+    """ Serves the commands ZopeFTP and ftplib use on one control connection """
+    def handle(self):
+        self.server.opened(self.connection)
+        self.passive = None
+        self.address = None
+        self.reply('220 Stand-in FTP server ready')
+        while 1:
+            line = self.rfile.readline()
+            if not line:
+                return
+            words = line.rstrip('\r\n').split(' ', 1)
+            cmd, arg = words[0].upper(), ''.join(words[1:])
+            reply = self.server.nextReply(cmd)
+            if reply is not None:
+                self.reply(reply)
+                if reply[:3] == '421':
+                    return
+                continue
+            if cmd == 'QUIT':
+                self.reply('221 Bye')
+                return
+            handler = getattr(self, 'ftp_'+cmd, None)
+            if handler is None:
+                self.reply('502 %s not implemented'%cmd)
+            elif handler(arg):
+                return
+
+    def reply(self, line):
+        self.wfile.write(line+'\r\n')
+        self.wfile.flush()
+
+    def reset(self):
+        """ Abort the control connection so the client sees ECONNRESET """
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER,
+              struct.pack('ii', 1, 0))
+        if self.passive is not None:
+            self.passive.close()
+        self.rfile.close()
+        self.wfile.close()
+        self.connection.close()
+
+    def openData(self):
+        if self.passive is not None:
+            conn = self.passive.accept()[0]
+            self.passive.close()
+            self.passive = None
+            return conn
+        return socket.create_connection(self.address)
+
+    # ftp_ methods return True when the connection was closed
+
+    def ftp_USER(self, arg):
+        self.reply('331 Password required')
+
+    def ftp_PASS(self, arg):
+        self.server.logins = self.server.logins + 1
+        self.reply('230 Logged in')
+
+    def ftp_TYPE(self, arg):
+        self.reply('200 Type set to %s'%arg)
+
+    def ftp_NOOP(self, arg):
+        self.server.noops = self.server.noops + 1
+        self.reply('200 NOOP ok')
+
+    def ftp_PASV(self, arg):
+        self.passive = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.passive.bind(('127.0.0.1', 0))
+        self.passive.listen(1)
+        port = self.passive.getsockname()[1]
+        self.reply('227 Entering Passive Mode (127,0,0,1,%d,%d)'%(
+              port >> 8, port & 255))
+
+    def ftp_PORT(self, arg):
+        nums = arg.split(',')
+        self.address = ('.'.join(nums[:4]), int(nums[4]) << 8 | int(nums[5]))
+        self.reply('200 PORT ok')
+
+    def ftp_LIST(self, arg):
+        path = arg or '/'
+        if not self.server.folders.has_key(path):
+            self.reply('550 %s: No such folder'%path)
+            return
+        self.server.listed.append(path)
+        lines = []
+        for name in self.server.folders[path]:
+            whole = path.rstrip('/')+'/'+name
+            if self.server.folders.has_key(whole):
+                lines.append('drwxrwx--- 1 zope zope 0 Jan 01 2007 %s'%name)
+            else:
+                lines.append('-rw-rw---- 1 zope zope %d Jan 01 2007 %s'%(
+                      len(self.server.files[whole]), name))
+        self.sendData(''.join([line+'\r\n' for line in lines]))
+
+    def ftp_RETR(self, arg):
+        if not self.server.files.has_key(arg):
+            self.reply('550 %s: No such file'%arg)
+            return
+        self.sendData(self.server.files[arg].replace('\n', '\r\n'))
+
+    def ftp_STOR(self, arg):
+        self.reply('150 Opening data connection')
+        conn = self.openData()
+        data = []
+        while 1:
+            chunk = conn.recv(8192)
+            if not chunk:
+                break
+            data.append(chunk)
+        conn.close()
+        if self.server.resetStor:
+            self.server.resetStor = self.server.resetStor - 1
+            self.reset()
+            return True
+        self.server.files[arg] = ''.join(data).replace('\r\n', '\n')
+        self.reply('226 Transfer complete')
+
+    def sendData(self, data):
+        self.reply('150 Opening data connection')
+        conn = self.openData()
+        conn.sendall(data)
+        conn.close()
+        self.reply('226 Transfer complete')
+
+class StandInFTPServer(SocketServer.ThreadingTCPServer):
+    """ FTP server on a free local port serving folders and files from
+        dicts, with switches to make it fail the way real servers do """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        SocketServer.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0),
+              StandInFTPHandler)
+        self.port = self.server_address[1]
+        self.folders = {'/': ['a', 'b', 'readme.txt'], '/a': ['c'], '/b': []}
+        self.files = {'/readme.txt': 'first line\nsecond line\n',
+                      '/a/c': 'import os\n'}
+        self.listed = []
+        self.logins = 0
+        self.noops = 0
+        # command -> replies sent instead of handling the next ones
+        self.replies = {}
+        # number of uploads answered by resetting the connection
+        self.resetStor = 0
+        self.connections = []
+        self.lock = threading.Lock()
+
+        thread = threading.Thread(target=self.serve_forever,
+              kwargs={'poll_interval': 0.05})
+        thread.setDaemon(True)
+        thread.start()
+
+    def opened(self, conn):
+        self.lock.acquire()
+        try:
+            self.connections.append(conn)
+        finally:
+            self.lock.release()
+
+    def nextReply(self, cmd):
+        self.lock.acquire()
+        try:
+            if self.replies.get(cmd):
+                return self.replies[cmd].pop(0)
+            return None
+        finally:
+            self.lock.release()
+
+    def dropConnections(self):
+        """ Close the control connections, like servers do to idle clients """
+        self.lock.acquire()
+        try:
+            conns, self.connections = self.connections, []
+        finally:
+            self.lock.release()
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def handle_error(self, request, client_address):
+        # clients are closed without QUIT, as the pool does
+        if not isinstance(sys.exc_info()[1], socket.error):
+            SocketServer.ThreadingTCPServer.handle_error(self, request,
+                  client_address)
+
+    def stop(self):
+        self.shutdown()
+        self.dropConnections()
+        self.server_close()
+
+def freePort():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+class StandInConnectionPool(FTPExplorer.FTPConnectionPool):
+    """ Remembers its connections so tests can close them afterwards """
+    def __init__(self, props):
+        FTPExplorer.FTPConnectionPool.__init__(self, props)
+        self.made = []
+
+    def connect(self):
+        conn = FTPExplorer.FTPConnectionPool.connect(self)
+        self.made.append(conn)
+        return conn
+
+class StandInTestCase(unittest.TestCase):
+    passive = 1
+
+    def setUp(self):
+        self.server = StandInFTPServer()
+        self.pool = StandInConnectionPool({'username': 'test',
+              'passwd': 'secret', 'host': '127.0.0.1',
+              'port': self.server.port, 'passive': self.passive})
+
+    def tearDown(self):
+        for conn in self.pool.made:
+            self.pool.close(conn)
+        self.server.stop()
+
+def names(items):
+    return [item.name for item in items]
+
+class FTPListingCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = FTPExplorer.FTPListingCache(size=2, ttl=300)
+
+    def testGetReturnsCopies(self):
+        self.cache.put('/a', [ZopeFTP.ZopeFTPItem('/a', 'c')])
+        items = self.cache.get('/a')
+        items[0].name = 'renamed'
+        self.assertEqual(names(self.cache.get('/a')), ['c'])
+
+    def testLeastRecentlyUsedIsEvicted(self):
+        self.cache.put('/a', [])
+        self.cache.put('/b', [])
+        self.cache.get('/a')
+        self.cache.put('/c', [])
+        self.assertEqual(self.cache.get('/b'), None)
+        self.assertEqual(self.cache.get('/a'), [])
+        self.assertEqual(self.cache.get('/c'), [])
+
+    def testExpiredListingsAreDropped(self):
+        self.cache.put('/a', [])
+        self.cache.listings['/a'] = (time.time() - 301, [])
+        self.assertEqual(self.cache.get('/a'), None)
+        self.assertEqual(self.cache.order, [])
+
+    def testInvalidateForgetsPathAndParent(self):
+        self.cache = FTPExplorer.FTPListingCache()
+        for path in ('/', '/a', '/b'):
+            self.cache.put(path, [])
+        self.cache.invalidate('/a')
+        self.assertEqual(self.cache.get('/a'), None)
+        self.assertEqual(self.cache.get('/'), None)
+        self.assertEqual(self.cache.get('/b'), [])
+
+class FTPConnectionPoolTests(StandInTestCase):
+    def testConnectionsAreLimited(self):
+        conns = [self.pool.acquire() for i in range(self.pool.maxConnections)]
+        self.assertEqual(self.pool.acquire(block=False), None)
+        self.pool.release(conns[0])
+        self.assert_(self.pool.acquire(block=False) is conns[0])
+        self.assertEqual(self.server.logins, self.pool.maxConnections)
+
+    def testFailedConnectIsReleased(self):
+        self.pool.props['port'] = freePort()
+        self.assertRaises(socket.error, self.pool.acquire)
+        self.assertEqual(self.pool.busy, 0)
+
+    def testIdleConnectionsAreReused(self):
+        self.pool.call('dir', '/a')
+        self.pool.call('dir', '/b')
+        self.assertEqual(self.server.logins, 1)
+
+    def testDroppedIdleConnectionIsRetried(self):
+        self.pool.call('dir', '/')
+        self.server.dropConnections()
+        self.assertEqual(names(self.pool.call('dir', '/a')), ['c'])
+        self.assertEqual(self.server.logins, 2)
+        self.assertEqual(len(self.pool.idle), 1)
+        self.assertEqual(self.pool.busy, 0)
+
+    def testDroppedNewConnectionIsNotRetriedAgain(self):
+        self.server.replies['LIST'] = ['421 Timeout', '421 Timeout']
+        self.assertRaises(ftplib.error_temp, self.pool.call, 'dir', '/')
+        self.assertEqual(self.server.logins, 2)
+        self.assertEqual(self.pool.idle, [])
+        self.assertEqual(self.pool.busy, 0)
+
+    def testTransientReplyKeepsConnection(self):
+        self.server.replies['PASV'] = ['450 File busy']
+        self.assertRaises(ftplib.error_temp, self.pool.call, 'dir', '/')
+        self.assertEqual(len(self.pool.idle), 1)
+        self.pool.call('dir', '/')
+        self.assertEqual(self.server.logins, 1)
+
+    def testClosingReplyDiscardsConnection(self):
+        self.pool.call('dir', '/')
+        self.server.replies['PASV'] = ['421 Timeout']
+        self.assertEqual(names(self.pool.call('dir', '/')),
+              ['a', 'b', 'readme.txt'])
+        self.assertEqual(self.server.logins, 2)
+
+    def testListDirUsesCache(self):
+        self.pool.listDir('/a')
+        self.pool.listDir('/a')
+        self.assertEqual(self.server.listed, ['/a'])
+
+    def testPrefetchFillsCache(self):
+        self.pool.prefetch(['/a', '/b'])
+        self.assertEqual(names(self.pool.listings.get('/a')), ['c'])
+        self.assertEqual(self.pool.listings.get('/b'), [])
+
+    def testPrefetchSkipsUnlistableFolders(self):
+        self.pool.prefetch(['/missing', '/b'])
+        self.assertEqual(self.pool.listings.get('/missing'), None)
+        self.assertEqual(self.pool.listings.get('/b'), [])
+        self.assertEqual(self.server.logins, 1)
+
+    def testPrefetchGivesUpWithoutFreeConnection(self):
+        conns = [self.pool.acquire() for i in range(self.pool.maxConnections)]
+        self.pool.prefetch(['/a'])
+        self.assertEqual(self.pool.listings.get('/a'), None)
+        self.assertEqual(self.pool.busy, self.pool.maxConnections)
+
+    def testKeepAliveSendsNoops(self):
+        self.pool.call('dir', '/')
+        lastUsed, conn = self.pool.idle[0]
+        self.pool.idle[0] = (0, conn)
+        self.pool.keepAlive()
+        self.assertEqual(self.server.noops, 1)
+        self.assert_(self.pool.idle[0][1] is conn)
+        self.assert_(self.pool.idle[0][0] > 0)
+
+    def testKeepAliveDropsDeadConnections(self):
+        self.pool.call('dir', '/')
+        lastUsed, conn = self.pool.idle[0]
+        self.pool.idle[0] = (0, conn)
+        self.server.dropConnections()
+        self.pool.keepAlive()
+        self.assertEqual(self.pool.idle, [])
+
+class ZopeFTPTests(StandInTestCase):
+    def item(self, path, name):
+        return self.pool.docItem(name, path)
+
+    def testDirReadsUnixListing(self):
+        items = self.pool.call('dir', '/')
+        self.assertEqual(names(items), ['a', 'b', 'readme.txt'])
+        self.assertEqual([item.isFolder() for item in items],
+              [True, True, False])
+        self.assertEqual(items[2].path, '/')
+        self.assertEqual(items[2].size, '23')
+
+    def testLoadReportsProgress(self):
+        counts = []
+        data = self.pool.call('load', self.item('/', 'readme.txt'),
+              counts.append)
+        self.assertEqual(data, 'first line\nsecond line')
+        self.assertEqual(counts, [11, 12])
+
+    def testSaveReportsProgress(self):
+        counts = []
+        self.pool.call('save', self.item('/b', 'new.py'), 'a = 1\nb = 2',
+              counts.append)
+        self.assertEqual(self.server.files['/b/new.py'], 'a = 1\nb = 2\n')
+        self.assertEqual(counts, [6, 6])
+
+    def testSaveInActiveMode(self):
+        self.pool.props['passive'] = 0
+        self.pool.call('save', self.item('/b', 'new.py'), 'a = 1')
+        self.assertEqual(self.pool.call('load', self.item('/b', 'new.py')),
+              'a = 1')
+
+    def testReadlineAcceptsSize(self):
+        counts = []
+        item = self.item('/', 'x')
+        item.prepareAsFile('one\ntwo', counts.append)
+        self.assertEqual(item.readline(8193), 'one\n')
+        self.assertEqual(item.readline(8193), 'two\n')
+        self.assertEqual(item.readline(8193), '')
+        self.assertEqual(counts, [4, 4])
+
+    def testNoop(self):
+        conn = self.pool.acquire()
+        conn.noop()
+        self.pool.release(conn)
+        self.assertEqual(self.server.noops, 1)
+
+    def testResetSaveReconnectsAndPreparesItemAgain(self):
+        counts = []
+        self.server.resetStor = 1
+        conn = self.pool.acquire()
+        try:
+            conn.save(self.item('/b', 'new.py'), 'a = 1\nb = 2', counts.append)
+        finally:
+            self.pool.release(conn)
+        self.assertEqual(self.server.files['/b/new.py'], 'a = 1\nb = 2\n')
+        self.assertEqual(counts, [6, 6, 6, 6])
+        self.assertEqual(self.server.logins, 2)
+
+    def testOtherSocketErrorsAreRaised(self):
+        conn = self.pool.acquire()
+        def storlines(cmd, fp):
+            raise socket.error(13, 'Permission denied')
+        conn.ftp.storlines = storlines
+        try:
+            self.assertRaises(socket.error, conn.save,
+                  self.item('/b', 'new.py'), 'a = 1')
+        finally:
+            self.pool.release(conn)
+        self.assertEqual(self.server.logins, 1)
+
+class FTPTransferTests(StandInTestCase):
+    def testResult(self):
+        transfer = FTPExplorer.FTPTransfer('test')
+        self.assertEqual(transfer.run(lambda a, b: a + b, 1, 2), 3)
+
+    def testProgressOfLoad(self):
+        item = self.pool.docItem('readme.txt', '/')
+        transfer = FTPExplorer.FTPTransfer('test', 23)
+        data = transfer.run(self.pool.call, 'load', item, transfer.progress)
+        self.assertEqual(transfer.done, len(data) + 1)
+        self.assertEqual(transfer.done, transfer.size)
+
+    def testErrorIsReraised(self):
+        item = self.pool.docItem('missing.txt', '/')
+        transfer = FTPExplorer.FTPTransfer('test')
+        self.assertRaises(ftplib.error_perm, transfer.run, self.pool.call,
+              'load', item)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,7 +11,7 @@
 #----------------------------------------------------------------------
 #Boa:FramePanel:PyDocHelpPage
 
-import os, sys, marshal, string, socket, webbrowser
+import os, sys, re, marshal, string, socket, threading, webbrowser, zipfile
 
 import wx
 import wx.html
@@ -282,10 +282,35 @@ def showContextHelp(word):
 ##            if os.path.isfile('%s/%s.py'%(libPath, word)):
 ##                word = '%s (standard module)'%word
     if string.strip(word):
-        getHelpController().Display(word).IndexFind(word)
+        # answer from the prebuilt index if it's available, this avoids the
+        # help frame's own index search
+        page = findIndexPage(word)
+        if page is not None:
+            getHelpController().Display(page)
+        else:
+            getHelpController().Display(word).IndexFind(word)
     else:
         getHelpController().DisplayContents()
 
+def findIndexPage(word):
+    """ Page of the best index match for word or None if there is no match or
+    the index is not loaded yet """
+    index = getHelpIndex()
+    if index is not None:
+        matches = index.findKeyword(word)
+        if matches:
+            name, bookPath, page = matches[0]
+            return page
+    return None
+
+def searchHelp(text):
+    """ Full text search of the help books, returns a list of
+    (bookPath, page, title) or None if the index is not loaded yet """
+    index = getHelpIndex()
+    if index is not None:
+        return index.search(text)
+    return None
+
 def decorateWxPythonWithDocStrs(dbfile):
     namespace = Utils.getEntireWxNamespace()
 
@@ -430,6 +455,13 @@ class wxHelpFrameEx:
         else:
             self.indexShowAllBtn, self.indexFindBtn = btn2, btn1
 
+        # the search page is answered from the help index
+        self.searchResults = None
+        for idx in range(self.navPages.GetPageCount()):
+            if self.navPages.GetPageText(idx) == _('Search'):
+                self.initSearchPanel(self.navPages.GetPage(idx))
+                break
+
         if Preferences.usePydocHelp and self.navPages.GetPageCount() == 3:
             self.pdRunServer = self.controller.config.ReadInt('pdRunServer', False)
 
@@ -441,10 +473,32 @@ class wxHelpFrameEx:
 ##    def restore(self):
 ##        Utils.FrameRestorerMixin.restore(self.frame)
 
+    def initSearchPanel(self, panel):
+        self.searchTextCtrl = self.searchBtn = self.searchList = None
+        for child in panel.GetChildren():
+            if isinstance(child, wx.TextCtrl):
+                self.searchTextCtrl = child
+            elif isinstance(child, wx.Button):
+                self.searchBtn = child
+            elif isinstance(child, wx.ListBox):
+                self.searchList = child
+        if not (self.searchTextCtrl and self.searchBtn and self.searchList):
+            return
+
+        # bound on the controls so they are handled before the help window
+        self.searchBtn.Bind(wx.EVT_BUTTON, self.OnSearch)
+        self.searchTextCtrl.Bind(wx.EVT_TEXT_ENTER, self.OnSearch)
+        self.searchList.Bind(wx.EVT_LISTBOX, self.OnSearchSelect)
+
     def IndexFind(self, text):
         self.controller.DisplayIndex()
         self.indexTextCtrl.SetValue(text)
 
+        page = findIndexPage(text)
+        if page is not None:
+            self.controller.Display(page)
+            return
+
         wx.PostEvent(self.indexFindBtn, wx.CommandEvent(wx.wxEVT_COMMAND_BUTTON_CLICKED,
               self.indexFindBtn.GetId()))
 
@@ -471,6 +525,30 @@ class wxHelpFrameEx:
         if anchor:
             self.controller.Display('%s#%s' % (page, string.lower(anchor)))
 
+    def OnSearch(self, event):
+        self.searchResults = searchHelp(self.searchTextCtrl.GetValue())
+        if self.searchResults is None:
+            # still loading the index, let the help window scan the books
+            event.Skip()
+            return
+
+        self.searchList.Set([title for bookPath, page, title in
+                             self.searchResults])
+        if self.searchResults:
+            self.searchList.SetSelection(0)
+            self.showSearchResult(0)
+
+    def OnSearchSelect(self, event):
+        if self.searchResults is None:
+            event.Skip()
+        else:
+            self.showSearchResult(event.GetSelection())
+
+    def showSearchResult(self, idx):
+        bookPath, page, title = self.searchResults[idx]
+        self.html.LoadPage('%s#zip:%s'%(
+              wx.FileSystem.FileNameToURL(bookPath), page))
+
     def OnQuitHelp(self, event):
         self.frame.Close()
 
@@ -531,16 +609,191 @@ def initHelp(calledAtStartup=False):
     cacheDir = getCacheDir()
     _hc.SetTempDir(cacheDir)
 
-    conf = Utils.createAndReadConfig('Explorer')
-    books = eval(conf.get('help', 'books'), {})
-    for book in books:
+    loadHelpIndex()
+
+    for bookPath in getHelpBookPaths():
         if calledAtStartup:
-            print 'Help: loading %s'% os.path.basename(book)
-        bookPath = os.path.normpath(jn(docsDir, book))
+            print 'Help: loading %s'% os.path.basename(bookPath)
         if os.path.exists(bookPath):
             _hc.AddBook(bookPath,
                   not os.path.exists(jn(cacheDir,
-                  os.path.basename(book)+'.cached')) or not calledAtStartup)
+                  os.path.basename(bookPath)+'.cached')) or not calledAtStartup)
+
+def getHelpBookPaths():
+    docsDir = os.path.join(Preferences.pyPath, 'Docs')
+    conf = Utils.createAndReadConfig('Explorer')
+    books = eval(conf.get('help', 'books'), {})
+    return [os.path.normpath(os.path.join(docsDir, book)) for book in books]
+
+#---Help book index-------------------------------------------------------------
+
+class HelpIndex:
+    """ Keyword and full text index of .htb help books.
+
+    Built from the .hhk index and html pages inside the books and persisted
+    in the help cache directory. Books are only re-indexed when their size
+    or modification time changes.
+    """
+    version = 1
+    wordsRe = re.compile('[a-z_][a-z0-9_]{2,}')
+    tagsRe = re.compile('<[^>]*>')
+    titleRe = re.compile('<title>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+    hhkObjectRe = re.compile('<object type="text/sitemap">(.*?)</object>',
+                             re.IGNORECASE | re.DOTALL)
+    hhkParamRe = re.compile('<param name="(Name|Local)" value="([^"]*)">',
+                            re.IGNORECASE)
+    entities = (('&lt;', '<'), ('&gt;', '>'), ('&quot;', '"'), ('&amp;', '&'))
+
+    def __init__(self, filename):
+        self.filename = filename
+        # ordered list of (bookPath, bookData)
+        self.books = []
+
+    def load(self, bookPaths):
+        try:
+            version, cached = marshal.load(open(self.filename, 'rb'))
+        except (IOError, EOFError, ValueError, TypeError):
+            version, cached = None, {}
+        if version != self.version:
+            cached = {}
+
+        changed = False
+        books = []
+        for bookPath in bookPaths:
+            if not os.path.exists(bookPath):
+                continue
+            st = os.stat(bookPath)
+            stamp = (st.st_mtime, st.st_size)
+            bookData = cached.get(bookPath)
+            if bookData is None or tuple(bookData['stamp']) != stamp:
+                bookData = self.indexBook(bookPath)
+                bookData['stamp'] = stamp
+                changed = True
+            books.append( (bookPath, bookData) )
+        self.books = books
+
+        if changed or len(books) != len(cached):
+            self.save()
+
+    def save(self):
+        data = (self.version, dict(self.books))
+        try:
+            marshal.dump(data, open(self.filename, 'wb'))
+        except IOError, err:
+            print 'Help index could not be saved: %s'%err
+
+    def indexBook(self, bookPath):
+        keywords = {}
+        pages = []
+        words = {}
+
+        zf = zipfile.ZipFile(bookPath)
+        try:
+            for name in zf.namelist():
+                ext = os.path.splitext(name)[1].lower()
+                if ext == '.hhk':
+                    for entry in self.hhkObjectRe.findall(zf.read(name)):
+                        params = {}
+                        for param, value in self.hhkParamRe.findall(entry):
+                            params[param.lower()] = value
+                        kw, page = params.get('name'), params.get('local')
+                        if not kw or not page:
+                            continue
+                        for ent, char in self.entities:
+                            kw = kw.replace(ent, char)
+                        keywords.setdefault(kw.lower(), []).append( (kw, page) )
+                elif ext in ('.html', '.htm'):
+                    html = zf.read(name)
+                    title = self.titleRe.search(html)
+                    title = title and ' '.join(title.group(1).split()) or name
+                    pageIdx = len(pages)
+                    pages.append( (name, title) )
+                    text = self.tagsRe.sub(' ', html).lower()
+                    unique = {}
+                    for word in self.wordsRe.findall(text):
+                        unique[word] = None
+                    for word in unique:
+                        words.setdefault(word, []).append(pageIdx)
+        finally:
+            zf.close()
+
+        return {'keywords': keywords, 'pages': pages, 'words': words}
+
+    def findKeyword(self, term):
+        """ Index entries named term, or term qualified like 'term()',
+        'term (module)' and 'term::Method', as a list of
+        (name, bookPath, page) """
+        term = term.strip().lower()
+        prefixes = (term+'()', term+' (', term+'::')
+        exact, qualified = [], []
+        for bookPath, bookData in self.books:
+            keywords = bookData['keywords']
+            for kw, page in keywords.get(term, ()):
+                exact.append( (kw, bookPath, page) )
+            keys = [key for key in keywords.keys()
+                    if key.startswith(prefixes)]
+            keys.sort()
+            for key in keys:
+                for kw, page in keywords[key]:
+                    qualified.append( (kw, bookPath, page) )
+        return exact + qualified
+
+    def search(self, text):
+        """ Pages containing all the words in text as a list of
+        (bookPath, page, title) """
+        words = self.wordsRe.findall(text.lower())
+        if not words:
+            return []
+        res = []
+        for bookPath, bookData in self.books:
+            pageIdxs = None
+            for word in words:
+                hits = bookData['words'].get(word, ())
+                if pageIdxs is None:
+                    pageIdxs = dict.fromkeys(hits)
+                else:
+                    pageIdxs = dict.fromkeys([idx for idx in hits
+                                              if idx in pageIdxs])
+                if not pageIdxs:
+                    break
+            pages = bookData['pages']
+            for idx in sorted(pageIdxs or ()):
+                page, title = pages[idx]
+                res.append( (bookPath, page, title) )
+        return res
+
+_helpIndex = None
+_helpIndexLoading = False
+
+def loadHelpIndex():
+    """ Load (or build) the help index in a background thread """
+    global _helpIndexLoading
+    if _helpIndex is not None or _helpIndexLoading:
+        return
+    _helpIndexLoading = True
+
+    index = HelpIndex(os.path.join(getCacheDir(), 'helpbooks.index'))
+    thread = threading.Thread(target=_loadHelpIndexThread,
+                              args=(index, getHelpBookPaths()))
+    thread.setDaemon(True)
+    thread.start()
+
+# called from thread
+def _loadHelpIndexThread(index, bookPaths):
+    global _helpIndex, _helpIndexLoading
+    try:
+        index.load(bookPaths)
+    except Exception, err:
+        print 'Help index failed to load: %s'%err
+    else:
+        _helpIndex = index
+    _helpIndexLoading = False
+
+def getHelpIndex():
+    """ Returns the help index or None while it is still loading """
+    if _helpIndex is None:
+        loadHelpIndex()
+    return _helpIndex
 
 def initWxPyDocStrs():
     docStrs = os.path.join(Preferences.pyPath, 'Docs', 'wxDocStrings.msh')
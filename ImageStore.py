@@ -1,7 +1,8 @@
 #----------------------------------------------------------------------
 # Name:        ImageStore.py
 # Purpose:     Centralised loading of images, supports different 
-#              methods of loading: image files, zip files and modules
+#              methods of loading: image files, zip files, atlas files
+#              and modules
 #
 # Author:      Riaan Booysen
 #
@@ -11,7 +12,7 @@
 # Licence:     BSD
 #----------------------------------------------------------------------
 
-import sys, os, cStringIO
+import sys, os, cStringIO, marshal, mmap, struct
 
 import wx
 _ = wx.GetTranslation
@@ -51,17 +52,20 @@ class ImageStore:
         elif ext == '.ico':
             return wx.Icon(filename, wx.BITMAP_TYPE_ICO)
         elif ext == 'data':
-            stream = cStringIO.StringIO(self.dataReg[filename])
-            bitmap = wx.BitmapFromImage(wx.ImageFromStream(stream))
-            if filename[-3:].lower() == 'ico':
-                icon = wx.EmptyIcon()
-                icon.CopyFromBitmap(bitmap)
-                return icon
-            else:
-                return bitmap
+            return self.createImageFromData(filename, self.dataReg[filename])
         else:
             raise UnhandledExtError, _('Extension not handled: %s')%ext
 
+    def createImageFromData(self, filename, data):
+        stream = cStringIO.StringIO(data)
+        bitmap = wx.BitmapFromImage(wx.ImageFromStream(stream))
+        if filename[-3:].lower() == 'ico':
+            icon = wx.EmptyIcon()
+            icon.CopyFromBitmap(bitmap)
+            return icon
+        else:
+            return bitmap
+
     def pathExtFromName(self, root, name):
         imgPath = self.canonizePath(os.path.join(root, name))
         ext = os.path.splitext(name)[1]
@@ -137,6 +141,168 @@ class ZippedImageStore(ImageStore):
             return ImageStore.load(self, name)
 
 
+class ImageListManager:
+    """ Builds each named set of images into a wx.ImageList once and hands
+    out the same list and indexes to every control that displays that set.
+
+    Lists are owned by the manager, controls must use SetImageList (not
+    AssignImageList) with them.
+    """
+    def __init__(self, imageStore):
+        self.imageStore = imageStore
+        # name -> (wx.ImageList, {imgPath: index})
+        self.imageLists = {}
+
+    def cleanup(self):
+        self.imageLists = {}
+
+    def getImageList(self, name, imgPaths=(), width=16, height=16):
+        """ Returns the image list for name, built from imgPaths on first use.
+
+        The order of imgPaths defines the indexes; images that cannot be
+        loaded are replaced by blank images so later indexes stay valid.
+        """
+        if name not in self.imageLists:
+            imageList = wx.ImageList(width, height)
+            indexes = {}
+            for imgPath in imgPaths:
+                try:
+                    bmp = self.imageStore.load(imgPath)
+                except ImageStoreError:
+                    bmp = wx.EmptyBitmap(width, height)
+                if isinstance(bmp, wx.Icon):
+                    idx = imageList.AddIcon(bmp)
+                else:
+                    idx = imageList.Add(bmp)
+                indexes.setdefault(imgPath, idx)
+            self.imageLists[name] = (imageList, indexes)
+        return self.imageLists[name][0]
+
+    def getIndex(self, name, imgPath):
+        """ Returns the index of imgPath in image list name, adding it if it
+        is not in the list yet. Raises ImageStoreError if it can't be loaded.
+        """
+        imageList, indexes = self.imageLists[name]
+        if imgPath not in indexes:
+            indexes[imgPath] = imageList.Add(self.imageStore.load(imgPath))
+        return indexes[imgPath]
+
+
+atlasFilename = 'Images.atlas'
+atlasMagic = 'BOAATLS1'
+atlasHeader = '<8sI'
+
+def writeImageAtlas(rootPath, atlasPath=None, imageDir='Images'):
+    """ Pack all images under rootPath/imageDir into a single atlas file.
+
+    Layout: magic, index length, marshalled index {name: (offset, size)},
+    followed by the raw (still encoded) image files. Offsets are relative to
+    the end of the index.
+    """
+    if atlasPath is None:
+        atlasPath = os.path.join(rootPath, atlasFilename)
+
+    index = {}
+    blobs = []
+    offset = 0
+    for dirpath, dirnames, filenames in os.walk(os.path.join(rootPath, imageDir)):
+        if 'CVS' in dirnames:
+            dirnames.remove('CVS')
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() not in \
+                  ('.png', '.bmp', '.ico', '.jpg', '.gif'):
+                continue
+            path = os.path.join(dirpath, filename)
+            name = os.path.normpath(path[len(rootPath):].lstrip(os.sep)
+                  ).replace('\\', '/')
+            data = open(path, 'rb').read()
+            index[name] = (offset, len(data))
+            blobs.append(data)
+            offset = offset + len(data)
+
+    indexData = marshal.dumps(index)
+    f = open(atlasPath, 'wb')
+    try:
+        f.write(struct.pack(atlasHeader, atlasMagic, len(indexData)))
+        f.write(indexData)
+        for data in blobs:
+            f.write(data)
+    finally:
+        f.close()
+    return len(index)
+
+class AtlasImageStore(ImageStore):
+    """ Reads images from a prebuilt atlas file (see writeImageAtlas).
+
+    The atlas is memory mapped and only its index is read at startup, images
+    are decoded on first request. When caching is enabled, decoded images are
+    kept in an LRU of at most lruSize entries.
+    """
+    lruSize = 256
+
+    def __init__(self, rootpaths, images=None, cache=1):
+        self.atlases = []
+        self.atlasIndex = {}
+        self.lru = []
+        ImageStore.__init__(self, rootpaths, images, cache)
+
+    def cleanup(self):
+        ImageStore.cleanup(self)
+        self.lru = []
+        for atlasFile, atlasMap in self.atlases:
+            atlasMap.close()
+            atlasFile.close()
+        self.atlases = []
+        self.atlasIndex = {}
+
+    def addRootPath(self, rootPath):
+        ImageStore.addRootPath(self, rootPath)
+
+        atlasPath = os.path.join(rootPath, atlasFilename)
+        if not os.path.isfile(atlasPath):
+            print 'image atlas %s not found'%atlasPath
+            return
+
+        atlasFile = open(atlasPath, 'rb')
+        atlasMap = mmap.mmap(atlasFile.fileno(), 0, access=mmap.ACCESS_READ)
+        hdrSize = struct.calcsize(atlasHeader)
+        magic, indexSize = struct.unpack(atlasHeader, atlasMap[:hdrSize])
+        if magic != atlasMagic:
+            atlasMap.close()
+            atlasFile.close()
+            raise ImageStoreError, _('%s is not an image atlas')%atlasPath
+
+        index = marshal.loads(atlasMap[hdrSize:hdrSize+indexSize])
+        dataStart = hdrSize + indexSize
+        self.atlases.append( (atlasFile, atlasMap) )
+        for name, (offset, size) in index.items():
+            # earlier root paths take precedence
+            if name not in self.atlasIndex:
+                self.atlasIndex[name] = (atlasMap, dataStart+offset, size)
+
+    def load(self, name):
+        name = self.canonizePath(name)
+
+        if name not in self.atlasIndex:
+            return ImageStore.load(self, name)
+
+        if self.useCache and name in self.images:
+            # move to the most recently used end
+            self.lru.remove(name)
+            self.lru.append(name)
+            return self.images[name]
+
+        atlasMap, offset, size = self.atlasIndex[name]
+        img = self.createImageFromData(name, atlasMap[offset:offset+size])
+
+        if self.useCache:
+            self.images[name] = img
+            self.lru.append(name)
+            if len(self.lru) > self.lruSize:
+                del self.images[self.lru.pop(0)]
+        return img
+
+
 class ResourceImageStore(ImageStore):
     def __init__(self, rootpaths, images=None, cache=1):
         ImageStore.__init__(self, rootpaths, images, cache)
@@ -184,5 +350,27 @@ class ResourceImageStore(ImageStore):
 ImageStoreClasses = {
      'files': ImageStore,
      'zip' : ZippedImageStore,
+     'atlas': AtlasImageStore,
      'resource': ResourceImageStore,
 }     
+
+
+def _compareStartup(rootPath):
+    """ Time startup and first loads of the zip and the atlas stores """
+    import time
+    app = wx.PySimpleApp()
+
+    names = AtlasImageStore([rootPath]).atlasIndex.keys()
+    names.sort()
+    for Store in (ZippedImageStore, AtlasImageStore):
+        start = time.time()
+        store = Store([rootPath], cache=1)
+        started = time.time()
+        for name in names:
+            store.load(name)
+        loaded = time.time()
+        print '%s: startup %.3fs, loading %d images %.3fs'%(Store.__name__,
+              started-start, len(names), loaded-started)
+
+if __name__ == '__main__':
+    _compareStartup(os.path.abspath(os.path.dirname(__file__)))
@@ -19,7 +19,7 @@ print 'importing Inspector'
 
 # XXX Disable clipboards buttons when non Designer item is selected !!
 
-import os
+import os, time
 from types import *
 
 import wx
@@ -30,7 +30,7 @@ import PaletteMapping, PaletteStore, Preferences, Help
 from PropEdit import PropertyEditors
 from Companions import EventCollections
 import Preferences, RTTI, Utils
-from Preferences import IS, oiLineHeight, inspPageNames, flatTools
+from Preferences import IS, ILM, oiLineHeight, inspPageNames, flatTools
 from Preferences import keyDefs
 from Utils import _
 
@@ -87,7 +87,7 @@ class InspectorFrame(wx.Frame, Utils.FrameRestorerMixin):
 
     def _init_utils(self):
         # generated method, don't edit
-        self.paletteImages = wx.ImageList(height=24, width=24)
+        self.paletteImages = ILM.getImageList('palette', (), 24, 24)
 
     def _init_ctrls(self, prnt):
         # generated method, don't edit
@@ -155,9 +155,9 @@ class InspectorFrame(wx.Frame, Utils.FrameRestorerMixin):
         for cmpInf in PaletteStore.compInfo.values():
             filename ='Images/Palette/'+ cmpInf[0]+'.png'
             try:
-                cmpInf.append(self.paletteImages.Add(IS.load(filename)))
+                cmpInf.append(ILM.getIndex('palette', filename))
             except IS.Error:
-                cmpInf.append(self.paletteImages.Add(IS.load('Images/Palette/Component.png')))
+                cmpInf.append(ILM.getIndex('palette', 'Images/Palette/Component.png'))
 
         self.SetIcon(IS.load('Images/Icons/Inspector.ico'))
 
@@ -168,6 +168,7 @@ class InspectorFrame(wx.Frame, Utils.FrameRestorerMixin):
         self.prevDesigner = (None, None)
         self.prevCollDesgn = None
         self.sessionHandler = None
+        self.lastSelectTime = 0.0
 
         self.toolBar.AddSeparator()
         Utils.AddToolButtonBmpIS(self, self.toolBar,
@@ -252,9 +253,12 @@ class InspectorFrame(wx.Frame, Utils.FrameRestorerMixin):
         if self.selCmp == compn or self.vetoSelect:
             return
 
-        # Clear inspector selection
-        self.constr.cleanup()
-        self.props.cleanup()
+        startTime = time.time()
+
+        # Clear inspector selection, the property pages keep their name
+        # values for reuse by a similar component
+        self.constr.postNameValues()
+        self.props.postNameValues()
         self.events.cleanup()
 
         if self.prevDesigner[0] and compn.designer and not collDesgn and \
@@ -307,13 +311,29 @@ class InspectorFrame(wx.Frame, Utils.FrameRestorerMixin):
                 self.containment.SelectItem(treeId)
                 self.containment.valid = True
                 self.containment.EnsureVisible(treeId)
-
+        except:
+            # rows kept for reuse may still be bound to the previous
+            # companion, drop them rather than edit the wrong control
+            self.cleanup()
+            raise
         finally:
             if sb: sb.SetValue(0)
 
         # set add item state
         self.updateToolBarState()
 
+        self.lastSelectTime = time.time() - startTime
+
+    def timeSelections(self, companions):
+        """ Select each companion in turn and return the seconds each
+            selection took. For measuring Inspector latency from the shell,
+            e.g. [o[0] for o in designer.objects.values()] """
+        times = []
+        for compn in companions:
+            self.selectObject(compn, selectInContainment=False)
+            times.append(self.lastSelectTime)
+        return times
+
     def multiSelectObject(self, compn, designer):
         self.selCmp = compn
         self.selDesgn = designer
@@ -638,6 +658,52 @@ class NameValue:
         self.separatorV.SetBackgroundColour(sepCol)
         self.separatorV.Refresh()
 
+    def rebind(self, companion, rootCompanion, propWrapper,
+          editor=None, options=None, names=None):
+        """ Reuse this name value's controls for the same property of another
+            companion. Returns False if the row looks different for the new
+            companion and has to be recreated instead """
+        if self.editing:
+            return False
+
+        lockEditor, attrName, isCat = self.checkLockedProperty(self.propName,
+              propWrapper.getSetterName(), companion)
+        if (lockEditor is not None) != self.locked or isCat != self.isCat:
+            return False
+
+        if lockEditor:
+            editor = lockEditor
+        if editor:
+            propEditor = editor(self.propName, self.valueParent, companion,
+              rootCompanion, propWrapper, self.idx, self.lastSizeV or
+              self.valueParent.GetSize().x+IECWidthFudge, options, names)
+        else:
+            propEditor = self.inspector.inspector.propertyRegistry.factory(
+              self.propName, self.valueParent, companion, rootCompanion,
+              propWrapper, self.idx, self.lastSizeV or
+              self.valueParent.GetSize().x + IECWidthFudge)
+
+        expandable = propEditor is not None and \
+              PropertyEditors.esExpandable in propEditor.getStyle()
+        if not propEditor or (self.expander is not None) != expandable:
+            return False
+
+        if lockEditor:
+            propEditor.value = attrName
+        propEditor.ownerPropEdit = None
+        self.propEditor = propEditor
+        self.updatePropValue()
+
+        self.nameCtrl.SetToolTipString(companion.getPropertyHelp(self.propName))
+        if self.expander:
+            self.expander.SetValue(True)
+        dispVal = self.propEditor.getDisplayValue()
+        if self.value.GetLabel() != dispVal:
+            self.value.SetLabel(dispVal)
+            self.value.SetToolTipString(dispVal)
+        self.showPropNameModified(self.isCat)
+        return True
+
     def checkLockedProperty(self, name, setterName, companion):
         """ Determine if the property is locked """
         # XXX refactor, this is currently ugly
@@ -1037,11 +1103,15 @@ class NameValueEditorScrollWin(wx.ScrolledWindow):
 
         self.Bind(wx.EVT_SIZE, self.OnSize)
 
-    def cleanup(self):
+    def postNameValues(self):
+        """ Post any open editor """
         self.prevSel = None
-        # first post any open editor
         for i in self.nameValues:
             i.hideEditor(False, noUpdate=True)
+
+    def cleanup(self):
+        # first post any open editor
+        self.postNameValues()
         # then clean up
         for i in self.nameValues:
             i.destroy(True)
@@ -1052,6 +1122,26 @@ class NameValueEditorScrollWin(wx.ScrolledWindow):
         # work around a scrollwindow bug, size event fixes layout
         wx.CallAfter(self.ProcessEvent, wx.SizeEvent((-1,-1)))
         
+    def rebindNameValues(self, rows, compn):
+        """ Point the current name values at compn instead of rebuilding
+            them when it shows the same properties in the same order.
+
+            rows is a list of (nameValueClass, name, propWrapper) tuples.
+            Returns False if the page has to be rebuilt.
+        """
+        if not self.nameValues or len(rows) != len(self.nameValues):
+            return False
+        for nv, (nvClass, name, propWrap) in zip(self.nameValues, rows):
+            if nv.__class__ is not nvClass or nv.propName != name:
+                return False
+
+        for nv, (nvClass, name, propWrap) in zip(self.nameValues, rows):
+            if not nv.rebind(compn, compn, propWrap, compn.getPropEditor(name),
+                  compn.getPropOptions(name), compn.getPropNames(name)):
+                return False
+        self.prevSel = None
+        return True
+
     def getNameValue(self, name):
         for nv in self.nameValues:
             if nv.propName == name:
@@ -1304,8 +1394,11 @@ class InspectorPropScrollWin(InspectorScrollWin):
 
     # read in the root object
     def readObject(self, propList):
-        self.setNameValues(self.inspector.selCmp, self.inspector.selCmp,
-          propList, 0, 0)
+        compn = self.inspector.selCmp
+        if not self.rebindNameValues(
+              [(PropNameValue, pw.name, pw) for pw in propList], compn):
+            self.cleanup()
+            self.setNameValues(compn, compn, propList, 0, 0)
 
     def expand(self, nameValue):
         nv = self.nameValues[nameValue.idx]
@@ -1343,10 +1436,31 @@ class InspectorConstrScrollWin(InspectorScrollWin):
         paramNames.sort()
 
         compn = self.inspector.selCmp
-        self.addParams(constrList, paramNames, compn, compn)
+        constrProps = {}
+        for propWrap in constrList:
+            constrProps[propWrap.name] = propWrap
+        rows = []
+        for param in paramNames:
+            if constrProps.has_key(param):
+                rows.append( (PropNameValue, param, constrProps[param]) )
+            else:
+                rows.append( (ConstrNameValue, param,
+                              self.getConstrWrapper(param, compn)) )
+
+        if not self.rebindNameValues(rows, compn):
+            self.cleanup()
+            self.addParams(constrList, paramNames, compn, compn)
 
         self.refreshSplitter()
 
+    def getConstrWrapper(self, name, compn):
+        props = compn.properties()
+        if props.has_key(name):
+            rType, getter, setter = props[name]
+            return RTTI.PropertyWrapper(name, rType, getter, setter)
+        else:
+            return RTTI.PropertyWrapper(name, 'NoneRoute', None, None)
+
     def addParams(self, constrList, paramNames, compn, rootCompn, indent = 0, insIdx = -1):
         def findInConstrLst(name, constrList):
             for constr in constrList:
@@ -1388,12 +1502,7 @@ class InspectorConstrScrollWin(InspectorScrollWin):
         self.refreshSplitter()
 
     def addConstr(self, name, compn, rootCompn, indent = 0, insIdx = -1):
-        props = compn.properties()
-        if props.has_key(name):
-            rType, getter, setter = props[name]
-            propWrap = RTTI.PropertyWrapper(name, rType, getter, setter)
-        else:
-            propWrap = RTTI.PropertyWrapper(name, 'NoneRoute', None, None)
+        propWrap = self.getConstrWrapper(name, compn)
 
         if insIdx == -1:
             insIdx = len(self.nameValues)
@@ -0,0 +1,181 @@
+#-----------------------------------------------------------------------------
+# Name:        IntrospectionClient.py
+# Purpose:     Talks to the introspection helper process
+#
+# Author:      Riaan Booysen
+#
+# Created:     2007
+# RCS-ID:      $Id$
+# Copyright:   (c) 2007 Riaan Booysen
+# Licence:     GPL
+#-----------------------------------------------------------------------------
+
+""" Client side of IntrospectionServer.
+
+The helper process is started on first use and kept alive for the rest of
+the session. Calls are serialised and may be made from any thread; they block
+until the helper replies, so the GUI thread should use them via
+StyledTextCtrls.DeferredCodeHelp. A helper that does not reply within timeout
+seconds (e.g. stuck importing a user module) is killed and restarted by the
+next call.
+"""
+
+import os, sys, time, marshal, signal, struct, subprocess, threading
+
+import Preferences
+from Utils import _
+
+class IntrospectionError(Exception): pass
+
+class IntrospectionClient:
+    # seconds to wait for a reply, imports of big packages take a while
+    timeout = 20
+    # seconds a terminated helper gets to exit before it is killed
+    exitTimeout = 2
+
+    def __init__(self):
+        self.process = None
+        self.lock = threading.Lock()
+        # set by the watchdog when it terminated the helper
+        self.timedOut = False
+
+    def isAlive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        if hasattr(sys, 'frozen'):
+            script = os.path.join(os.path.dirname(sys.executable),
+                                  'IntrospectionServer.py')
+        else:
+            script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  'IntrospectionServer.py')
+        self.process = subprocess.Popen(
+              [Preferences.getPythonInterpreterPath(), '-u', script],
+              stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def kill(self):
+        """ Stop the helper and reap it """
+        process, self.process = self.process, None
+        if process is None:
+            return
+        for pipe in (process.stdin, process.stdout):
+            try:
+                pipe.close()
+            except IOError:
+                pass
+
+        # an idle helper exits when stdin is closed
+        if not waitForExit(process, self.exitTimeout):
+            self.stop(process)
+        process.wait()
+
+    def stop(self, process):
+        """ Terminate the helper, kill it when it ignores that """
+        terminate(process)
+        if not waitForExit(process, self.exitTimeout):
+            killProcess(process)
+
+    def watchdog(self, process):
+        """ Called in the timer thread when a reply took too long """
+        self.timedOut = True
+        self.stop(process)
+
+    def call(self, method, *args):
+        self.lock.acquire()
+        try:
+            if not self.isAlive():
+                self.start()
+            self.timedOut = False
+            timer = threading.Timer(self.timeout, self.watchdog,
+                                    (self.process,))
+            timer.setDaemon(True)
+            timer.start()
+            try:
+                try:
+                    marshal.dump((method, args), self.process.stdin)
+                    self.process.stdin.flush()
+                    ok, result = self.readReply()
+                finally:
+                    timer.cancel()
+            except (EOFError, ValueError, IOError), error:
+                # helper died (e.g. an imported module called sys.exit) or
+                # was terminated by the watchdog, it will be restarted on the
+                # next call
+                self.kill()
+                if self.timedOut:
+                    raise IntrospectionError(_('Introspection helper process '
+                          'did not reply within %s seconds')%self.timeout)
+                raise IntrospectionError(
+                      _('Introspection helper process failed: %s')%error)
+        finally:
+            self.lock.release()
+
+        if not ok:
+            raise IntrospectionError(result)
+        return result
+
+    def readReply(self):
+        # Unlike marshal.load, file.read releases the GIL while it waits so
+        # the GUI and the watchdog keep running
+        stdout = self.process.stdout
+        header = stdout.read(4)
+        if len(header) < 4:
+            raise EOFError, 'helper closed its output'
+        size, = struct.unpack('<I', header)
+        data = stdout.read(size)
+        if len(data) < size:
+            raise EOFError, 'helper closed its output'
+        return marshal.loads(data)
+
+    def completions(self, modName, fromName='', attrs=(), paths=()):
+        return self.call('completions', modName, fromName, tuple(attrs),
+                         tuple(paths))
+
+    def calltip(self, modName, fromName='', attrs=(), paths=()):
+        return self.call('calltip', modName, fromName, tuple(attrs),
+                         tuple(paths))
+
+def waitForExit(process, timeout):
+    end = time.time() + timeout
+    while process.poll() is None and time.time() < end:
+        time.sleep(0.05)
+    return process.poll() is not None
+
+# Popen.terminate and Popen.kill are new in Python 2.6
+def terminate(process):
+    try:
+        if hasattr(process, 'terminate'):
+            process.terminate()
+        elif sys.platform == 'win32':
+            terminateWin32(process)
+        else:
+            os.kill(process.pid, signal.SIGTERM)
+    except OSError:
+        # already exited
+        pass
+
+def killProcess(process):
+    try:
+        if hasattr(process, 'kill'):
+            process.kill()
+        elif sys.platform == 'win32':
+            terminateWin32(process)
+        else:
+            os.kill(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+def terminateWin32(process):
+    import ctypes
+    ctypes.windll.kernel32.TerminateProcess(int(process._handle), 1)
+
+_client = None
+def getClient():
+    global _client
+    if _client is None:
+        _client = IntrospectionClient()
+    return _client
+
+def shutdown():
+    if _client is not None:
+        _client.kill()
@@ -0,0 +1,187 @@
+#-----------------------------------------------------------------------------
+# Name:        IntrospectionServer.py
+# Purpose:     Helper process answering code completion and call tip queries
+#
+# Author:      Riaan Booysen
+#
+# Created:     2007
+# RCS-ID:      $Id$
+# Copyright:   (c) 2007 Riaan Booysen
+# Licence:     GPL
+#-----------------------------------------------------------------------------
+
+""" Imports user modules on behalf of the IDE so that Boa's own interpreter
+is not bloated by (or exposed to the side effects of) arbitrary imports.
+
+Runs as a separate process started by IntrospectionClient. Requests and
+replies are marshalled (method, args) and (ok, result) tuples exchanged over
+stdin/stdout, replies are preceded by their length. Results are cached per
+module and discarded when the module's source file changes on disk.
+
+Intentionally does not import wx or any Boa modules.
+"""
+
+import os, sys, marshal, struct, inspect, types
+
+class IntrospectionServer:
+    exported = ('ping', 'completions', 'calltip')
+
+    def __init__(self):
+        # modName -> [mtime, {query: result}]
+        self.cache = {}
+
+    def addPaths(self, paths):
+        for path in paths:
+            if path and path not in sys.path:
+                sys.path.append(path)
+
+    def getModuleMtime(self, module):
+        filename = getattr(module, '__file__', None)
+        if not filename:
+            return None
+        if os.path.splitext(filename)[1] in ('.pyc', '.pyo'):
+            filename = filename[:-1]
+        try:
+            return os.stat(filename).st_mtime
+        except OSError:
+            return None
+
+    def getModule(self, modName):
+        """ Returns the imported module and it's result cache, reloading the
+            module if it changed on disk since it was cached """
+        module = sys.modules.get(modName)
+        if module is None:
+            __import__(modName)
+            module = sys.modules[modName]
+
+        mtime = self.getModuleMtime(module)
+        entry = self.cache.get(modName)
+        if entry is None:
+            entry = self.cache[modName] = [mtime, {}]
+        elif entry[0] != mtime:
+            module = reload(module)
+            entry[:] = [self.getModuleMtime(module), {}]
+        return module, entry[1]
+
+    def resolve(self, module, fromName, attrs):
+        obj = module
+        if fromName:
+            obj = getattr(obj, fromName)
+        for attr in attrs:
+            obj = getattr(obj, attr)
+        return obj
+
+    def query(self, kind, modName, fromName, attrs, paths):
+        self.addPaths(paths)
+        module, results = self.getModule(modName)
+        key = (kind, fromName, tuple(attrs))
+        if key not in results:
+            obj = self.resolve(module, fromName, attrs)
+            results[key] = getattr(self, 'get_'+kind)(obj)
+        return results[key]
+
+#---Exported methods------------------------------------------------------------
+
+    def ping(self):
+        return os.getpid()
+
+    def completions(self, modName, fromName, attrs, paths):
+        """ Names available on the object at modName[.fromName][.attrs] """
+        return self.query('completions', modName, fromName, attrs, paths)
+
+    def calltip(self, modName, fromName, attrs, paths):
+        """ Signature and first docstring paragraph of the callable at
+            modName[.fromName][.attrs] """
+        return self.query('calltip', modName, fromName, attrs, paths)
+
+#---Introspection---------------------------------------------------------------
+
+    def get_completions(self, obj):
+        return recdir(obj)
+
+    def get_calltip(self, obj):
+        name = getattr(obj, '__name__', '')
+        func = obj
+        dropSelf = False
+        if type(obj) in (types.ClassType, types.TypeType):
+            func = getattr(obj, '__init__', None)
+            dropSelf = True
+        elif type(obj) is types.MethodType:
+            dropSelf = obj.im_self is not None
+        elif not inspect.isfunction(obj) and hasattr(obj, '__call__') and \
+              type(obj) not in (types.BuiltinFunctionType,
+                                types.BuiltinMethodType):
+            func = obj.__call__
+            dropSelf = True
+
+        sig = ''
+        if inspect.ismethod(func) or inspect.isfunction(func):
+            args, varargs, varkw, defaults = inspect.getargspec(func)
+            if dropSelf and args:
+                args = args[1:]
+            sig = name + inspect.formatargspec(args, varargs, varkw, defaults)
+
+        doc = firstParagraph(inspect.getdoc(obj) or '')
+        if sig and doc:
+            return '%s\n%s'%(sig, doc)
+        return sig or doc
+
+def recdir(obj):
+    res = dir(obj)
+    if hasattr(obj, '__class__') and obj != obj.__class__:
+        if type(obj) != types.ModuleType:
+            res.extend(recdir(obj.__class__))
+        if hasattr(obj, '__bases__'):
+            for base in obj.__bases__:
+                res.extend(recdir(base))
+
+    unq = {}
+    for name in res: unq[name] = None
+    return unq.keys()
+
+def firstParagraph(doc):
+    res = []
+    for line in doc.strip().split('\n'):
+        if not line.strip():
+            break
+        res.append(line)
+    return '\n'.join(res)
+
+def serve(inp, out):
+    server = IntrospectionServer()
+    while 1:
+        try:
+            method, args = marshal.load(inp)
+        except (EOFError, ValueError):
+            break
+
+        if method not in server.exported:
+            reply = (False, 'Unknown method: %s'%method)
+        else:
+            try:
+                reply = (True, getattr(server, method)(*args))
+            except Exception, error:
+                reply = (False, '%s: %s'%(error.__class__.__name__, error))
+        try:
+            data = marshal.dumps(reply)
+        except ValueError:
+            # unmarshallable result
+            data = marshal.dumps((False, 'Result could not be marshalled'))
+        out.write(struct.pack('<I', len(data)) + data)
+        out.flush()
+
+def main():
+    if sys.platform == 'win32':
+        import msvcrt
+        msvcrt.setmode(sys.stdin.fileno(), os.O_BINARY)
+        msvcrt.setmode(sys.stdout.fileno(), os.O_BINARY)
+
+    inp, out = sys.stdin, sys.stdout
+    # output from imported modules must not corrupt the protocol stream
+    sys.stdout = sys.stderr
+    sys.stdin = open(os.devnull)
+
+    serve(inp, out)
+
+if __name__ == '__main__':
+    main()
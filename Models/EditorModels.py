@@ -150,25 +150,16 @@ class CVSFolderModel(FolderModel):
         self.repository = self.readFile(os.path.join(self.filepath, 'Repository'))
         self.entries = []
 
-        f = open(os.path.join(self.filepath, 'Entries'), 'r')
+        # Entries lines, directories first
+        from Explorers import VCSStatus
         dirpos = 0
-        try:
-            txtEntries = f.readlines()
-            for txtEntry in txtEntries:
-                txtEntry = txtEntry.strip()
-                if txtEntry:
-                    if txtEntry == 'D':
-                        pass
-                        # maybe add all dirs?
-                    elif txtEntry[0] == 'D':
-                        self.entries.insert(dirpos, CVSDir(txtEntry))
-                        dirpos = dirpos + 1
-                    else:
-                        try:
-                            self.entries.append(CVSFile(txtEntry, self.filepath))
-                        except IOError: pass
-        finally:
-            f.close()
+        for txtEntry in VCSStatus.getEntries('cvs',
+              os.path.dirname(self.filepath)).lines:
+            if txtEntry[0] == 'D':
+                self.entries.insert(dirpos, txtEntry)
+                dirpos = dirpos + 1
+            else:
+                self.entries.append(txtEntry)
 
 class BasePersistentModel(EditorModel):
     fileModes = ('rb', 'wb')
@@ -11,7 +11,7 @@
 #-----------------------------------------------------------------------------
 print 'importing Models.wxPythonControllers'
 
-import os
+import os, time
 
 import Preferences, Utils, Plugins
 from Preferences import keyDefs
@@ -111,8 +111,10 @@ class BaseFrameController(ModuleController):
                 # update any view modifications
                 model.refreshFromViews()
 
+                start = time.time()
                 model.initModule()
                 model.readComponents()
+                model.parseTime = time.time() - start
 
                 try:
                     # add or focus data view
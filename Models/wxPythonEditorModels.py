@@ -43,10 +43,18 @@ class BaseFrameModel(ClassModel):
     modelIdentifier = 'Frames'
     dialogLook = False
     Companion = BaseCompanions.DesignTimeCompanion
+    parsedMethodCacheSize = 100
     def __init__(self, data, name, main, editor, saved, app=None):
         ClassModel.__init__(self, data, name, main, editor, saved, app)
         self.designerTool = None
         self.specialAttrs = {}
+        # (method name, main class, body lines) -> (ObjectCollection, unmatched)
+        self.parsedMethods = {}
+        # seconds spent parsing the source when the Designer was last opened
+        self.parseTime = 0.0
+        # collection method -> {ctrl name: (source state, lines, dependent
+        # collection lines)} written at the previous post
+        self.writtenSource = {}
 
         self.defCreateClass = sourceconst.defCreateClass
         self.defClass = sourceconst.defClass
@@ -117,7 +125,35 @@ class BaseFrameModel(ClassModel):
         return order, objs
 
     def readDesignerMethod(self, meth, codeBody):
-        """ Create a new ObjectCollection by parsing the given method body """
+        """ Create a new ObjectCollection by parsing the given method body
+
+        Parse results are cached per method body, a method that did not
+        change since it was last read is copied from the cache.
+        """
+        key = (meth, self.main, tuple(codeBody))
+        parsed = self.parsedMethods.get(key)
+        if parsed is None:
+            if len(self.parsedMethods) >= self.parsedMethodCacheSize:
+                self.parsedMethods.clear()
+            parsed = self.parsedMethods[key] = \
+                  self.parseDesignerMethod(meth, codeBody)
+        newObjColl, unmatched = parsed
+
+        if unmatched:
+            wx.LogWarning(_('The following lines were not used by the Designer '\
+                            'and will be lost:\n'))
+            for line in unmatched:
+                wx.LogWarning(line)
+            wx.LogWarning(_('\nThere were unprocessed lines in the source code of '\
+                            'method: %s\nIf this was unexpected, it is advised '\
+                            'that you cancel this Designer session and correct '\
+                            'the problem before continuing.')%meth)
+
+        return newObjColl.clone()
+
+    def parseDesignerMethod(self, meth, codeBody):
+        """ Parse the given method body, returns an ObjectCollection and the
+            list of unmatched lines """
         from Views import ObjCollection
         import methodparse
         # Collection method
@@ -156,17 +192,7 @@ class BaseFrameModel(ClassModel):
         newObjColl = ObjCollection.ObjectCollection()
         newObjColl.setup(creators, properties, events, collectionInits, inits, fins)
 
-        if unmatched:
-            wx.LogWarning(_('The following lines were not used by the Designer '\
-                            'and will be lost:\n'))
-            for line in unmatched:
-                wx.LogWarning(line)
-            wx.LogWarning(_('\nThere were unprocessed lines in the source code of '\
-                            'method: %s\nIf this was unexpected, it is advised '\
-                            'that you cancel this Designer session and correct '\
-                            'the problem before continuing.')%meth)
-
-        return newObjColl
+        return newObjColl, unmatched
 
     def readSpecialAttrs(self, mod, cls):
         """ Read special attributes from __init__ method.
@@ -22,7 +22,8 @@ Hence the needed import * and execfile.
 # XXX This module should be renamed it's function has changed over time
 # XXX Maybe: BoaNamespace/DesignTimeNamespace
 
-import os
+import os, re, time
+from types import StringType
 
 import Preferences, Utils, Plugins
 from Preferences import IS
@@ -141,6 +142,57 @@ compInfo = PaletteStore.compInfo
 class DesignTimeExpressionError(Exception): pass
 
 _NB = None
+
+# Compiled source snippets, a design time frame evaluates the same
+# position, size, colour and flag expressions over and over
+_exprCache = {}
+exprCacheSize = 2000
+
+# Total seconds spent in evalCtrl, the Designer reports it per load
+evalTime = 0.0
+
+# no leading zeros, those are octal
+_int = r'-?(?:0|[1-9]\d*)'
+_intLiteralRe = re.compile(r'^%s$'%_int)
+_strLiteralRe = re.compile(r'''^(?:'[^'\\]*'|"[^"\\]*")$''')
+_pointSizeRe = re.compile(
+      r'^wx\.(Point|Size)\(\s*(%s)\s*,\s*(%s)\s*\)$'%(_int, _int))
+_colourRe = re.compile(
+      r'^wx\.Colour\(\s*(%s)\s*,\s*(%s)\s*,\s*(%s)\s*\)$'%(_int, _int, _int))
+_constLiterals = {'None': None, 'True': True, 'False': False}
+
+def evalLiteral(expr):
+    """ Evaluates the most common simple source snippets without eval.
+
+    Returns a (matched, value) tuple.
+    """
+    if _intLiteralRe.match(expr):
+        return True, int(expr)
+    if _strLiteralRe.match(expr):
+        return True, expr[1:-1]
+    if _constLiterals.has_key(expr):
+        return True, _constLiterals[expr]
+    mo = _pointSizeRe.match(expr)
+    if mo:
+        cls, x, y = mo.groups()
+        return True, getattr(wx, cls)(int(x), int(y))
+    mo = _colourRe.match(expr)
+    if mo:
+        return True, wx.Colour(*[int(c) for c in mo.groups()])
+    return False, None
+
+def compileExpr(expr):
+    """ Returns the cached code object for a source snippet """
+    # eval() ignores leading whitespace but compile() raises IndentationError
+    expr = expr.strip()
+    try:
+        return _exprCache[expr]
+    except KeyError:
+        if len(_exprCache) >= exprCacheSize:
+            _exprCache.clear()
+        code = _exprCache[expr] = compile(expr, '<string>', 'eval')
+        return code
+
 def evalCtrl(expr, localsDct=None, preserveExc=True):
     """ Function usually used to evaluate source snippets.
 
@@ -150,15 +202,26 @@ def evalCtrl(expr, localsDct=None, preserveExc=True):
     global _NB
     if not _NB:
         _NB = IS.load('Images/Inspector/wxNullBitmap.png')
+        wx.NullBitmap = _NB
     if localsDct is None:
         localsDct = {}
     localsDct['_'] = lambda x: x
-    wx.NullBitmap = _NB
+    global evalTime
+    start = time.time()
     try:
-        return eval(expr, globals(), localsDct)
-    except Exception, err:
-        if preserveExc:
-            raise
-        else:
-            clsName = err.__class__.__name__
-            raise DesignTimeExpressionError, clsName+': '+str(err)
+        try:
+            if type(expr) is StringType and not localsDct.has_key('wx'):
+                expr = expr.strip()
+                matched, value = evalLiteral(expr)
+                if matched:
+                    return value
+                return eval(compileExpr(expr), globals(), localsDct)
+            return eval(expr, globals(), localsDct)
+        except Exception, err:
+            if preserveExc:
+                raise
+            else:
+                clsName = err.__class__.__name__
+                raise DesignTimeExpressionError, clsName+': '+str(err)
+    finally:
+        evalTime = evalTime + time.time() - start
@@ -0,0 +1,44 @@
+""" Tests of evaluating design time source snippets, run with:
+    python PaletteMappingTests.py
+"""
+
+import unittest
+
+import PaletteMapping
+
+class CompileExprTests(unittest.TestCase):
+    def setUp(self):
+        PaletteMapping._exprCache.clear()
+
+    def testLeadingWhitespaceIsIgnored(self):
+        self.assertEqual(eval(PaletteMapping.compileExpr(' 1 + 2')), 3)
+
+    def testCacheIsKeyedOnStrippedSource(self):
+        code = PaletteMapping.compileExpr('1 + 2')
+        self.assert_(PaletteMapping.compileExpr('  1 + 2 ') is code)
+        self.assertEqual(PaletteMapping._exprCache.keys(), ['1 + 2'])
+
+    def testFullCacheIsCleared(self):
+        size = PaletteMapping.exprCacheSize
+        PaletteMapping.exprCacheSize = 2
+        try:
+            for expr in ('1 + 1', '1 + 2', '1 + 3'):
+                PaletteMapping.compileExpr(expr)
+        finally:
+            PaletteMapping.exprCacheSize = size
+        self.assertEqual(PaletteMapping._exprCache.keys(), ['1 + 3'])
+
+class EvalCtrlTests(unittest.TestCase):
+    def testLiteral(self):
+        self.assertEqual(PaletteMapping.evalCtrl(" 'label'"), 'label')
+        self.assertEqual(PaletteMapping.evalCtrl(' -12'), -12)
+
+    def testExpressionWithLeadingSpace(self):
+        self.assertEqual(PaletteMapping.evalCtrl(' value * 2', {'value': 4}), 8)
+
+    def testErrorIsWrapped(self):
+        self.assertRaises(PaletteMapping.DesignTimeExpressionError,
+              PaletteMapping.evalCtrl, ' undefinedName', None, False)
+
+if __name__ == '__main__':
+    unittest.main()
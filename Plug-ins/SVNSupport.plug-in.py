@@ -11,15 +11,15 @@
 #-----------------------------------------------------------------------------
 """ Explorer classes for SVN browsing and operations """
 
-import time, stat, os
+import os
 
 import wx
 from wx.lib.dialogs import ScrolledMessageDialog
 
 
-from Explorers import ExplorerNodes, scrm
+from Explorers import ExplorerNodes, VCSStatus, scrm
 from Models import EditorModels, EditorHelper
-from Preferences import IS
+from Preferences import IS, ILM
 
 import ProcessProgressDlg, Utils
 
@@ -31,48 +31,20 @@ import ProcessProgressDlg, Utils
 svnFolderImgIdx = 6
 maxHelpLines = 30
 
-class SVNEntriesParser:
-    def __init__(self, filename):
-        self.entries = []
-        self.initParser(filename)
-    
-    def entry(self, name):
-        for entryName, entryAttrs in self.entries:
-            if name == entryName:
-                return entryAttrs
-        raise KeyError, name+' not found'
-        
-    def StartElement(self, name, attrs ):
-        name = name.encode()
-        if name == 'entry' and 'name' in attrs and attrs['name']:
-            self.entries.append( (name, attrs) )
-
-    def initParser(self, filename):
-        from xml.parsers import expat
-        parser = expat.ParserCreate()
-        parser.StartElementHandler = self.StartElement
-        return parser.Parse(open(filename,'r').read(), 1)
-
-
 def isSVN(filename):
     file = os.path.basename(filename)
     return file.lower() == '.svn' and \
                       os.path.exists(os.path.join(filename, 'entries')) and \
                       os.path.exists(os.path.join(filename, 'format')) 
 
-def svnFileLocallyModified(filename, entry):
-    """  svnFileLocallyModified -> modified, conflict """
-
-    filets = time.asctime(time.gmtime(os.stat(filename)[stat.ST_MTIME]))
-    
+def svnFileStatus(filename):
+    """ svnFileStatus -> missing, modified, conflict """
+    dirpath, name = os.path.split(filename)
     try:
-        texttime = entry['text-time'].rsplit('.', 1)[0]
-    except KeyError: 
-        return False, False
-    
-    texttime = time.asctime(time.strptime(texttime, '%Y-%m-%dT%H:%M:%S'))
-    
-    return (texttime != filets, False)
+        stamp, conflict = VCSStatus.getEntries('svn', dirpath).files[name]
+    except KeyError:
+        return False, False, False
+    return VCSStatus.fileStatus(filename, stamp, conflict)
 ##    
 ##    
 ##    ismerge = timestamp.split('+')
@@ -138,18 +110,17 @@ class SVNController(ExplorerNodes.Controller):
         self.setupMenu(self.fileSVNMenu, self.list, self.fileSVNMenuDef, False)
 
 
-        self.images = wx.ImageList(16, 16)
-        for svnImg in ( 'Images/CvsPics/File.png',
-                        'Images/CvsPics/BinaryFile.png',
-                        'Images/CvsPics/ModifiedFile.png',
-                        'Images/CvsPics/ModifiedBinaryFile.png',
-                        'Images/CvsPics/MissingFile.png',
-                        'Images/CvsPics/ConflictingFile.png',
-                        'Images/CvsPics/Dir.png',
-                        'Images/Modules/FolderUp.png',
-                        'Images/CvsPics/UnknownDir.png',
-                        'Images/CvsPics/UnknownFile.png'):
-            self.images.Add(IS.load(svnImg))
+        self.images = ILM.getImageList('vcs', (
+              'Images/CvsPics/File.png',
+              'Images/CvsPics/BinaryFile.png',
+              'Images/CvsPics/ModifiedFile.png',
+              'Images/CvsPics/ModifiedBinaryFile.png',
+              'Images/CvsPics/MissingFile.png',
+              'Images/CvsPics/ConflictingFile.png',
+              'Images/CvsPics/Dir.png',
+              'Images/Modules/FolderUp.png',
+              'Images/CvsPics/UnknownDir.png',
+              'Images/CvsPics/UnknownFile.png'))
 
         self.toolbarMenus = [self.svnMenuDef]
 
@@ -436,7 +407,7 @@ class SVNFolderNode(ExplorerNodes.ExplorerNode):
 
 class SVNFileNode(ExplorerNodes.ExplorerNode):
     protocol = 'svn'
-    def __init__(self, entry, resourcepath, parent):
+    def __init__(self, entry, resourcepath, parent, statuses=None):
         if entry:
             name = entry['name']
             try:
@@ -456,26 +427,17 @@ class SVNFileNode(ExplorerNodes.ExplorerNode):
 
         ExplorerNodes.ExplorerNode.__init__(self, name, resourcepath, None, -1, parent)
 
-        self.imgIdx = 0#self.missing and self.missing << 2 \
-        
-        filename = os.path.abspath(os.path.join(self.resourcepath, '..', name))
-        if os.path.exists(filename):
-            self.modified, self.conflict = svnFileLocallyModified(filename, entry)
-            self.missing = False
+        # statuses computed by the VCSStatus service, when not given the
+        # status is read now
+        if statuses is None:
+            status = svnFileStatus(os.path.abspath(
+                  os.path.join(self.resourcepath, '..', name)))
         else:
-            self.modified = self.conflict = False
-            self.missing = True
-
-##        self.modified = False
-        self.conflict = False
-##        self.imgIdx = 0
-##        if self.timestamp:
-##            filename = os.path.abspath(os.path.join(self.resourcepath, '..', name))
-##            if os.path.exists(filename):
-##                self.modified, self.conflict = svnFileLocallyModified(filename, self.timestamp)
-##            else:
-##                self.missing = True
-##
+            status = statuses.get(name, (False, False, False))
+        self.setStatus(status)
+
+    def setStatus(self, (missing, modified, conflict)):
+        self.missing, self.modified, self.conflict = missing, modified, conflict
         self.imgIdx = self.missing and self.missing << 2 \
                       or self.conflict *5 or self.modified << 1
 
@@ -539,9 +501,12 @@ class FSSVNFolderNode(ExplorerNodes.ExplorerNode):
         self.vetoSort = True
         self.dirpos = 0
         self.upImgIdx = 7
+        self.statuses = None
+        self.listing = None
 
     def destroy(self):
         self.entries = []
+        self.listing = None
 
     def getDescription(self):
         try:
@@ -575,10 +540,14 @@ class FSSVNFolderNode(ExplorerNodes.ExplorerNode):
             return SVNFolderNode(entry, self.resourcepath, self.dirpos, self)
         elif entry['kind'] == 'file':
             try:
-                return SVNFileNode(entry, self.resourcepath, self)
+                return SVNFileNode(entry, self.resourcepath, self,
+                                   self.statuses)
             except IOError:
                 return None
 
+    def getWorkingDir(self):
+        return os.path.dirname(self.resourcepath)
+
     def openList(self):
         def readFile(self, name):
             return open(os.path.join(self.resourcepath, name)).read().strip()
@@ -588,8 +557,10 @@ class FSSVNFolderNode(ExplorerNodes.ExplorerNode):
         names = {}
         files = []
         dirs = []
-        p = SVNEntriesParser(os.path.join(self.resourcepath, 'entries'))
-        for name, entry in p.entries:
+        # shown until the service passes the current statuses to openListing
+        self.statuses = VCSStatus.getService().cachedStatuses('svn',
+              self.getWorkingDir())
+        for entry in VCSStatus.getEntries('svn', self.getWorkingDir()).entries:
             svnNode = self.createChildNode(entry)
             if entry['kind'] == 'file':
                 files.append(svnNode)
@@ -648,6 +619,27 @@ class FSSVNFolderNode(ExplorerNodes.ExplorerNode):
 ##        self.entries = lst
         return self.entries 
 
+    def openListing(self):
+        self.listing = listing = ExplorerNodes.nodeListing(self.openList())
+        VCSStatus.getService().request('svn', self.getWorkingDir(),
+              lambda statuses, listing=listing:
+                  self.updateStatuses(listing, statuses))
+        return listing
+
+    def updateStatuses(self, listing, statuses):
+        """ Called with the statuses computed by the VCSStatus service """
+        changed = []
+        for idx in range(len(listing)):
+            node = listing.getNode(idx)
+            if isinstance(node, SVNFileNode) and statuses.has_key(node.name):
+                node.setStatus(statuses[node.name])
+                if listing.imgIdxs[idx] != node.imgIdx:
+                    listing.imgIdxs[idx] = node.imgIdx
+                    changed.append(idx)
+
+        if changed and listing is self.listing and self.itemsUpdateNotify:
+            self.itemsUpdateNotify(listing, changed)
+
     def open(self, editor):
         return editor.openOrGotoModule(self.resourcepath)
 
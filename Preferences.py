@@ -131,8 +131,8 @@ from Config.prefs_keys_rc import *
 from Config.prefs_plugins_rc import *
 
 # upgrade if needed and exec in our namespace
-for prefsFile, version in (('prefs_rc.py', 18),
-                           ('prefs_%s_rc.py'%thisPlatform, 9),
+for prefsFile, version in (('prefs_rc.py', 19),
+                           ('prefs_%s_rc.py'%thisPlatform, 10),
                            ('prefs_keys_rc.py', 10),
                            ('prefs_plugins_rc.py', None)):
     file = os.path.join(rcPath, prefsFile)
@@ -219,10 +219,16 @@ if imageStoreType == 'files':
     from ImageStore import ImageStore
 if imageStoreType == 'zip' :
     from ImageStore import ZippedImageStore as ImageStore
+if imageStoreType == 'atlas' :
+    from ImageStore import AtlasImageStore as ImageStore
 if imageStoreType == 'resource':
     from ImageStore import ResourceImageStore as ImageStore
 IS = ImageStore(imageStorePaths, cache=useImageCache)
 
+# image lists shared by the Editor, Explorer, Inspector and views
+from ImageStore import ImageListManager
+ILM = ImageListManager(IS)
+
 def getPythonInterpreterPath():
     if not pythonInterpreterPath:
         if hasattr(sys, 'frozen'):
@@ -291,6 +297,7 @@ paletteTitle = 'Boa Constructor'
 #except: pass
 
 def cleanup():
+    ILM.cleanup()
     IS.cleanup()
 ##    g = globals()
 ##    cleanWxClasses = (wxColourPtr, wxPointPtr, wxSizePtr, wxFontPtr,
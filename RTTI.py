@@ -100,7 +100,44 @@ class PropertyWrapper:
         else:
             return ''
 
-_methodTypeCache = {}
+# (Class, companion Class) -> (constructor props, props) as sorted lists of
+# (name, getter, setter) for the properties picked up from the class hierarchy
+_propSchemaCache = {}
+
+def getPropSchema(obj, cmp):
+    """ Classified Get/Set pairs of obj's class hierarchy, split into
+        constructor and other properties.
+
+        Walking the hierarchy and invoking every getter is expensive, so this
+        is done only for the first instance of every (class, companion class)
+        combination.
+    """
+    key = (obj.__class__, cmp.__class__)
+    if key not in _propSchemaCache:
+        props = {}
+        props['Properties'] = {}
+        props['Methods'] = {}
+        props['Built-ins'] = {}
+
+        # traverse inheritance hierarchy
+        traverseAndBuildProps(props, cmp.vetoedMethods(), obj, obj.__class__)
+
+        constrNames = cmp.constructor()
+        hidden = cmp.hideDesignTime()
+        constrSchema, propSchema = [], []
+        propNames = props['Properties'].keys()
+        propNames.sort()
+        for propName in propNames:
+            if propName in hidden:
+                continue
+            getter, setter = props['Properties'][propName]
+            if constrNames.has_key(propName):
+                constrSchema.append( (propName, getter, setter) )
+            else:
+                propSchema.append( (propName, getter, setter) )
+        _propSchemaCache[key] = (constrSchema, propSchema)
+    return _propSchemaCache[key]
+
 def getPropList(obj, cmp):
     """
        Function to extract sorted list of properties and getter/setter methods
@@ -121,36 +158,20 @@ def getPropList(obj, cmp):
             propLst.append(PropertyWrapper(name, methType, meths[0], meths[1]))
 
     #getPropList(obj, cmp):-
-    props = {}
-    props['Properties'] = {}
-    props['Methods'] = {}
-    props['Built-ins'] = {}
-
-    # traverse inheritance hierarchy
     # populate property list
     propLst = []
     constrLst = []
     #           2.4                          2.5
     if obj and (type(obj) is InstanceType or isinstance(obj, wx.Object)):
-        traverseAndBuildProps(props, cmp.vetoedMethods(), obj, obj.__class__)
+        constrNames = cmp.constructor()
+        constrSchema, propSchema = getPropSchema(obj, cmp)
+
+        # bind the cached classification to new wrappers
+        for propName, getter, setter in constrSchema:
+            constrLst.append(PropertyWrapper(propName, 'CtrlRoute', getter, setter))
+        for propName, getter, setter in propSchema:
+            propLst.append(PropertyWrapper(propName, 'CtrlRoute', getter, setter))
 
-        # populate property list
-        if cmp:
-            constrNames = cmp.constructor()
-        else:
-            constrNames = {}
-        propNames = props['Properties'].keys()
-        propNames.sort()
-        for propName in propNames:
-            if cmp and propName in cmp.hideDesignTime():
-                continue
-            propMeths = props['Properties'][propName]
-            try:
-                catalogProperty(propName, 'CtrlRoute', propMeths,
-                  constrNames, propLst, constrLst)
-            except:
-                catalogProperty(propName, 'NoneRoute', (None, None),
-                  constrNames, propLst, constrLst)
         if cmp:
             xtraProps = cmp.properties()
             propNames = xtraProps.keys()
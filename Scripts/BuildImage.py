@@ -12,12 +12,15 @@
 #-----------------------------------------------------------------------------
 
 ''' Copy all files specified in the CVS entry files recursively
-to create an image for distribution '''
+to create an image for distribution
+
+With -atlas, instead pack the Images directory into Images.atlas for the
+'atlas' image store type. '''
 
 buildDest = '..\\Releases\\Image'
 buildRoot = '..'
 
-import os, shutil, string
+import os, sys, shutil, string
 
 def copyFilePath(srcFilepath, dstFilepath):
     try:
@@ -48,4 +51,14 @@ def copyFilePath(srcFilepath, dstFilepath):
     except IOError:
         print 'CVS does not exist'
 
-copyFilePath(buildRoot, buildDest)
\ No newline at end of file
+def buildAtlas(rootPath):
+    sys.path.insert(0, rootPath)
+    import ImageStore
+    cnt = ImageStore.writeImageAtlas(rootPath)
+    print 'packed %d images into %s'%(cnt, 
+          os.path.join(rootPath, ImageStore.atlasFilename))
+
+if '-atlas' in sys.argv:
+    buildAtlas(os.path.abspath(buildRoot))
+else:
+    copyFilePath(buildRoot, buildDest)
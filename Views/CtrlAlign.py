@@ -68,6 +68,8 @@ class ControlAlignmentFrame(wx.Dialog):
         self._init_ctrls(parent)
         self.choices = (_('No change'), _('No change'))
         self.selection = selection
+        # (selection group, new position, None) tuples, applied by the Designer
+        self.geometry = []
         self.Centre(wx.BOTH)
 
     def OnOkbtnButton(self, event):
@@ -124,10 +126,7 @@ class ControlAlignmentFrame(wx.Dialog):
 #            elif self.choices[ver] == 'Center in window': pass
 
             if domove:
-                sel.position = wx.Point(newX, newY)
-                sel.dragging = True
-                sel.moveRelease()
-                sel.positionUpdate()
+                self.geometry.append( (sel, wx.Point(newX, newY), None) )
 
             selIdx = selIdx + 1
 
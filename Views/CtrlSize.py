@@ -75,6 +75,8 @@ class ControlSizeFrame(wx.Dialog):
         self._init_ctrls(parent)
         self.choices = (_('No change'), _('No change'))
         self.selection = selection
+        # (selection group, None, new size) tuples, applied by the Designer
+        self.geometry = []
         self.Centre(wx.BOTH)
 
     def OnOkbtnButton(self, event):
@@ -125,10 +127,7 @@ class ControlSizeFrame(wx.Dialog):
                 newY = int(self.heightTC.GetValue())
 
             if dosize:
-                sel.size = wx.Point(newX, newY)
-                sel.OnSizeEnd2()
-                sel.setSelection()
-                sel.sizeUpdate()
+                self.geometry.append( (sel, None, wx.Size(newX, newY)) )
 
             selIdx = selIdx + 1
 
@@ -12,7 +12,7 @@
 
 print 'importing Views.Designer'
 
-import copy, os, pprint, math
+import copy, os, pprint, math, time, re
 
 import wx
 
@@ -21,7 +21,7 @@ from Preferences import IS
 from Utils import _
 
 import CtrlAlign, CtrlSize
-import sourceconst
+import sourceconst, PaletteMapping
 
 from InspectableViews import InspectableObjectView
 import SelectionTags
@@ -166,6 +166,11 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
         self.vetoResize = False
         self.forceResize = False
         self.deletingCtrl = False
+        # controls on hidden notebook pages that have not been created yet
+        # {page name: [constructor parse objects]}
+        self.deferredPages = {}
+        self.lastPasteTime = 0.0
+        self.creationOrder = []
         #self.objectNamespace = DesignerNamespace(self)
         # XXX Move this definition into actions
 
@@ -267,6 +272,7 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
 
     def saveCtrls(self, definedCtrls, module=None):
         """ Generate source code for Designer """
+        self.createDeferredCtrls()
 
         if not module:
             module = self.model.getModule()
@@ -307,6 +313,7 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
 
     def renameCtrl(self, oldName, newName):
         """ Rename control, references to control and update parent tree """
+        self.createDeferredCtrls()
 
         prel, pref = self.buildParentRelationship()
 
@@ -330,6 +337,7 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
     def renameFrame(self, oldName, newName):
         """ Hook that also updates the Model and window ids of the
             Frame when it's name changes """
+        self.createDeferredCtrls()
         self.SetName(newName)
 
         # propagate rename to model
@@ -359,22 +367,28 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
     def refreshCtrl(self):
         """ Model View method that is called when the Designer should
             create itself from source
+
+            Controls are created in a batch: the frame is frozen, resize
+            handling and the selection tags are deferred until all controls
+            exist and the whole frame is laid out once at the end.
         """
         if self.destroying or self.opened: return
 
         # Delete previous
         comps = {}
 
-        # Create selection if none is defined
-        if not self.selection:
-            self.selection = \
-                  SelectionTags.SingleSelectionGroup(self, self.inspector, self)
-
         self.model.editor.statusBar.setHint(_('Creating frame'))
 
+        phaseTimes = {'parse': 0.0, 'create': 0.0, 'props': 0.0,
+                      'layout': 0.0}
+        evalTime = PaletteMapping.evalTime
+
+        self.Freeze()
         try:
+            start = time.time()
             objCol = self.model.objectCollections[self.collectionMethod]
             objCol.indexOnCtrlName()
+            phaseTimes['parse'] = self.model.parseTime + time.time() - start
 
             self.model.editor.statusBar.progress.SetValue(20)
 
@@ -385,6 +399,7 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
             # initObjectsAndCompanions(creators, props, events)
 
             self.inspector.vetoSelect = True
+            self.vetoResize = True
             try:
                 # init main construtor
                 self.companion.setConstr(self.model.mainConstr)
@@ -392,37 +407,190 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
                 deps = {}
                 depLnks = {}
 
+                start = time.time()
                 self.initObjProps(objCol.propertiesByName, '', objCol.creators[0], deps, depLnks)
                 self.initObjEvts(objCol.eventsByName, '', objCol.creators[0])
-
-                if len(objCol.creators) > 1:
-                    self.initObjectsAndCompanions(objCol.creators[1:], objCol, deps, depLnks)
+                phaseTimes['props'] = time.time() - start
+
+                creators = objCol.creators[1:]
+                self.creationOrder = [''] + \
+                      [constr.comp_name for constr in creators]
+                if Preferences.dsLazyNotebookPages:
+                    self.deferredPages = self.findDeferrablePages(objCol)
+                    deferred = {}
+                    for pageCreators in self.deferredPages.values():
+                        for constr in pageCreators:
+                            deferred[constr.comp_name] = True
+                    creators = [constr for constr in creators
+                                if constr.comp_name not in deferred]
+
+                if creators:
+                    self.initObjectsAndCompanions(creators, objCol,
+                          deps, depLnks, phaseTimes)
 
                     # Track progress
                     step = (90 - stepsDone) / len(objCol.creators)
                     stepsDone = stepsDone + step
                     self.model.editor.statusBar.progress.SetValue(int(stepsDone))
 
+                start = time.time()
                 self.finaliseDepLinks(depLnks)
-
-                self.OnRelayoutDesigner(None)
-
-                if len(depLnks):
-                    wx.LogWarning(pprint.pformat(depLnks))
-                    wx.LogWarning(_('These links were not resolved (Details...)'))
+                phaseTimes['props'] = phaseTimes['props'] + time.time() - start
 
             finally:
+                self.vetoResize = False
                 self.inspector.vetoSelect = False
 
+            start = time.time()
+            # Create selection if none is defined
+            if not self.selection:
+                self.selection = \
+                      SelectionTags.SingleSelectionGroup(self, self.inspector, self)
+
+            self.OnRelayoutDesigner(None)
+
+            if len(depLnks):
+                wx.LogWarning(pprint.pformat(depLnks))
+                wx.LogWarning(_('These links were not resolved (Details...)'))
+
             self.model.editor.statusBar.progress.SetValue(80)
             self.refreshContainment()
+            phaseTimes['layout'] = time.time() - start
+
             self.model.editor.statusBar.progress.SetValue(0)
-            self.model.editor.statusBar.setHint(_('Designer refreshed'))
+            self.model.editor.statusBar.setHint(_('Designer refreshed (parse '
+                  '%(parse).2fs, create %(create).2fs, properties '
+                  '%(props).2fs, of which eval %(eval).2fs, layout '
+                  '%(layout).2fs)')%dict(phaseTimes,
+                  eval=PaletteMapping.evalTime - evalTime))
             self.opened = True
         except:
             self.model.editor.statusBar.progress.SetValue(0)
             #self.model.editor.statusBar.setHint('Error opening the Designer', 'Error')
+            self.Thaw()
             raise
+        else:
+            self.Thaw()
+
+    def findDeferrablePages(self, objCol):
+        """ Find controls on notebook pages that are hidden when the frame
+            opens and can be created later, when their page is shown.
+
+            Pages are only deferred if their controls are not referenced from
+            anywhere else in the source, e.g. from sizers, other controls'
+            properties or event handlers.
+
+            Returns a dictionary of page name: creators in creation order
+        """
+        parents = {}
+        for constr in objCol.creators[1:]:
+            if constr.params.has_key('parent'):
+                parents[constr.comp_name] = \
+                      Utils.ctrlNameFromSrcRef(constr.params['parent'])
+
+        pages = {}
+        for collMeth, collObjCol in self.model.objectCollections.items():
+            if not collMeth.startswith('_init_coll_') or \
+                  not collMeth.endswith('_Pages'):
+                continue
+            pageNames = []
+            shownPage = None
+            for constr in collObjCol.creators:
+                if constr.params.get('page', 'None') == 'None':
+                    continue
+                pageName = Utils.ctrlNameFromSrcRef(constr.params['page'])
+                pageNames.append(pageName)
+                if constr.params.get('select') == 'True':
+                    shownPage = pageName
+            if pageNames and shownPage is None:
+                shownPage = pageNames[0]
+            for pageName in pageNames:
+                if pageName != shownPage and parents.has_key(pageName):
+                    pages[pageName] = []
+
+        if not pages:
+            return pages
+
+        # parents are created before their children
+        pageOwners = {}
+        for constr in objCol.creators[1:]:
+            name = constr.comp_name
+            parent = parents.get(name)
+            if pages.has_key(parent):
+                pageOwners[name] = parent
+            elif pageOwners.has_key(parent):
+                pageOwners[name] = pageOwners[parent]
+            else:
+                continue
+            pages[pageOwners[name]].append(constr)
+
+        for pageName, creators in pages.items():
+            if not creators:
+                del pages[pageName]
+                continue
+            names = [constr.comp_name for constr in creators]
+            ownSource = []
+            for constr in creators:
+                ownSource.append(constr.asText())
+                for dct in (objCol.propertiesByName, objCol.eventsByName,
+                            objCol.collectionsByName):
+                    for item in dct.get(constr.comp_name, []):
+                        ownSource.append(item.asText())
+            refs = re.compile(r'\bself\.(%s)\b'%'|'.join(names))
+            if len(refs.findall(self.model.data)) != \
+                  len(refs.findall('\n'.join(ownSource))):
+                del pages[pageName]
+
+        return pages
+
+    def createDeferredCtrls(self, page=None):
+        """ Create controls of notebook pages that were deferred while
+            opening the Designer, either for the given page control or for
+            all pages """
+        if not self.deferredPages:
+            return
+
+        if page is None:
+            pageNames = self.deferredPages.keys()
+        else:
+            pageNames = [name for name in self.deferredPages.keys()
+                         if self.objects[name][1] is page]
+            if not pageNames:
+                return
+
+        objCol = self.model.objectCollections[self.collectionMethod]
+        objCol.indexOnCtrlName()
+
+        depLnks = {}
+        self.Freeze()
+        # page changes also fire while the Designer is loading, leave the
+        # veto of the load in place
+        vetoSelect = self.inspector.vetoSelect
+        self.inspector.vetoSelect = True
+        try:
+            for pageName in pageNames:
+                creators = self.deferredPages[pageName]
+                del self.deferredPages[pageName]
+                self.initObjectsAndCompanions(creators, objCol, {}, depLnks)
+            self.finaliseDepLinks(depLnks)
+
+            # keep the source order of controls created on demand
+            order = {}
+            for idx in range(len(self.creationOrder)):
+                order[self.creationOrder[idx]] = idx
+            objectOrder = [(order.get(name, len(order)), idx, name)
+                  for idx, name in zip(range(len(self.objectOrder)),
+                                       self.objectOrder)]
+            objectOrder.sort()
+            self.objectOrder[:] = [name for o, i, name in objectOrder]
+        finally:
+            self.inspector.vetoSelect = vetoSelect
+            self.Thaw()
+
+        for pageName in pageNames:
+            self.relayoutCtrl(self.objects[pageName][1])
+
+        self.refreshContainment()
 
     def refreshModel(self):
         """ Update model with streamed out controls """
@@ -582,6 +750,8 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
 
     def deleteCtrl(self, name, parentRef = None):
         """ Delete a control, update selection and parent tree """
+        if not parentRef:
+            self.createDeferredCtrls()
         ctrlInfo = self.objects[name]
         if ctrlInfo[1] == self:
             wx.MessageBox(_("Can't delete frame"), style=wx.OK | wx.ICON_ERROR, parent=self)
@@ -754,10 +924,12 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
 
         def hasParentInList(item, list):
             return item in list
-        exp = ctrlNames[:]
+        names = {}
+        for name in ctrlNames:
+            names[name] = None
 
         colLst = [name for name in ctrlNames
-                  if self.objects[name][2] not in ctrlNames]
+                  if not names.has_key(self.objects[name][2])]
 
         return colLst
 
@@ -1197,14 +1369,18 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
         """ Show alignment dialog for multi selections"""
         if self.multiSelection:
             dlg = CtrlAlign.ControlAlignmentFrame(self, self.multiSelection)
-            try: dlg.ShowModal()
+            try:
+                if dlg.ShowModal() == wx.OK:
+                    self.applyGeometry(dlg.geometry)
             finally: dlg.Destroy()
 
     def OnSizeSelected(self, event=None):
         """ Show size dialog for multi selections"""
         if self.multiSelection:
             dlg = CtrlSize.ControlSizeFrame(self, self.multiSelection)
-            try: dlg.ShowModal()
+            try:
+                if dlg.ShowModal() == wx.OK:
+                    self.applyGeometry(dlg.geometry)
             finally: dlg.Destroy()
 
     def OnSelectParent(self, event=None):
@@ -1217,6 +1393,7 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
 #---Clipboard operations--------------------------------------------------------
     def OnCutSelected(self, event):
         """ Cut current selection to the clipboard """
+        self.createDeferredCtrls()
         if self.selection:
             if self.selection.isProxySelection():
                 wx.LogError(_('Nothing to cut'))
@@ -1236,6 +1413,7 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
 
     def OnCopySelected(self, event):
         """ Copy current selection to the clipboard """
+        self.createDeferredCtrls()
         if self.selection:
             if self.selection.isProxySelection():
                 wx.LogError(_('Nothing to copy'))
@@ -1260,6 +1438,9 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
                   str(Utils.readTextFromClipboard()).split(os.linesep))
 
             if len(pasted):
+                self.model.editor.statusBar.setHint(
+                      _('Pasted %d controls in %.2fs')%(len(pasted),
+                      self.lastPasteTime))
                 self.refreshContainment()
                 pasted = self.collapseNamesToContainers(pasted)
                 # Single control pasted, select it
@@ -1290,10 +1471,61 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
                             newSelection.selectCtrl(selCtrl, selCompn)
                             self.multiSelection.append(newSelection)
 
+    def usedObjNames(self):
+        names = InspectableObjectView.usedObjNames(self)
+        # controls on deferred notebook pages don't exist yet
+        for creators in self.deferredPages.values():
+            names.extend([constr.comp_name for constr in creators])
+        return names
+
+    def pasteCtrls(self, destCtrlName, input):
+        """ Paste controls with layout and painting suspended until all
+            controls are created """
+        start = time.time()
+        self.Freeze()
+        self.vetoResize = True
+        try:
+            return InspectableObjectView.pasteCtrls(self, destCtrlName, input)
+        finally:
+            self.vetoResize = False
+            self.Thaw()
+            self.lastPasteTime = time.time() - start
+
+    def timePastes(self, counts=(50, 200, 500)):
+        """ Benchmark pasting, intended to be called from the shell.
+
+        For each count a panel containing that many buttons is pasted onto
+        the frame and deleted again. Returns a list of (count, seconds)
+        tuples.
+        """
+        results = []
+        for count in counts:
+            lines = ['%sdef %s(%s):'%(sourceconst.methodIndent,
+                  self.collectionMethod, self.collectionParams),
+                  "%sself.panel1 = wx.Panel(id=PANEL1, name='panel1', "
+                  "parent=self, pos=wx.Point(0, 0), size=wx.Size(400, 400), "
+                  "style=wx.TAB_TRAVERSAL)"%sourceconst.bodyIndent, '']
+            for idx in range(1, count+1):
+                lines.extend(["%sself.button%d = wx.Button(id=BUTTON%d, "
+                  "label='button%d', name='button%d', parent=self.panel1, "
+                  "pos=wx.Point(%d, %d), size=wx.Size(75, 23), style=0)"%(
+                  sourceconst.bodyIndent, idx, idx, idx, idx,
+                  idx / 16 * 80, idx % 16 * 24), ''])
+
+            start = time.time()
+            pasted = self.pasteCtrls('', lines)
+            self.refreshContainment()
+            results.append( (count, time.time() - start) )
+
+            for name in self.collapseNamesToContainers(pasted):
+                self.deleteCtrl(name)
+        return results
+
     def OnRecreateSelected(self, event):
         """ Recreate the current selection by cutting and pasting it.
             The clipboard is not disturbed.
             This is useful for applying changes to constructor parameters """
+        self.createDeferredCtrls()
         if self.selection and self.selection.selection != self:
             output = []
             ctrlName = self.selection.name
@@ -1316,59 +1548,77 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
         else:
             return []
 
-    def moveUpdate(self, sel):
-        sel.setSelection(True)
-        sel.resizeCtrl()
+    def applyGeometry(self, changes):
+        """ Move and/or resize a batch of selected controls in one step
+
+        changes is a sequence of (selection group, position, size) tuples,
+        a position or size of None leaves it unchanged.
+        All controls are updated inside one Freeze/Thaw, afterwards the
+        source is persisted and the Inspector updated once per changed
+        control.
+        """
+        moved, sized = [], []
+        self.Freeze()
+        self.vetoResize = True
+        try:
+            for sel, pos, size in changes:
+                if sel.selection is None or sel.selection == self:
+                    continue
+                changed = False
+                if pos is not None and pos.Get() != sel.position.Get():
+                    sel.position = wx.Point(pos.x, pos.y)
+                    moved.append(sel)
+                    changed = True
+                if size is not None and size.Get() != sel.size.Get():
+                    sel.size = wx.Size(size.x, size.y)
+                    sized.append(sel)
+                    changed = True
+                if changed:
+                    # the new geometry is the reference the selection is
+                    # granularised against, otherwise 1 pixel steps snap back
+                    sel.initStartVals()
+                    sel.resizeCtrl()
+                    sel.setSelection(True)
+        finally:
+            self.vetoResize = False
+            self.Thaw()
+
+        # containers relayout their children when they receive the size event
+        for sel in sized:
+            wx.PostEvent(sel.selection, wx.SizeEvent(sel.selection.GetSize()))
+
+        for sel in moved:
+            sel.positionUpdate()
+        for sel in sized:
+            sel.sizeUpdate()
+
+    def moveSelectionBy(self, dx, dy):
+        self.applyGeometry([(sel, wx.Point(sel.position.x + dx,
+              sel.position.y + dy), None) for sel in self.getSelAsList()])
 
     def OnMoveLeft(self, event):
-        for sel in self.getSelAsList():
-            if sel.selection != self:
-                sel.position.x = sel.position.x - 1
-                sel.startPos.x = sel.startPos.x - 1
-                self.moveUpdate(sel)
+        self.moveSelectionBy(-1, 0)
     def OnMoveRight(self, event):
-        for sel in self.getSelAsList():
-            if sel.selection != self:
-                sel.position.x = sel.position.x + 1
-                sel.startPos.x = sel.startPos.x + 1
-                self.moveUpdate(sel)
+        self.moveSelectionBy(1, 0)
     def OnMoveUp(self, event):
-        for sel in self.getSelAsList():
-            if sel.selection != self:
-                sel.position.y = sel.position.y - 1
-                sel.startPos.y = sel.startPos.y - 1
-                self.moveUpdate(sel)
+        self.moveSelectionBy(0, -1)
     def OnMoveDown(self, event):
-        for sel in self.getSelAsList():
-            if sel.selection != self:
-                sel.position.y = sel.position.y + 1
-                sel.startPos.y = sel.startPos.y + 1
-                self.moveUpdate(sel)
+        self.moveSelectionBy(0, 1)
 
-    def sizeUpdate(self, sel):
-        sel.resizeCtrl()
-        sel.setSelection(True)
+    def sizeSelectionBy(self, dx, dy):
+        sel = self.selection
+        if sel and sel.size.x + dx >= 0 and sel.size.y + dy >= 0:
+            self.applyGeometry([(sel, None,
+                  wx.Size(sel.size.x + dx, sel.size.y + dy))])
 
     def OnWidthInc(self, event):
-        sel = self.selection
-        if sel and sel.selection != self:
-            sel.size.x = sel.size.x + 1
-            self.sizeUpdate(sel)
+        self.sizeSelectionBy(1, 0)
     def OnWidthDec(self, event):
-        sel = self.selection
-        if sel and sel.selection != self and sel.size.x > 0:
-            sel.size.x = sel.size.x - 1
-            self.sizeUpdate(sel)
+        self.sizeSelectionBy(-1, 0)
     def OnHeightInc(self, event):
-        sel = self.selection
-        if sel and sel.selection != self:
-            sel.size.y = sel.size.y + 1
-            self.sizeUpdate(sel)
+        self.sizeSelectionBy(0, 1)
     def OnHeightDec(self, event):
-        sel = self.selection
-        if sel and sel.selection != self and sel.size.y > 0:
-            sel.size.y = sel.size.y - 1
-            self.sizeUpdate(sel)
+        self.sizeSelectionBy(0, -1)
 
 #---Cursor selection------------------------------------------------------------
     def selectInDimentionDirection(self, selctrl, dim, dir):
@@ -1459,13 +1709,10 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
 #-------------------------------------------------------------------------------
 
     def OnSnapToGrid(self, event):
-        for sel in self.getSelAsList():
-            if sel.selection != self:
-                sel.position.x = SelectionTags.granularise(sel.position.x)
-                sel.position.y = SelectionTags.granularise(sel.position.y)
-                sel.startPos.x = sel.position.x
-                sel.startPos.y = sel.position.y
-                self.moveUpdate(sel)
+        self.applyGeometry([(sel,
+              wx.Point(SelectionTags.granularise(sel.position.x),
+                       SelectionTags.granularise(sel.position.y)), None)
+              for sel in self.getSelAsList()])
 
     def relayoutCtrl(self, ctrl):
         self.forceResize = True # cleared by the event
@@ -1490,6 +1737,7 @@ class DesignerView(wx.Frame, InspectableObjectView, Utils.FrameRestorerMixin):
                 sizer.Fit(sel.selection)
 
     def OnCreationOrder(self, event):
+        self.createDeferredCtrls()
         sel = self.selection
         if sel:
             selName = sel.selection.GetName()
@@ -1545,6 +1793,8 @@ class DesignerControlsEvtHandler(wx.EvtHandler):
                                 'bitmap': self.drawGrid_bitmap,
                                 'grid'  : self.drawGrid_grid}
         self._points = (0, 0), []
+        # (grid size, background colour) -> tile bitmap
+        self._gridTiles = {}
 
     def connectEvts(self, ctrl, connectChildren=False):
         ctrls = [ctrl]
@@ -1693,42 +1943,49 @@ class DesignerControlsEvtHandler(wx.EvtHandler):
 
 #---Grid drawing----------------------------------------------------------------
 
-    def _drawLines(self, dc, col, loglFunc, sze, sg):
-        """ Draw horizontal and vertical lines
+    def _drawLines(self, dc, col, loglFunc, sze, sg, rect=None):
+        """ Draw horizontal and vertical lines, only those crossing rect if
+            given
         """
         pen1 = wx.Pen(col)
         dc.SetPen(pen1)
         dc.SetLogicalFunction(loglFunc)
+        if rect is None:
+            rect = wx.Rect(0, 0, sze.x, sze.y)
+        left, top = rect.x / sg, rect.y / sg
+        right = min(rect.x + rect.width, sze.x) / sg
+        bottom = min(rect.y + rect.height, sze.y) / sg
         lines = []
-        for y in range(sze.y / sg + 1):
-            lines.append( (0, y * sg, sze.x, y * sg) )
+        for y in range(top, bottom + 1):
+            lines.append( (rect.x, y * sg, rect.x + rect.width, y * sg) )
 
-        for x in range(sze.x / sg + 1):
-            lines.append( (x * sg, 0, x * sg, sze.y) )
+        for x in range(left, right + 1):
+            lines.append( (x * sg, rect.y, x * sg, rect.y + rect.height) )
 
         dc.DrawLineList(lines)
 
-    def drawGrid_intersectingLines(self, dc, sze, sg):
+    def drawGrid_intersectingLines(self, dc, sze, sg, rect=None):
         """ Cute hack to draw dots by intersecting lines
         """
         bgCol = dc.GetBackground().GetColour()
         xorBgCol = wx.Colour(255^bgCol.Red(), 255^bgCol.Green(), 255^bgCol.Blue())
 
-        self._drawLines(dc, xorBgCol, wx.COPY, sze, sg)
-        self._drawLines(dc, wx.WHITE, wx.XOR, sze, sg)
+        self._drawLines(dc, xorBgCol, wx.COPY, sze, sg, rect)
+        self._drawLines(dc, wx.WHITE, wx.XOR, sze, sg, rect)
 
     darken = 15
-    def drawGrid_grid(self, dc, sze, sg):
-        """ The default method, drawing horizontal and vertical grid lines.
+    def darkerColour(self, bgCol):
+        return wx.Colour(max(bgCol.Red()   -self.darken, 0),
+                         max(bgCol.Green() -self.darken, 0),
+                         max(bgCol.Blue()  -self.darken, 0))
+
+    def drawGrid_grid(self, dc, sze, sg, rect=None):
+        """ Drawing horizontal and vertical grid lines.
         """
         bgCol = dc.GetBackground().GetColour()
-        darkerBgCol = wx.Colour(max(bgCol.Red()   -self.darken, 0),
-                                max(bgCol.Green() -self.darken, 0),
-                                max(bgCol.Blue()  -self.darken, 0))
+        self._drawLines(dc, self.darkerColour(bgCol), wx.COPY, sze, sg, rect)
 
-        self._drawLines(dc, darkerBgCol, wx.COPY, sze, sg)
-
-    def drawGrid_dots(self, dc, sze, sg):
+    def drawGrid_dots(self, dc, sze, sg, rect=None):
         """ The slowest method, drawing each dot of the grid individually
         """
         pen1 = wx.Pen(wx.BLACK)
@@ -1742,13 +1999,40 @@ class DesignerControlsEvtHandler(wx.EvtHandler):
             self._points = (szex, szey), points
         dc.DrawPointList(points)
 
-    def drawGrid_bitmap(self, dc, sze, sg):
-        """ This should be the most efficient method, when the granularity is
-            changed, a new (possibly +-32x32) bitmap should be created with
-            transparent background and black grid points. This can then be
-            blitted over background
+    gridTileSize = 64
+    def getGridTile(self, sg, bgCol):
+        """ Returns a bitmap of grid lines that tiles seamlessly, cached per
+            grid size and background colour """
+        key = (sg, bgCol.Red(), bgCol.Green(), bgCol.Blue())
+        try:
+            return self._gridTiles[key]
+        except KeyError:
+            tileSize = sg * max(self.gridTileSize / sg, 1)
+            tile = wx.EmptyBitmap(tileSize, tileSize)
+            mdc = wx.MemoryDC()
+            mdc.SelectObject(tile)
+            mdc.SetBackground(wx.Brush(bgCol))
+            mdc.Clear()
+            self._drawLines(mdc, self.darkerColour(bgCol), wx.COPY,
+                            wx.Size(tileSize - 1, tileSize - 1), sg,
+                            wx.Rect(0, 0, tileSize, tileSize))
+            mdc.SelectObject(wx.NullBitmap)
+            self._gridTiles[key] = tile
+            return tile
+
+    def drawGrid_bitmap(self, dc, sze, sg, rect=None):
+        """ Looks like the 'grid' method but blits a pre-rendered tile of
+            grid lines over the area that needs painting
         """
-        pass
+        if rect is None:
+            rect = wx.Rect(0, 0, sze.x, sze.y)
+        tile = self.getGridTile(sg, dc.GetBackground().GetColour())
+        tileSize = tile.GetWidth()
+        right = min(rect.x + rect.width, sze.x)
+        bottom = min(rect.y + rect.height, sze.y)
+        for y in range(rect.y / tileSize * tileSize, bottom, tileSize):
+            for x in range(rect.x / tileSize * tileSize, right, tileSize):
+                dc.DrawBitmap(tile, x, y, False)
 
     def updateDCProps(self, dc, sizer, validCol):
         if sizer.__class__.__name__ == 'BlankSizer':
@@ -1794,11 +2078,15 @@ class DesignerControlsEvtHandler(wx.EvtHandler):
                     yoffset = tb.GetSize().y
 
             drawGrid = self.drawGridMethods[Preferences.drawGridMethod]
+            # only repaint the damaged part of the grid
+            updateRect = ctrl.GetUpdateRegion().GetBox()
+            if updateRect.IsEmpty():
+                updateRect = None
 
             dc.BeginDrawing()
             try:
                 if Preferences.drawDesignerGrid:
-                    drawGrid(dc, sze, sg)
+                    drawGrid(dc, sze, sg, updateRect)
 
                 sizer = ctrl.GetSizer()
                 if sizer:
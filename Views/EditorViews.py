@@ -17,7 +17,7 @@ import wx
 import wx.html
 
 import Preferences, Utils
-from Preferences import IS, staticInfoPrefs, keyDefs
+from Preferences import IS, ILM, staticInfoPrefs, keyDefs
 from Utils import _
 
 import Search
@@ -964,18 +964,19 @@ class ExploreView(wx.TreeCtrl, EditorView):
         wx.TreeCtrl.__init__(self, parent, -1, style=wx.TR_HAS_BUTTONS | wx.SUNKEN_BORDER)
         EditorView.__init__(self, model, ((_('Goto line'), self.OnGoto, self.gotoLineBmp, ''),), 0)
 
-        self.tokenImgLst = wx.ImageList(16, 16)
-        for exploreImg in ('Images/Views/Explore/class.png',
-                           'Images/Views/Explore/method.png',
-                           'Images/Views/Explore/event.png',
-                           'Images/Views/Explore/function.png',
-                           'Images/Views/Explore/attribute.png',
-                           'Images/Modules/'+self.model.bitmap,
-                           'Images/Views/Explore/global.png',
-                           'Images/Views/Explore/dottedline.png',
-                           'Images/Views/Explore/import.png',
-                           ):
-            self.tokenImgLst.Add(IS.load(exploreImg))
+        self.tokenImgLst = ILM.getImageList('explore',
+              ('Images/Views/Explore/class.png',
+               'Images/Views/Explore/method.png',
+               'Images/Views/Explore/event.png',
+               'Images/Views/Explore/function.png',
+               'Images/Views/Explore/attribute.png',
+               'Images/Modules/Module.png',
+               'Images/Views/Explore/global.png',
+               'Images/Views/Explore/dottedline.png',
+               'Images/Views/Explore/import.png',
+              ))
+        self.modelImgIdx = ILM.getIndex('explore',
+              'Images/Modules/'+self.model.bitmap)
         self.SetImageList(self.tokenImgLst)
 
         self.active = True
@@ -1010,7 +1011,7 @@ class ExploreView(wx.TreeCtrl, EditorView):
         breakLnNos.sort()
 
         self.DeleteAllItems()
-        rootItem = self.AddRoot(self.model.moduleName, 5, -1,
+        rootItem = self.AddRoot(self.model.moduleName, self.modelImgIdx, -1,
               wx.TreeItemData(CodeBlock('', 0, 0)))
         if module.imports or module.from_imports_names:
             importsItem = self.AppendItem(rootItem, 'Imports', 8, data=wx.TreeItemData(CodeBlock('', 0, 0)))
@@ -1242,12 +1243,13 @@ class HierarchyView(wx.TreeCtrl, EditorView):
         EditorView.__init__(self, model,
           ((_('Goto line'), self.OnGoto, self.gotoLineBmp, ''),), 0)
 
-        self.tokenImgLst = wx.ImageList(16, 16)
-        for hierImg in ('Images/Views/Hierarchy/inherit.png',
-                        'Images/Views/Hierarchy/inherit_base.png',
-                        'Images/Views/Hierarchy/inherit_outside.png',
-                        'Images/Modules/'+self.model.bitmap):
-            self.tokenImgLst.Add(IS.load(hierImg))
+        self.tokenImgLst = ILM.getImageList('hierarchy',
+              ('Images/Views/Hierarchy/inherit.png',
+               'Images/Views/Hierarchy/inherit_base.png',
+               'Images/Views/Hierarchy/inherit_outside.png',
+               'Images/Modules/Module.png'))
+        self.modelImgIdx = ILM.getIndex('hierarchy',
+              'Images/Modules/'+self.model.bitmap)
 
         self.SetImageList(self.tokenImgLst)
 
@@ -1274,7 +1276,7 @@ class HierarchyView(wx.TreeCtrl, EditorView):
         self.DeleteAllItems()
         hierc = module.createHierarchy()
 
-        root = self.AddRoot(self.model.moduleName, 3)
+        root = self.AddRoot(self.model.moduleName, self.modelImgIdx)
         for top in hierc.keys():
             if module.classes.has_key(top): imgIdx = 1
             else: imgIdx = 2
@@ -13,7 +13,7 @@
 #-----------------------------------------------------------------------------
 print 'importing Views.InspectableViews'
 
-import copy, os, pprint
+import copy, os, pprint, time
 
 import wx
 
@@ -121,10 +121,18 @@ class InspectableObjectView(EditorViews.EditorView, Utils.InspectorSessionMix):
     def loadControl(self, ctrlClass, ctrlCompanion, ctrlName, params):
         pass
 
-    def initObjectsAndCompanions(self, creators, objColl, dependents, depLinks):
+    def initObjectsAndCompanions(self, creators, objColl, dependents, depLinks,
+          phaseTimes=None):
+        """ Create and initialise all objects in creators.
+
+        If phaseTimes is given, seconds spent creating objects and setting
+        their properties are added to its 'create' and 'props' entries.
+        """
         collDeps = {}
         for constr in creators:
+            start = time.time()
             self.initObjCreator(constr)
+            created = time.time()
             self.initObjProps(objColl.propertiesByName, constr.comp_name, constr, 
                   dependents, depLinks)
             self.initObjColls(objColl.collectionsByName, constr.comp_name, constr, 
@@ -133,6 +141,10 @@ class InspectableObjectView(EditorViews.EditorView, Utils.InspectorSessionMix):
 
             self.applyDepsForCtrl(constr.comp_name, depLinks)
 
+            if phaseTimes is not None:
+                phaseTimes['create'] = phaseTimes['create'] + created - start
+                phaseTimes['props'] = phaseTimes['props'] + time.time() - created
+
         for ctrlName in collDeps.keys():
             for collInit in collDeps[ctrlName]:
                 self.addCollView(ctrlName, collInit.method, False)
@@ -409,14 +421,32 @@ class InspectableObjectView(EditorViews.EditorView, Utils.InspectorSessionMix):
 
         # XXX Move toolbar up to the 1st position after the frame
 
+        written = self.model.writtenSource.get(self.collectionMethod, {})
+        self.model.writtenSource[self.collectionMethod] = newWritten = {}
+        wrapping = (Preferences.cgWrapLines, Preferences.cgLineWrapWidth,
+                    Preferences.cgContinuedLineIndent)
+
         for ctrlName in self.objectOrder:
             definedCtrls.append(ctrlName)
             compn = self.objects[ctrlName][0]
 
-            compn.writeConstructor(newBody, self.collectionMethod)
-            compn.writeProperties(newBody, ctrlName, definedCtrls, deps, depLinks)
-            compn.writeCollections(newBody, collDeps)
-            compn.writeEvents(newBody, module=module)
+            # Only generate the source of companions changed since the
+            # previous post, the lines of the others are spliced in again
+            state = (wrapping, compn.sourceState())
+            if written.has_key(ctrlName) and written[ctrlName][0] == state:
+                state, lines, depLines = written[ctrlName]
+                compn.writeEventMethods(module)
+            else:
+                lines, depLines = [], []
+                compn.writeConstructor(lines, self.collectionMethod)
+                compn.writeProperties(lines, ctrlName, definedCtrls, deps,
+                      depLinks)
+                compn.writeCollections(lines, depLines)
+                compn.writeEvents(lines, module=module)
+            if not compn.hasDependentSource():
+                newWritten[ctrlName] = (state, lines, depLines)
+            newBody.extend(lines)
+            collDeps.extend(depLines)
 
             compn.writeDependencies(newBody, ctrlName, depLinks, definedCtrls)
 
@@ -595,31 +625,37 @@ class InspectableObjectView(EditorViews.EditorView, Utils.InspectorSessionMix):
                 methodparse.decorateParseItems(objCol.eventsByName[name], name, 
                       self.model.main)
         
-        newNames = []
-        oldNames = []
-        # Preserve order, but determine all new names before creating objs
+        # Preserve order, but determine all new names before creating objs.
+        # New names are also unique among the pasted names so that all
+        # renames can be applied in a single pass
+        usedNames = {}
+        for name in self.usedObjNames():
+            usedNames[name] = None
+        reservedNames = usedNames.copy()
         for name, clss in pasteNameClasses:
-            if name in self.objectOrder:
-                newName = self.newObjName(clss, newNames)
-                newNames.append(newName)
-                oldNames.append(name)
-            else:
-                newNames.append(name)
-                oldNames.append(name)
+            reservedNames[name] = None
 
-        for oldName, newName in map(None, oldNames, newNames):
-            if newName != oldName:
-                objCol.renameCtrl(oldName, newName)
+        renames = {}
+        for name, clss in pasteNameClasses:
+            if usedNames.has_key(name):
+                newName = self.uniqueObjName(self.objNameBase(clss),
+                                             reservedNames)
+                reservedNames[newName] = None
+                renames[name] = newName
                 pastedCtrls.append(newName)
-                for idx in range(len(collObjColls)):
-                    meth, collCtrlName, collObjColl = collObjColls[idx]
-                    collObjColl.renameCtrl(oldName, newName)
-                    if collCtrlName == oldName:
-                        itms = meth.split('_')
-                        itms[3:-1] = [newName]
-                        collObjColls[idx] = ('_'.join(itms), newName, collObjColl)
             else:
-                pastedCtrls.append(oldName)
+                pastedCtrls.append(name)
+
+        if renames:
+            objCol.renameCtrls(renames)
+            for idx in range(len(collObjColls)):
+                meth, collCtrlName, collObjColl = collObjColls[idx]
+                collObjColl.renameCtrls(renames)
+                if renames.has_key(collCtrlName):
+                    newName = renames[collCtrlName]
+                    itms = meth.split('_')
+                    itms[3:-1] = [newName]
+                    collObjColls[idx] = ('_'.join(itms), newName, collObjColl)
 
         # Update model's object collections' collections
         for meth, collCtrlName, collObjColl in collObjColls:
@@ -651,24 +687,38 @@ class InspectableObjectView(EditorViews.EditorView, Utils.InspectorSessionMix):
         if parentName is not None: self.objects[ctrlName].append(parentName)
         self.objectOrder.append(ctrlName)
 
-    def newObjName(self, className, additionalNames = None):
-        """ Return a name for a control unique in the scope of the model. """
+    def usedObjNames(self):
+        """ Names new objects may not be given """
+        return self.objects.keys()
 
-        if additionalNames is None: additionalNames = []
-        # XXX Now that there is multiple maintained methods is may fail because
-        # XXX it's only unique in the method.
-        num = 1
-        
+    def objNameBase(self, className):
+        """ Return the name new objects of className are numbered from """
         dotted = className.rfind('.')
         if dotted != -1:
             if className[:3] == 'wx.':
-                newName = '%s%s'%(className[dotted+1:dotted+2].lower(), className[dotted+2:])
+                return '%s%s'%(className[dotted+1:dotted+2].lower(), className[dotted+2:])
             else:
-                newName = '%s%s'%(className[0].lower(), className[1:])                
+                return '%s%s'%(className[0].lower(), className[1:])
         else:
-            newName = '%s%s'%(className[0].lower(), className[1:])
+            return '%s%s'%(className[0].lower(), className[1:])
 
-        return Utils.getValidName(self.objects.keys() + additionalNames, newName)
+    def uniqueObjName(self, baseName, usedNames):
+        """ Return the first numbered baseName not a key of usedNames """
+        num = 1
+        while usedNames.has_key('%s%d'%(baseName, num)):
+            num = num + 1
+        return '%s%d'%(baseName, num)
+
+    def newObjName(self, className, additionalNames = None):
+        """ Return a name for a control unique in the scope of the model. """
+
+        if additionalNames is None: additionalNames = []
+        # XXX Now that there is multiple maintained methods is may fail because
+        # XXX it's only unique in the method.
+        usedNames = {}
+        for name in self.usedObjNames() + additionalNames:
+            usedNames[name] = None
+        return self.uniqueObjName(self.objNameBase(className), usedNames)
 
     def newObject(self, ObjClass, ObjCompanionClass):
         """ At design time, when adding a new ctrl from the palette, create and
@@ -39,6 +39,17 @@ class ObjectCollection:
         self.initialisers = initialisers
         self.finalisers = finalisers
 
+    def clone(self):
+        """ Return a copy which can be changed without affecting this one """
+        def cloneList(lst):
+            return [item.clone() for item in lst]
+
+        objColl = ObjectCollection()
+        objColl.setup(cloneList(self.creators), cloneList(self.properties),
+              cloneList(self.events), cloneList(self.collections),
+              self.initialisers[:], self.finalisers[:])
+        return objColl
+
     def merge(self, objColl):
         """ Merge another object collection with this one """
 
@@ -116,6 +127,27 @@ class ObjectCollection:
         self.renameList(self.events, self.eventsByName, name, new_name)
         self.renameList(self.collections, self.collectionsByName, name, new_name)
 
+    def renameCtrls(self, renames):
+        """ Rename several controls in one pass over the collection.
+
+        renames maps old names to new names, a new name may not be the
+        old name of another control in the mapping.
+        """
+        for lst in (self.creators, self.properties, self.events,
+                    self.collections):
+            for item in lst:
+                item.renameCompNames(renames)
+
+        # keep named colls in sync
+        for dict in (self.creatorByName, self.propertiesByName,
+                     self.eventsByName, self.collectionsByName):
+            moved = {}
+            for name, new_name in renames.items():
+                if dict.has_key(name):
+                    moved[new_name] = dict[name]
+                    del dict[name]
+            dict.update(moved)
+
     def renameFrame(self, name, new_name):
         self.renameFrameList(self.creators, name, new_name)
         self.renameFrameList(self.events, name, new_name)
@@ -17,12 +17,14 @@ import wx
 import wx.stc
 
 import ProfileView, Search, Help, Preferences, ShellEditor, Utils, SourceViews
+import IntrospectionClient
 from Utils import _
 
 from SourceViews import EditorStyledTextCtrl
 from StyledTextCtrls import PythonStyledTextCtrlMix, BrowseStyledTextCtrlMix,\
      FoldingStyledTextCtrlMix, AutoCompleteCodeHelpSTCMix, \
-     CallTipCodeHelpSTCMix, DebuggingViewSTCMix, idWord, word_delim, object_delim
+     CallTipCodeHelpSTCMix, DebuggingViewSTCMix, DeferredCodeHelp, \
+     idWord, word_delim, object_delim
 from Preferences import keyDefs
 import methodparse, moduleparse, sourceconst
 import wxNamespace
@@ -202,6 +204,11 @@ class PythonSourceView(EditorStyledTextCtrl, PythonStyledTextCtrlMix,
         return None
 
     def checkShellTips(self, objPth):
+        if Preferences.importOnCodeComplete and Preferences.importInHelperProcess:
+            target = self.getImportTarget(objPth.split('.'))
+            if target is not None:
+                return DeferredCodeHelp(self.getHelperTip, target,
+                                        self.getHelperPaths())
         if self.model.editor.shell:
             return self.model.editor.shell.getTipValue(objPth, -1)
         else:
@@ -367,6 +374,56 @@ class PythonSourceView(EditorStyledTextCtrl, PythonStyledTextCtrlMix,
                 mod = getattr(mod, comp) 
         return mod 
 
+    def getImportTarget(self, words):
+        """ Returns (module name, from name, attributes) if the first word is
+            bound by an import """
+        module = self.model.getModule()
+        name = words[0]
+        if name in module.from_imports_names:
+            return module.from_imports_names[name], name, words[1:]
+        if name in module.from_imports:
+            return name, '', words[1:]
+        # the longest dotted module imported, e.g. os.path for import os.path
+        for idx in range(len(words), 0, -1):
+            modName = '.'.join(words[:idx])
+            if modName in module.imports:
+                return modName, '', words[idx:]
+        return None
+
+    def shellImportRequired(self, words):
+        """ Will resolving words in the shell first have to import a module """
+        if not Preferences.importOnCodeComplete or not self.model.editor.shell:
+            return False
+        return words[0] not in self.model.editor.shell.getShellLocals() and \
+               self.getImportTarget(words) is not None
+
+    def getHelperPaths(self):
+        """ Directories the introspection helper should import from """
+        paths = []
+        for model in (self.model, getattr(self.model, 'app', None)):
+            if model is not None and model.filename.startswith('file://'):
+                paths.append(os.path.dirname(model.localFilename()))
+        return paths
+
+    # called from thread
+    def getHelperNames(self, target, paths):
+        modName, fromName, attrs = target
+        try:
+            return IntrospectionClient.getClient().completions(modName,
+                  fromName, attrs, paths)
+        except IntrospectionClient.IntrospectionError:
+            return []
+
+    # called from thread
+    def getHelperTip(self, target, paths):
+        modName, fromName, attrs = target
+        try:
+            return self.getFirstContinousBlock(
+                  IntrospectionClient.getClient().calltip(modName, fromName,
+                  attrs, paths))
+        except IntrospectionClient.IntrospectionError:
+            return ''
+
     def getImportedShellObj(self, words):
         module = self.model.getModule()
         imports = module.imports.keys() + module.from_imports.keys() +\
@@ -397,6 +454,17 @@ class PythonSourceView(EditorStyledTextCtrl, PythonStyledTextCtrlMix,
         raise ShellNameNotFound
 
     def getShellNames(self, words):
+        # importing arbitrary modules can be slow, do it off the GUI thread
+        if Preferences.importOnCodeComplete and Preferences.importInHelperProcess:
+            target = self.getImportTarget(words)
+            if target is not None:
+                return DeferredCodeHelp(self.getHelperNames, target,
+                                        self.getHelperPaths())
+        if self.shellImportRequired(words):
+            return DeferredCodeHelp(self.getImportedShellNames, words)
+        return self.getImportedShellNames(words)
+
+    def getImportedShellNames(self, words):
         try:
             return ShellEditor.recdir(self.getImportedShellObj(words))
         except ShellNameNotFound:
@@ -1100,6 +1168,9 @@ class PythonSourceView(EditorStyledTextCtrl, PythonStyledTextCtrlMix,
             PythonStyledTextCtrlMix.OnUpdateUI(self, event)
 
     def OnAddChar(self, event):
+        # further typing makes pending completions stale
+        self.cancelCodeHelp()
+
         char = event.GetKey()
         # On enter indent to same indentation as line above
         # If ends in : indent xtra block
@@ -74,6 +74,8 @@ class SelectionGroup:
         self.startSize = None
         self.colour = colour
         self.name = ''
+        # last geometry shown, tags are not moved while it stays the same
+        self.shownGeometry = None
 
         tagSize = Preferences.dsSelectionTagSize
 
@@ -120,6 +122,7 @@ class SelectionGroup:
 
     def assign(self, group):
         self.hideTags()
+        self.shownGeometry = None
 
         self.position.x, self.position.y = group.position.x, group.position.y
         self.size.x, self.size.y = group.size.x, group.size.y
@@ -156,6 +159,7 @@ class SelectionGroup:
             tag.Show()
 
     def reparentTags(self, parent):
+        self.shownGeometry = None
         for tag in self.tags:
             tag.Reparent(parent)
 
@@ -222,6 +226,7 @@ class SelectionGroup:
 
     def selectCtrl(self, ctrl, compn, selectInInspector = True):
         self.hideTags()
+        self.shownGeometry = None
         showTags = False
         if not ctrl:
             self.selection = None
@@ -348,6 +353,15 @@ class SelectionGroup:
             if dbgInfo: InspDbgInfo(self.inspector, `trPos`, 0)
             trSze = wx.Size(sz.x, sz.y)
 
+        # Mouse moves within a grid cell don't change the selection, skip
+        # moving the tag and line windows
+        geometry = (self.dragging, trPos.Get(), trSze.Get())
+        if geometry == self.shownGeometry and not finishDragging:
+            self.position = trPos
+            self.size = trSze
+            return
+        self.shownGeometry = geometry
+
         self.slT.SetDimensions(trPos.x -frmWid, trPos.y -frmWid, trSze.x +frmWid, frmWid)
         self.slR.SetDimensions(trPos.x + trSze.x, trPos.y -frmWid, frmWid, trSze.y+frmWid*2)
         self.slB.SetDimensions(trPos.x -frmWid, trPos.y + trSze.y, trSze.x +frmWid*2, frmWid)
@@ -10,7 +10,7 @@
 # Licence:     GPL
 #-----------------------------------------------------------------------------
 
-import os, re, keyword, string
+import os, re, keyword, string, threading
 
 import wx
 import wx.stc
@@ -301,7 +301,20 @@ class BrowseStyledTextCtrlMix:
                   self.clearUnderline(self.styleStart, self.styleLength)
         event.Skip()
 
+class DeferredCodeHelp:
+    """ Returned from getCodeCompOptions or getTipValue when the result is
+        expensive to compute (e.g. it requires importing a module).
+
+        func(*args) is called on a worker thread and must return the value
+        that would otherwise have been returned directly.
+    """
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
 class CodeHelpStyledTextCtrlMix:
+    codeHelpRequest = 0
+
     def getCurrLineInfo(self):
         pos = self.GetCurrentPos()
         lnNo = self.GetCurrentLine()
@@ -319,6 +332,39 @@ class CodeHelpStyledTextCtrlMix:
                 break
         return '\n'.join(res)
 
+    def cancelCodeHelp(self):
+        """ Invalidate any outstanding deferred code help request """
+        self.codeHelpRequest = self.codeHelpRequest + 1
+
+    def deferCodeHelp(self, deferred, ready, *args):
+        """ Compute deferred on a worker thread, then call
+            ready(result, *args) unless the request went stale """
+        worker = threading.Thread(target=self.codeHelpWorker,
+              args=(self.codeHelpRequest, self.GetCurrentPos(), deferred,
+                    ready, args))
+        # don't keep Boa alive for a hanging import
+        worker.setDaemon(True)
+        worker.start()
+
+    # called from thread
+    def codeHelpWorker(self, request, pos, deferred, ready, args):
+        if request != self.codeHelpRequest:
+            return
+        try:
+            result = deferred.func(*deferred.args)
+        except Exception:
+            result = None
+        wx.CallAfter(self.OnCodeHelpReady, request, pos, result, ready, args)
+
+    def OnCodeHelpReady(self, request, pos, result, ready, args):
+        # editor may have been closed while the request was busy
+        if not self:
+            return
+        if request != self.codeHelpRequest or pos != self.GetCurrentPos():
+            return
+        if result:
+            ready(result, *args)
+
 
 class AutoCompleteCodeHelpSTCMix(CodeHelpStyledTextCtrlMix):
     """ Mixin that assists with code completion
@@ -326,6 +372,10 @@ class AutoCompleteCodeHelpSTCMix(CodeHelpStyledTextCtrlMix):
         Users should implement:
         def getCodeCompOptions(self, word, rootWord, matchWord, lnNo):
             return ['list', 'of', 'options']
+
+        or return a DeferredCodeHelp instance to have the options computed
+        off the GUI thread. The list is shown when the result arrives,
+        unless the request was cancelled or the caret moved.
     """
 
     def __init__(self):
@@ -358,8 +408,15 @@ class AutoCompleteCodeHelpSTCMix(CodeHelpStyledTextCtrlMix):
         if not matchWord:
             offset = 0
 
+        self.cancelCodeHelp()
         names = self.getCodeCompOptions(word, rootWord, matchWord, lnNo)
 
+        if isinstance(names, DeferredCodeHelp):
+            self.deferCodeHelp(names, self.showCodeCompOptions, offset)
+        else:
+            self.showCodeCompOptions(names, offset)
+
+    def showCodeCompOptions(self, names, offset):
         # remove duplicates and sort
         unqNms = {}
         for name in names: unqNms[name] = None
@@ -390,6 +447,8 @@ class CallTipCodeHelpSTCMix(CodeHelpStyledTextCtrlMix):
         Users should implement:
             def getTipValue(word, lnNo):
                 return 'Tip'
+
+        or return a DeferredCodeHelp instance, see AutoCompleteCodeHelpSTCMix
     """
     def __init__(self):
         self.lastCallTip = ''
@@ -408,55 +467,62 @@ class CallTipCodeHelpSTCMix(CodeHelpStyledTextCtrlMix):
             self.CallTipCancel()
             return
 
-        cursBrktOffset = piv - bracket
-
         start, length = idWord(line, bracket-1, lnStPs, object_delim, object_delim)
         startLine = start-lnStPs
         word = line[startLine:startLine+length]
         if word:
             tip = self.getTipValue(word, lnNo)
-            if tip:
-                # Minus offset of 1st bracket in the tip
-                tipBrkt = tip.find('(')
-                if tipBrkt != -1:
-                    pos = pos - tipBrkt - 1
-                else:
-                    tipBrkt = 0
-
-                # get the current parameter from source
-                paramNo = len(methodparse.safesplitfields(\
-                      line[bracket+1:piv+1]+'X', ','))
-                if paramNo:
-                    paramNo = paramNo - 1
-
-                # get hilight & corresponding parameter from tip
-                tipBrktEnd = tip.rfind(')')
-                tip_param_str = tip[tipBrkt+1:tipBrktEnd]
-                tip_params = methodparse.safesplitfields(\
-                    tip_param_str, ',', ('(', '{'), (')', '}') )
-                try:
-                    hiliteStart = tipBrkt+1 + tip_param_str.find(tip_params[paramNo])
-                except IndexError:
-                    hilite = (0, 0)
-                else:
-                    hilite = (hiliteStart,
-                              hiliteStart+len(tip_params[paramNo]))
+            if isinstance(tip, DeferredCodeHelp):
+                self.cancelCodeHelp()
+                self.deferCodeHelp(tip, self.showCallTip, pos, line, bracket,
+                                   piv)
+            elif tip:
+                self.showCallTip(tip, pos, line, bracket, piv)
+
+    def showCallTip(self, tip, pos, line, bracket, piv):
+        cursBrktOffset = piv - bracket
 
-                # don't update if active and unchanged
-                if self.CallTipActive() and tip == self.lastCallTip and \
-                      hilite == self.lastTipHilite:
-                    return
+        # Minus offset of 1st bracket in the tip
+        tipBrkt = tip.find('(')
+        if tipBrkt != -1:
+            pos = pos - tipBrkt - 1
+        else:
+            tipBrkt = 0
+
+        # get the current parameter from source
+        paramNo = len(methodparse.safesplitfields(\
+              line[bracket+1:piv+1]+'X', ','))
+        if paramNo:
+            paramNo = paramNo - 1
+
+        # get hilight & corresponding parameter from tip
+        tipBrktEnd = tip.rfind(')')
+        tip_param_str = tip[tipBrkt+1:tipBrktEnd]
+        tip_params = methodparse.safesplitfields(\
+            tip_param_str, ',', ('(', '{'), (')', '}') )
+        try:
+            hiliteStart = tipBrkt+1 + tip_param_str.find(tip_params[paramNo])
+        except IndexError:
+            hilite = (0, 0)
+        else:
+            hilite = (hiliteStart,
+                      hiliteStart+len(tip_params[paramNo]))
 
-                # close if active and changed
-                if self.CallTipActive() and (tip != self.lastCallTip or \
-                      hilite != self.lastTipHilite):
-                    self.CallTipCancel()
+        # don't update if active and unchanged
+        if self.CallTipActive() and tip == self.lastCallTip and \
+              hilite == self.lastTipHilite:
+            return
+
+        # close if active and changed
+        if self.CallTipActive() and (tip != self.lastCallTip or \
+              hilite != self.lastTipHilite):
+            self.CallTipCancel()
 
-                self.CallTipShow(pos - cursBrktOffset, tip)
+        self.CallTipShow(pos - cursBrktOffset, tip)
 
-                self.CallTipSetHighlight(hilite[0], hilite[1])
-                self.lastCallTip = tip
-                self.lastTipHilite = hilite
+        self.CallTipSetHighlight(hilite[0], hilite[1])
+        self.lastCallTip = tip
+        self.lastTipHilite = hilite
 
 class DebuggingViewSTCMix:
     def __init__(self, debugMarkers):
@@ -0,0 +1,282 @@
+#-----------------------------------------------------------------------------
+# Name:        ZopeCache.py
+# Purpose:     Keep-alive connections to Zope servers and caches of their
+#              folder listings and object properties
+#
+# Author:      Riaan Booysen
+#
+# Created:     2007
+# RCS-ID:      $Id$
+# Copyright:   (c) 2007 Riaan Booysen
+# Licence:     GPL
+#-----------------------------------------------------------------------------
+
+""" XML-RPC calls to a Zope server are sent over a few keep-alive connections
+instead of connecting for every call.
+
+Folders are listed with the zoa/listing script which returns the meta types,
+ids and properties of all children in one call. Listings are used as is for
+a few seconds, after that they are revalidated by passing the stamp of the
+listing (modification time and size of the folder) back to the script which
+only lists the folder again when it changed. Properties of the children are
+kept for the Inspector. Writes made through Boa invalidate the entries they
+affect, undo forgets everything cached for the server.
+"""
+
+print 'importing ZopeLib.ZopeCache'
+
+import time, socket, httplib, threading
+
+from ExternalLib import xmlrpclib, BasicAuthTransport
+
+def normPath(path):
+    return '/' + '/'.join([name for name in path.split('/') if name])
+
+def parentPath(path):
+    return normPath(path[:path.rfind('/')])
+
+class ZopeObjectCache:
+    """ Folder listings and object properties of one Zope server """
+    freshness = 10
+    propertiesFreshness = 60
+    size = 200
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # folder path -> [checked, stamp, metatypes, ids]
+        self.listings = {}
+        # object path -> (fetched, repr of [propertyItems, propertyMap])
+        self.properties = {}
+
+    def getListing(self, path):
+        self.lock.acquire()
+        try:
+            return self.listings.get(normPath(path))
+        finally:
+            self.lock.release()
+
+    def putListing(self, path, stamp, metatypes, ids, props=()):
+        path = normPath(path)
+        now = time.time()
+        self.lock.acquire()
+        try:
+            if len(self.listings) >= self.size:
+                self.listings.clear()
+            self.listings[path] = [now, stamp, metatypes, ids]
+
+            if len(self.properties) >= self.size * 20:
+                self.properties.clear()
+            for id, prop in zip(ids, props):
+                if prop:
+                    self.properties[normPath(path+'/'+id)] = (now, prop)
+        finally:
+            self.lock.release()
+
+    def touchListing(self, path):
+        """ Mark a listing as validated """
+        self.lock.acquire()
+        try:
+            listing = self.listings.get(normPath(path))
+            if listing is not None:
+                listing[0] = time.time()
+        finally:
+            self.lock.release()
+
+    def getProperties(self, path):
+        """ Repr of [propertyItems, propertyMap] of the object when listed
+            recently, otherwise None """
+        self.lock.acquire()
+        try:
+            cached = self.properties.get(normPath(path))
+        finally:
+            self.lock.release()
+        if cached is not None and \
+              time.time() - cached[0] < self.propertiesFreshness:
+            return cached[1]
+        return None
+
+    def invalidate(self, path):
+        """ Forget path, everything below it and the listing of it's parent """
+        path = normPath(path)
+        prefix = path.rstrip('/') + '/'
+        self.lock.acquire()
+        try:
+            for cache in (self.listings, self.properties):
+                for key in cache.keys():
+                    if key == path or key.startswith(prefix):
+                        del cache[key]
+            parent = parentPath(path)
+            if self.listings.has_key(parent):
+                del self.listings[parent]
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.listings.clear()
+            self.properties.clear()
+        finally:
+            self.lock.release()
+
+# Errors of reused connections closed by the server while they were idle
+connectionErrors = (socket.error, httplib.HTTPException)
+
+class ZopeConnectionPool:
+    """ Keep-alive HTTP connections to a Zope server, used from any thread by
+    BasicAuthTransport """
+    # ZServer closes idle channels after a while, be conservative
+    idleTimeout = 30
+    maxIdle = 4
+
+    def __init__(self, hostport):
+        self.hostport = hostport
+        self.lock = threading.Lock()
+        # [(lastUsed, HTTPConnection), ...]
+        self.idle = []
+        self.objects = ZopeObjectCache()
+        # cleared when the installed zoa predates the listing script
+        self.batched = True
+
+    def acquire(self):
+        """ Returns (connection, reused) """
+        now = time.time()
+        self.lock.acquire()
+        try:
+            while self.idle:
+                lastUsed, conn = self.idle.pop()
+                if now - lastUsed < self.idleTimeout:
+                    return conn, True
+                conn.close()
+        finally:
+            self.lock.release()
+        return httplib.HTTPConnection(self.hostport), False
+
+    def release(self, conn):
+        self.lock.acquire()
+        try:
+            if len(self.idle) < self.maxIdle:
+                self.idle.append( (time.time(), conn) )
+                return
+        finally:
+            self.lock.release()
+        conn.close()
+
+    def request(self, method, uri, headers, body):
+        while 1:
+            conn, reused = self.acquire()
+            try:
+                conn.request(method, uri, body, headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except connectionErrors:
+                conn.close()
+                # only retried when the server dropped an idle connection
+                if not reused:
+                    raise
+                continue
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self.release(conn)
+            return resp.status, resp.reason, resp.msg, data
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            idle, self.idle = self.idle, []
+        finally:
+            self.lock.release()
+        for lastUsed, conn in idle:
+            conn.close()
+
+# (host:port, username) -> ZopeConnectionPool
+connectionPools = {}
+
+def getConnectionPool(hostport, user):
+    key = (hostport, user)
+    if not connectionPools.has_key(key):
+        connectionPools[key] = ZopeConnectionPool(hostport)
+    return connectionPools[key]
+
+def getObjectCache(host, port, user):
+    return getConnectionPool('%s:%d'%(host, port), user).objects
+
+def getServer(url, user, password):
+    """ XML-RPC proxy for url (host:port/path) over pooled connections """
+    pool = getConnectionPool(url.split('/')[0], user)
+    return xmlrpclib.Server('http://' + url,
+              BasicAuthTransport.BasicAuthTransport(user, password, pool))
+
+def listingMissing(fault):
+    """ True when fault says zoa has no listing script, not that the folder
+        failed to list """
+    faultString = str(fault.faultString)
+    return faultString.find('listing') != -1 and \
+          (faultString.find('AttributeError') != -1 or
+           faultString.find('NotFound') != -1)
+
+def readListing(server, pool, path):
+    """ Returns (metatypes, ids) of the folder at path served by server, from
+        the cache while it is valid """
+    objects = pool.objects
+    cached = objects.getListing(path)
+    if cached is not None:
+        checked, stamp, metatypes, ids = cached
+        if time.time() - checked < objects.freshness:
+            return metatypes, ids
+    else:
+        stamp = ''
+
+    if pool.batched:
+        try:
+            res = server.zoa.listing(stamp)
+        except xmlrpclib.Fault, error:
+            # only an installed zoa without the listing script stops batching,
+            # other faults (permissions, broken objects) just fall back once
+            metatypes, ids = server.zoa.items()
+            if listingMissing(error):
+                pool.batched = False
+        else:
+            if not res and cached is not None:
+                objects.touchListing(path)
+                return cached[2], cached[3]
+            stamp, metatypes, ids, props = res
+            objects.putListing(path, stamp, metatypes, ids, props)
+            return metatypes, ids
+    else:
+        metatypes, ids = server.zoa.items()
+
+    objects.putListing(path, '', metatypes, ids)
+    return metatypes, ids
+
+def benchmarkFolderOpen(props, path='/', count=10):
+    """ Average seconds to list a folder with a connection per call (as Boa
+        used to), with the batched call over a keep-alive connection and
+        from the validated cache """
+    url = ('%(host)s:%(httpport)d'%props) + normPath(path)
+    user, passwd = props['username'], props['passwd']
+
+    server = xmlrpclib.Server('http://' + url,
+          BasicAuthTransport.BasicAuthTransport(user, passwd))
+    start = time.time()
+    for i in range(count):
+        server.zoa.items()
+    perConnection = (time.time() - start) / count
+
+    server = getServer(url, user, passwd)
+    start = time.time()
+    for i in range(count):
+        server.zoa.listing('')
+    keepAlive = (time.time() - start) / count
+
+    pool = getConnectionPool(url.split('/')[0], user)
+    readListing(server, pool, path)
+    start = time.time()
+    for i in range(count):
+        pool.objects.getListing(path)[0] = 0
+        readListing(server, pool, path)
+    validated = (time.time() - start) / count
+
+    return perConnection, keepAlive, validated
@@ -21,7 +21,7 @@ from PropEdit import InspectorEditorControls
 import PaletteStore
 import methodparse, RTTI
 
-from ZopeLib import Client, ExtMethDlg
+from ZopeLib import Client, ExtMethDlg, ZopeCache
 from ZopeLib.DateTime import DateTime
 
 # XXX This creation logic should be in the model, the companions should only
@@ -182,6 +182,20 @@ class ZopeCompanion(ExplorerCompanion, ZopeConnection):
         self.propItems = self.getPropertyItems()
         self.propMap = self.getPropertyMap()
 
+    def getObjectCache(self):
+        return ZopeCache.getObjectCache(self.host, self.port, self.user)
+
+    def getCachedProperties(self):
+        """ [propertyItems, propertyMap] from the listing of the containing
+            folder, None when not listed recently """
+        props = self.getObjectCache().getProperties(self.objPath)
+        if props is not None:
+            try:
+                return eval(props, {})
+            except Exception:
+                pass
+        return None
+
     def getPropList(self):
         propLst = []
         for prop in self.propItems:
@@ -204,11 +218,17 @@ class ZopeCompanion(ExplorerCompanion, ZopeConnection):
             return [ {'id': self.propItems[0][0], 'type': tpe1},
                      {'id': self.propItems[1][0], 'type': tpe2} ]
         else:
+            cached = self.getCachedProperties()
+            if cached is not None:
+                return cached[1]
             mime, res = self.call(self.objPath, 'propertyMap')
             return eval(res, {})
 
     def getPropertyItems(self):
         # [ (<prop name>, <prop value>), ...]
+        cached = self.getCachedProperties()
+        if cached is not None:
+            return cached[0]
         try:
             mime, res = self.call(self.objPath, 'propertyItems')
         except:
@@ -225,15 +245,18 @@ class ZopeCompanion(ExplorerCompanion, ZopeConnection):
         return 'string'
 
     def setPropHook(self, name, value, oldProp):
+        self.getObjectCache().invalidate(self.objPath)
         mime, res = self.callkw(self.objPath,
               'manage_changeProperties', {name: value})
         return True
 
     def addProperty(self, name, value, tpe):
+        self.getObjectCache().invalidate(self.objPath)
         mime, res = self.call(self.objPath,
               'manage_addProperty', id=name, value=value, type = tpe)
 
     def delProperty(self, name):
+        self.getObjectCache().invalidate(self.objPath)
         mime, res = self.call(self.objPath,
               'manage_delProperties', ids=[name])
 
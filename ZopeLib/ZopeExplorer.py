@@ -11,20 +11,20 @@
 #-----------------------------------------------------------------------------
 print 'importing ZopeLib.ZopeExplorer'
 
-import os, urllib, urlparse, time, socket
+import os, urllib, urlparse, time, socket, threading
 from thread import start_new_thread
 
 import wx
 
 from Explorers import ExplorerNodes
 from Models import EditorHelper, Controllers
-from ExternalLib import xmlrpclib, BasicAuthTransport
+from ExternalLib import xmlrpclib
 from Preferences import IS
 import Utils, Preferences
 import Views, Views.SourceViews, Views.PySourceView
 import PaletteStore
 
-import ZopeEditorModels, ZopeViews, Client, ExtMethDlg
+import ZopeEditorModels, ZopeViews, Client, ExtMethDlg, ZopeCache
 from ZopeCompanions import ZopeConnection, ZopeCompanion, FolderZC
 
 # XXX Add owner property
@@ -55,6 +55,11 @@ class ZopeEClip(ExplorerNodes.ExplorerClipboard):
 #        ExplorerNodes.ExplorerClipboard.clipPaste(self, node)
 
     def clipPaste_ZopeEClip(self, node, nodes, mode):
+        if mode == 'cut':
+            # the cut objects may come from anywhere on the server
+            node.getConnectionPool().objects.clear()
+        else:
+            node.invalidate()
         mime, res = self.zc.call(node.resourcepath,
               'manage_pasteObjects', cb_copy_data = self.clipRef)
 
@@ -109,6 +114,8 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
                        ZopeViews.ZopeUndoView)
     itemsSubPath = ''
     connection = False
+    # child folders listed into the cache in the background after a listing
+    prefetchCount = 10
     def __init__(self, name, resourcepath, clipboard, imgIdx, parent, xmlrpcsvr,
           root, properties, metatype):
         ExplorerNodes.ExplorerNode.__init__(self, name, resourcepath, clipboard,
@@ -179,13 +186,30 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
         path, name = os.path.split(self.name)
         return self.getResource(os.path.dirname(self.buildUrl())), name
 
-    def openList(self, root = None):
+    def getConnectionPool(self):
+        return ZopeCache.getConnectionPool('%(host)s:%(httpport)d' % \
+              self.properties, self.properties['username'])
+
+    def readListing(self):
+        """ Returns (metatypes, ids) of the children, cached while valid """
         url = self.buildUrl()+self.itemsSubPath
         if url[-1] == '/':
             url = url[:-1]
         self.server = self.getResource(url)
+        return ZopeCache.readListing(self.server, self.getConnectionPool(),
+              self.resourcepath+self.itemsSubPath)
+
+    def invalidate(self, resourcepath=None):
+        if resourcepath is None:
+            resourcepath = self.resourcepath
+        self.getConnectionPool().objects.invalidate(resourcepath)
+
+    def childPath(self, name):
+        return (self.resourcepath+self.itemsSubPath).rstrip('/') + '/' + name
+
+    def openList(self, root = None):
         try:
-            self.entries, self.entryIds = self.server.zoa.items()
+            self.entries, self.entryIds = self.readListing()
         except xmlrpclib.Fault, error:
             #print str(error)
             # see if zoa object is installed
@@ -206,7 +230,7 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
                           os.path.join(Preferences.pyPath, 'ZopeLib', 'zoa', ))
 
                     # try again, if this fails the real error should break thru
-                    self.entries, self.entryIds = self.server.zoa.items()
+                    self.entries, self.entryIds = self.readListing()
 
             else:
                 err = error.faultString
@@ -220,8 +244,29 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
                 if z:
                     result.append(z)
                     self.cache[self.entryIds[i]] = z
+
+        folders = [node for node in result
+                   if node.__class__ in prefetchClasses]
+        if folders and self.prefetchCount:
+            thread = threading.Thread(target=self.prefetch,
+                  args=(folders[:self.prefetchCount],))
+            thread.setDaemon(True)
+            thread.start()
         return result
 
+    def prefetch(self, nodes):
+        """ List folders into the cache, called in a background thread """
+        objects = self.getConnectionPool().objects
+        for node in nodes:
+            if objects.getListing(node.resourcepath+node.itemsSubPath) \
+                  is not None:
+                continue
+            try:
+                node.readListing()
+            except Exception:
+                # it will be listed (and reported) when it is opened
+                pass
+
     def isFolderish(self):
         return True
 
@@ -232,10 +277,14 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
         return editor.openOrGotoZopeDocument(self)
 
     def deleteItems(self, names):
+        for name in names:
+            self.invalidate(self.childPath(name))
         mime, res = self.clipboard.zc.call(self.resourcepath,
               'manage_delObjects', ids = names)
 
     def renameItem(self, name, newName):
+        self.invalidate(self.childPath(name))
+        self.invalidate(self.childPath(newName))
         mime, res = self.clipboard.zc.call(self.resourcepath,
               'manage_renameObject', id = name, new_id = newName)
 
@@ -245,6 +294,7 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
         return res
 
     def uploadObj(self, content):
+        self.invalidate()
         mime, res = self.clipboard.zc.call(self.resourcepath,
               'manage_upload', file = content)
         return res
@@ -257,6 +307,7 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
             return []
 
     def importObj(self, name):
+        self.invalidate()
         try:
             mime, res = self.clipboard.zc.call(self.resourcepath, 'manage_importObject', file = name)
         except Exception, message:
@@ -270,6 +321,7 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
         cmp = Compn(name, self.resourcepath, props.get('localpath', ''))
         cmp.connect(props['host'], props['httpport'],
                     props['username'], props['passwd'])
+        self.invalidate(self.childPath(name))
         cmp.create()
 
         return cmp.name
@@ -280,6 +332,8 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
         return eval(svr.zoa.undo(name), {})
 
     def undoTransaction(self, transactionIds):
+        # undone transactions may have touched anything
+        self.getConnectionPool().objects.clear()
         self.getResource().manage_undo_transactions(transactionIds)
 
     def getPermissions(self):
@@ -297,9 +351,11 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
         pass#self.getResource().manage_upload(data)
 
     def newFolder(self, name):
+        self.invalidate(self.childPath(name))
         self.getResource().manage_addFolder(name)
 
     def newBlankDocument(self, name=''):
+        self.invalidate(self.childPath(name))
         try:
             self.getResource().manage_addDTMLDocument(name)
         except xmlrpclib.ProtocolError, error:
@@ -307,6 +363,7 @@ class ZopeItemNode(ExplorerNodes.ExplorerNode):
                 raise
 
     def uploadFromFS(self, filenode):
+        self.invalidate(self.childPath(filenode.name))
         props = self.properties
         from ExternalLib.WebDAV.client import Resource
         r = Resource(('http://%(host)s:%(httpport)s/'+self.resourcepath+'/'+\
@@ -726,8 +783,7 @@ class ZopeController(ExplorerNodes.Controller, ExplorerNodes.ClipboardController
 
 
 def getServer(url, user, password):
-    return xmlrpclib.Server('http://' + url,
-              BasicAuthTransport.BasicAuthTransport(user, password) )
+    return ZopeCache.getServer(url, user, password)
 
 class ZopeNode(ZopeItemNode):
     def load(self, mode='rb'):
@@ -735,6 +791,7 @@ class ZopeNode(ZopeItemNode):
 
     def save(self, filename, data, mode='wb'):
         """ Saves contents of data to Zope """
+        self.invalidate()
         self.getResource().manage_upload(data)
 
     def isFolderish(self):
@@ -1080,6 +1137,9 @@ zopeClassMap = { 'Folder': DirNode,
         'Help Topic': HelpTopicNode,
        }
 
+# nodes of these classes are listed in the background by their parent
+prefetchClasses = (DirNode, ControlNode, PMNode, ProductNode)
+
 ExplorerNodes.register(ZopeCatNode, controller=ZopeCatController)
 ExplorerNodes.register(ZopeItemNode, clipboard='global',
   confdef=('explorer', 'zope'), controller=ZopeController, category=ZopeCatNode)
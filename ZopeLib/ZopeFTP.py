@@ -10,7 +10,7 @@
 # Licence:     GPL
 #-----------------------------------------------------------------------------
 
-import socket
+import socket, errno
 import ftplib, os
 
 
@@ -23,6 +23,7 @@ class ZopeFTPItem:
         self.size = size
         self.date = date
         self.lines = []
+        self.callback = None
 
     def __repr__(self):
         return '<%s %s, %s>' % (`self.__class__`, self.whole_name(), self.date)
@@ -55,13 +56,16 @@ class ZopeFTPItem:
             except Exception, message:
                 print 'Could not read:', line, message
 
-    def prepareAsFile(self, data):
+    def prepareAsFile(self, data, callback=None):
         self.lines = data.split('\n')
         self.lines.reverse()
+        self.callback = callback
 
-    def readline(self):
-        try: return self.lines.pop()+'\n'
+    def readline(self, size=-1):
+        try: line = self.lines.pop()+'\n'
         except IndexError: return ''
+        if self.callback: self.callback(len(line))
+        return line
 
     def isFolder(self):
         return self.perms[0] == 'd'
@@ -145,20 +149,29 @@ class ZopeFTP:
         self.ftp.retrbinary('RETR %s' % server_filename, f.write)
         f.close()
 
-    def load(self, item):
+    def load(self, item, callback=None):
+        """ callback is called with the size of every line received """
         res = []
-        self.ftp.retrlines(item.cmd('RETR'), res.append)
+        def addLine(line):
+            res.append(line)
+            if callback: callback(len(line)+1)
+        self.ftp.retrlines(item.cmd('RETR'), addLine)
         return '\n'.join(res)
 
-    def save(self, item, data):
-        item.prepareAsFile(data)
+    def save(self, item, data, callback=None):
+        item.prepareAsFile(data, callback)
         try:
             self.ftp.storlines(item.cmd('STOR'), item)
         except socket.error, err:
             # reconnect and retry if connection has failed
-            if err[0] == 10054:
-                self.connect(self.username, self.password, self.host, self.port, self.passive)
-                self.ftp.storlines(item.cmd('STOR'), item)
+            if err[0] not in (errno.ECONNRESET, 10054):
+                raise
+            self.connect(self.username, self.password, self.host, self.port, self.passive)
+            item.prepareAsFile(data, callback)
+            self.ftp.storlines(item.cmd('STOR'), item)
+
+    def noop(self):
+        self.ftp.voidcmd('NOOP')
 
 
     def upload(self, filename, dest_path, data=None):
@@ -0,0 +1,27 @@
+## Script (Python) "listing"
+##bind container=container
+##bind context=context
+##bind namespace=_
+##bind script=script
+##bind subpath=traverse_subpath
+##parameters=stamp=''
+##title=listing
+##
+obj = context.aq_parent
+ids = container.objectids()
+try: mtime = obj.bobobase_modification_time().timeTime()
+except: mtime = 0
+newStamp = '%.6f:%d' % (mtime, _.len(ids))
+if stamp and stamp == newStamp:
+    return 0
+
+metatypes = container.metatypes()
+props = []
+if obj.meta_type not in ('Z Class', 'Local File System', 'Local Directory',
+                         'User Folder'):
+    for f in obj.objectValues():
+        try: props.append(str([f.propertyItems(), f.propertyMap()]))
+        except: props.append('')
+if _.len(props) != _.len(ids):
+    props = [''] * _.len(ids)
+return [newStamp, metatypes, ids, props]
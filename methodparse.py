@@ -57,7 +57,7 @@ class frame1(wxFrame):
         self._init_ctrls()
 """
 
-import re, string
+import re, string, copy
 
 import Preferences, Utils
 from Utils import _
@@ -70,11 +70,10 @@ containers = [('(', ')'), ('{', '}'), ('[', ']')]
 containBegin = [_c[0] for _c in containers]
 containEnd = [_c[1] for _c in containers]
 
-def incLevel(level, pos):
-    return level + 1, pos + 1
-
-def decLevel(level, pos):
-    return max(level - 1, 0), pos + 1
+# scanners finding the next delimiter, quote or bracket per
+# (delim, containBegin, containEnd) combination
+_splitScanners = {}
+_brackets = re.compile('[%s]'%re.escape(''.join(containBegin + containEnd)))
 
 def safesplitfields(params, delim, returnBlanks = 0,
       containBegin=containBegin, containEnd=containEnd):
@@ -87,70 +86,63 @@ def safesplitfields(params, delim, returnBlanks = 0,
         split('', ',') returns ['']
         Usually I want the result of such a split to be []
     """
-
-    locparams =  params
-    list = []
-    i = 0
-    nestlevel = 0
-    singlequotelevel = 0
-    doublequotelevel = 0
-
     if returnBlanks and not params.strip():
         return [params]
 
-    while i < len(locparams):
-        curchar = locparams[i]
-        # only check for delimiter if not inside some block
-        if (not nestlevel) and (not singlequotelevel) and (not doublequotelevel)\
-          and (curchar == delim):
-            param = locparams[:i]
-            list.append(param)
-            locparams = locparams[i +1:].strip()
-            i = 0
-            continue
-
-        if (not singlequotelevel) and (not doublequotelevel) and nestlevel and \
-          (curchar in containEnd):
-            nestlevel, i = decLevel(nestlevel, i)
-            continue
-
-        if (not singlequotelevel) and (not doublequotelevel) and \
-          (curchar in containBegin):
-            nestlevel, i = incLevel(nestlevel, i)
-            continue
-
-        # don't check anything except end quotes inside quote blocks
-        if singlequotelevel and curchar == "'":
-            singlequotelevel, i = decLevel(singlequotelevel, i)
-            continue
-        if doublequotelevel and curchar == '"':
-            doublequotelevel, i = decLevel(doublequotelevel, i)
-            continue
-
-        if (not singlequotelevel) and curchar == '"':
-            doublequotelevel, i = incLevel(doublequotelevel, i)
-        elif (not doublequotelevel) and curchar == "'":
-            singlequotelevel, i = incLevel(singlequotelevel, i)
-        else:
-            i = i + 1
+    key = (delim, tuple(containBegin), tuple(containEnd))
+    try:
+        scanner = _splitScanners[key]
+    except KeyError:
+        chars = {}
+        for c in [delim, "'", '"'] + list(containBegin) + list(containEnd):
+            chars[c] = None
+        scanner = _splitScanners[key] = \
+              re.compile('[%s]'%re.escape(''.join(chars.keys())))
+
+    fields = []
+    nestlevel = 0
+    start = pos = 0
+    end = len(params)
+    # after the first split the remainder is stripped
+    strippedEnd = len(params.rstrip())
+    while 1:
+        m = scanner.search(params, pos, end)
+        if not m:
+            break
+        i = m.start()
+        curchar = params[i]
+        pos = i + 1
+        if curchar == delim and not nestlevel:
+            fields.append(params[start:i])
+            end = strippedEnd
+            while pos < end and params[pos].isspace():
+                pos = pos + 1
+            start = pos
+        elif curchar in containEnd:
+            if nestlevel:
+                nestlevel = nestlevel - 1
+        elif curchar in containBegin:
+            nestlevel = nestlevel + 1
+        elif curchar in ('"', "'"):
+            # skip quoted content, an unclosed quote extends to the end
+            pos = params.find(curchar, pos, end)
+            if pos == -1:
+                break
+            pos = pos + 1
 
     # add last entry not delimited by comma
-    lastentry = locparams.strip()
+    lastentry = params[start:end].strip()
     if lastentry:
-        list.append(lastentry)
-    return list
+        fields.append(lastentry)
+    return fields
 
 # XXX does not handle ",' yet
 def matchbracket(text, findBracket, dir=None):
     if findBracket in containBegin or (dir is not None and dir == -1):
         dir = -1
-        start = len(text)-1
-        end = -1
         brktIdx = containBegin.index(findBracket)
     elif findBracket in containEnd or (dir is not None and dir == 1):
         dir = 1
-        start = 0
-        end = len(text)
         brktIdx = containEnd.index(findBracket)
     else:
         raise Exception, _('Unhandled bracket')
@@ -158,12 +150,16 @@ def matchbracket(text, findBracket, dir=None):
     # () {} []
     levels = [0, 0, 0]
 
-    for cIdx in range(start, end, dir):
+    brackets = [m.start() for m in _brackets.finditer(text)]
+    if dir == -1:
+        brackets.reverse()
+
+    for cIdx in brackets:
         c = text[cIdx]
         if c in containBegin:
             idx = containBegin.index(c)
             levels[idx] = levels[idx] + dir
-        elif c in containEnd:
+        else:
             idx = containEnd.index(c)
             levels[idx] = levels[idx] - dir
 
@@ -229,6 +225,13 @@ class PerLineParser:
     def __repr__(self):
         return self.asText()
 
+    def clone(self):
+        """ Return a copy which can be changed without affecting this line """
+        line = copy.copy(self)
+        if hasattr(self, 'params'):
+            line.params = copy.copy(self.params)
+        return line
+
     def renameCompName2(self, old_value, new_value):
         """ notification of a rename, override to catch renames to vars and params
             All parse lines should be notified of renames, not just entries
@@ -236,6 +239,21 @@ class PerLineParser:
         if self.comp_name == old_value:
             self.comp_name = new_value
 
+    def referencedNames(self):
+        """ Names of the components this line refers to and which
+            renameCompName2 would change """
+        return [self.comp_name]
+
+    def renameCompNames(self, renames):
+        """ Apply a mapping of old to new names in one pass.
+
+        Only the names the line refers to are looked up, new names may not
+        be old names of other entries in the mapping.
+        """
+        for name in self.referencedNames():
+            if renames.has_key(name):
+                self.renameCompName2(name, renames[name])
+
     def renameFrameName(self, old_value, new_value):
         self.frame_name = new_value
 
@@ -334,6 +352,14 @@ class ConstructorParse(PerLineParser):
         if self.factory and self.factory[0] == old_value:
             self.factory = (new_value, self.factory[1])
 
+    def referencedNames(self):
+        names = [self.comp_name]
+        if self.params.has_key('parent'):
+            names.append(Utils.ctrlNameFromSrcRef(self.params['parent']))
+        if self.factory:
+            names.append(self.factory[0])
+        return names
+
 
     def prependFrameWinId(self, frame):
         idPrfx = self.getIdPrefix(frame)
@@ -366,6 +392,8 @@ class ConstructorParse(PerLineParser):
 ##  ')[.]__init__\(self,[ \t]*(?P<params>.*)\)$')
 
 coll_init = '_init_coll_'
+# component names referenced as self.<name> in source
+srcRefNames = re.compile('self[.]([A-Za-z_][A-Za-z0-9_]*)')
 idp = '[A-Za-z_][A-Za-z0-9_.]*'
 # self.name(params)
 is_prop = re.compile('^[ \t]*self[.](?P<name>'+idp+')[ \t]*\([ \t]*(?P<params>.*)[ \t]*(\)|,)$')
@@ -429,6 +457,14 @@ class PropertyParse(PerLineParser):
 
         PerLineParser.renameCompName2(self, old_value, new_value)
 
+    def referencedNames(self):
+        names = [self.comp_name]
+        for param in self.params:
+            names.extend(srcRefNames.findall(param))
+            if param.startswith('self.'+coll_init):
+                names.append(param[16:param.rfind('_')])
+        return names
+
     def asText(self, stripFrameWinIdPrefix=''):
         return '%s.%s(%s)' %(Utils.srcRefFromCtrlName(self.comp_name),
                 self.prop_setter, ', '.join(self.params))
@@ -514,6 +550,13 @@ class CollectionItemInitParse(PerLineParser):
             if val == src_old:
                 self.params[key] = Utils.srcRefFromCtrlName(new_value)
 
+    def referencedNames(self):
+        names = [self.ctrl_name]
+        for val in self.params.values():
+            if val.startswith('self.'):
+                names.append(val[5:])
+        return names
+
     def prependFrameWinId(self, frame):
         idPrfx = self.getIdPrefix(frame)
         if self.params.has_key('id') and \
@@ -648,6 +691,9 @@ class EventParse(PerLineParser):
                 self.windowid = self.renameWindowId(self.windowid,
                       self.frame_name, self.frame_name, old_value, new_value)
 
+    def referencedNames(self):
+        return [self.ctrl_name]
+
     def prependFrameWinId(self, frame):
         if self.windowid:
             idPrfx = self.getIdPrefix(frame)
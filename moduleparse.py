@@ -733,7 +733,20 @@ class Module:
         prevLines = code_block.end - code_block.start
         deltaLines = newLines - prevLines
 
-        self.source[code_block.start : code_block.end] = new_body
+        # Only splice in the lines that changed, leave the common head and
+        # tail of the old body in place
+        start, end = code_block.start, code_block.end
+        common = min(newLines, prevLines)
+        head = 0
+        while head < common and \
+              self.source[start+head].rstrip('\r\n') == new_body[head]:
+            head = head + 1
+        tail = 0
+        while tail < common - head and \
+              self.source[end-tail-1].rstrip('\r\n') == new_body[-tail-1]:
+            tail = tail + 1
+
+        self.source[start+head : end-tail] = new_body[head:newLines-tail]
 
         self.renumber(deltaLines, code_block.start)
 